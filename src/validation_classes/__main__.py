@@ -0,0 +1,760 @@
+"""Command line entry point, run from the src directory:
+
+python -m validation_classes validate --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from .pipeline import (
+    LOGSHEETS_VALIDATED_CSV,
+    PROJECT_DIR,
+    SHEET_TYPES,
+    VALIDATED_DATA_DIR,
+)
+
+
+def validate(args: argparse.Namespace) -> int:
+    from .metrics import RunMetrics
+    from .parallel import run_jobs, write_summary
+    from .pipeline import build_jobs, get_sheet_addresses
+    from .transport import FixtureTransport, set_transport
+
+    if args.replay:
+        set_transport(FixtureTransport(args.replay, latency=args.latency))
+
+    addresses = get_sheet_addresses(args.logsheets)
+    if args.observatory:
+        addresses = [a for a in addresses if a[0] in args.observatory]
+    jobs = build_jobs(addresses, tuple(args.sheet_type), mandatory=args.mandatory)
+    window = None
+    if args.snapshot and not args.full:
+        from pathlib import Path
+
+        from .incremental import QCWindow, qc_thresholds
+
+        window = QCWindow(qc_thresholds(args.logsheets), Path(args.snapshot))
+    summary = run_jobs(
+        jobs,
+        max_workers=args.workers,
+        columnar=args.columnar,
+        window=window,
+        repair=args.repair,
+    )
+
+    for result in summary.results:
+        if result.failure is not None:
+            print(f"{result.job.name}: FAILED {result.failure}")
+        elif result.counters["rows_failed"]:
+            print(
+                f"{result.job.name}: {result.counters['rows_failed']} rows failed "
+                f"with {result.counters['errors']} errors"
+            )
+    print(", ".join(f"{k}={v}" for k, v in summary.counters.items()))
+    metrics = RunMetrics.from_results(summary.results)
+    if args.out:
+        for path in write_summary(summary, args.out, args.full_errors, metrics):
+            print(f"Written {path}")
+    if args.combine:
+        from pathlib import Path
+
+        from .combine import combine_logsheets
+        from .pipeline import get_refcodes
+
+        out = Path(args.out)
+        observatories = [
+            (o, s)
+            for o, s in sorted({(j.observatory_id, j.sampling_strategy) for j in jobs})
+            if (out / f"{o}_{s}_sampling_validated.csv").exists()
+            and (out / f"{o}_{s}_measured_validated.csv").exists()
+        ]
+        _, totals = combine_logsheets(
+            observatories, get_refcodes(), out, args.combine, metrics=metrics
+        )
+        print(", ".join(f"{k}={v}" for k, v in totals.items()))
+    metrics_dir = args.metrics or args.out
+    if metrics_dir:
+        for path in metrics.write(metrics_dir):
+            print(f"Written {path}")
+    if args.rocrate:
+        from .rocrate import write_crates
+
+        print(write_crates(args.rocrate, args.logsheets))
+    return 1 if summary.counters.get("jobs_failed") else 0
+
+
+def record(args: argparse.Namespace) -> int:
+    from .pipeline import (
+        GOVERNANCE_URL,
+        SAMPLING_STRATEGIES,
+        build_jobs,
+        get_crate_sheet,
+        get_governance_table,
+        get_refcodes,
+        get_sheet,
+        get_sheet_addresses,
+    )
+    from .transport import RecordingTransport, set_transport
+
+    set_transport(RecordingTransport(args.fixtures))
+    for file_name in ("logsheets.csv", "observatories.csv"):
+        get_governance_table(file_name)
+        print(f"Recorded {GOVERNANCE_URL + file_name}")
+    jobs = build_jobs(get_sheet_addresses(args.logsheets))
+    for job in jobs:
+        get_sheet(job.sheet_link, job.sheet_type)
+        print(f"Recorded {job.name}")
+    for observatory_id in sorted({job.observatory_id for job in jobs}):
+        for sampling_strategy in SAMPLING_STRATEGIES:
+            for sheet_type in ("sampling", "measured"):
+                get_crate_sheet(observatory_id, sampling_strategy, sheet_type)
+    get_refcodes()
+    print(f"Recorded fixtures in {args.fixtures}")
+    return 0
+
+
+def completeness(args: argparse.Namespace) -> int:
+    from .completeness import completeness_matrix, read_sampling_sheets, write_report
+    from .pipeline import build_jobs, get_sheet_addresses
+
+    jobs = build_jobs(get_sheet_addresses(args.logsheets), ("sampling",))
+    matrix = completeness_matrix(read_sampling_sheets(jobs, args.workers))
+    write_report(matrix, args.out)
+    print(f"Written {args.out}")
+    return 0
+
+
+def gazetteer(args: argparse.Namespace) -> int:
+    import pandas as pd
+
+    from .errors import ErrorStore
+    from .gazetteer import (
+        OBSERVATORIES_CSV,
+        OBSERVATORY_SHEETS_CSV,
+        SNAPSHOT_PATH,
+        Gazetteer,
+        check_observatory_sheets,
+        check_observatory_sites,
+        fetch_snapshot,
+        observatory_mrgids,
+    )
+
+    if args.snapshot is None:
+        args.snapshot = SNAPSHOT_PATH
+    sheets = pd.read_csv(OBSERVATORY_SHEETS_CSV)
+    if args.fetch:
+        gaz = fetch_snapshot(observatory_mrgids(sheets), args.snapshot)
+        print(f"Written {args.snapshot}")
+    else:
+        gaz = Gazetteer.load(args.snapshot)
+    errors = ErrorStore()
+    check_observatory_sheets(gaz, sheets, errors, args.tolerance)
+    check_observatory_sites(
+        gaz, pd.read_csv(OBSERVATORIES_CSV), sheets, errors, tolerance=args.tolerance
+    )
+    for record in errors:
+        print(f"{record['observatory_id']}: {record['type']} {record['msg']}")
+    if args.out:
+        errors.write_csv(args.out)
+        print(f"Written {args.out}")
+    return 1 if errors else 0
+
+
+def identifiers(args: argparse.Namespace) -> int:
+    import pandas as pd
+
+    from .errors import ErrorStore
+    from .gazetteer import OBSERVATORIES_CSV, OBSERVATORY_SHEETS_CSV
+    from .identifiers import cache_stats, check_identifiers
+    from .loaders import load_sheets
+
+    errors = ErrorStore()
+    for job, df in load_sheets("sampling").items():
+        check_identifiers(
+            df,
+            errors,
+            observatory_id=job.observatory_id,
+            sampling_strategy=job.sampling_strategy,
+            sheet_type=job.sheet_type,
+        )
+    check_identifiers(
+        pd.read_csv(OBSERVATORY_SHEETS_CSV),
+        errors,
+        observatory_id=None,
+        sampling_strategy=None,
+        sheet_type="observatory",
+    )
+    check_identifiers(
+        pd.read_csv(OBSERVATORIES_CSV),
+        errors,
+        observatory_id=None,
+        sampling_strategy=None,
+        sheet_type="observatories",
+    )
+    for record in errors:
+        print(
+            f"{record['observatory_id']}: {'.'.join(record['loc'])} {record['input']!r}"
+        )
+    stats = cache_stats()
+    print(
+        f"{len(errors)} invalid identifiers, cache hit rate {stats['hit_rate']:.1%} "
+        f"({stats['misses']} distinct values)"
+    )
+    if args.out:
+        errors.write_csv(args.out)
+        print(f"Written {args.out}")
+    return 1 if errors else 0
+
+
+def taxonomy(args: argparse.Namespace) -> int:
+    from .errors import ErrorStore
+    from .loaders import load_sheets
+    from .taxonomy import INDEX_DIR, TaxonomyIndex, build_index, check_taxonomy
+
+    if args.index is None:
+        args.index = INDEX_DIR
+    if args.build:
+        index = build_index(args.build, args.index)
+        print(f"Written {args.index} ({len(index)} names)")
+    else:
+        index = TaxonomyIndex.load(args.index)
+    errors = ErrorStore()
+    for job, df in load_sheets("sampling").items():
+        check_taxonomy(
+            index,
+            df,
+            errors,
+            observatory_id=job.observatory_id,
+            sampling_strategy=job.sampling_strategy,
+            sheet_type=job.sheet_type,
+        )
+    for record in errors:
+        print(f"{record['source_mat_id']}: {record['type']} {record['msg']}")
+    if args.out:
+        errors.write_csv(args.out)
+        print(f"Written {args.out}")
+    return 1 if errors else 0
+
+
+def keys(args: argparse.Namespace) -> int:
+    from .errors import ErrorStore
+    from .loaders import load_sheets
+    from .uniqueness import INDEX_PATH, KEY_FIELDS, KeyIndex, check_accession_formats
+
+    if args.index is None:
+        args.index = INDEX_PATH
+    index = KeyIndex.load(args.index)
+    errors = ErrorStore()
+    n_updated = 0
+    names = set()
+    for sheet_type in KEY_FIELDS:
+        for job, df in load_sheets(sheet_type).items():
+            check_accession_formats(df, errors, job)
+            n_updated += index.update(job, df)
+            names.add(job.name)
+    # Sheets that are no longer validated take their keys with them
+    for name in set(index.sheets) - names:
+        index.remove(name)
+    index.check(errors)
+    index.save(args.index)
+    print(f"Updated {n_updated} of {len(index)} sheets in {args.index}")
+    for record in errors:
+        print(
+            f"{record['observatory_id']}: {record['type']} "
+            f"{'.'.join(record['loc'])}={record['input']} {record['msg']}"
+        )
+    if args.out:
+        errors.write_csv(args.out)
+        print(f"Written {args.out}")
+    return 1 if errors else 0
+
+
+def sample_ids(args: argparse.Namespace) -> int:
+    from .errors import ErrorStore
+    from .loaders import load_sheets
+    from .sample_ids import check_source_mat_ids
+
+    sheets = {
+        **load_sheets("sampling"),
+        # The long-form ids, see sample_ids.py
+        **{
+            job._replace(sheet_type="sampling_github"): df
+            for job, df in load_sheets("sampling", "github").items()
+        },
+        **load_sheets("combined", "combined"),
+    }
+    errors = ErrorStore()
+    for job, df in sheets.items():
+        check_source_mat_ids(df, errors, job)
+    for record in errors:
+        print(f"{record['source_mat_id']}: {record['type']} {record['input']!r}")
+    if args.out:
+        errors.write_csv(args.out)
+        print(f"Written {args.out}")
+    return 1 if errors else 0
+
+
+def errors(args: argparse.Namespace) -> int:
+    import json
+
+    from .errors import ErrorStore, describe_groups
+
+    with open(args.path, encoding="utf-8") as f:
+        compressed = json.load(f)
+    if args.expand:
+        store = ErrorStore.expand(compressed)
+        store.write_csv(args.expand)
+        print(f"Written {len(store)} errors to {args.expand}")
+        return 0
+    print("\n".join(describe_groups(compressed, max_ids=args.ids)))
+    return 0
+
+
+def integrity(args: argparse.Namespace) -> int:
+    import pandas as pd
+
+    from .errors import describe_groups
+    from .integrity import audit_network, read_refcodes
+    from .loaders import load_combined, load_sheets
+    from .pipeline import get_refcodes
+
+    combined = load_combined()
+    if args.refcodes:
+        refcodes = pd.concat([read_refcodes(p) for p in args.refcodes])
+    elif args.fetch_refcodes:
+        refcodes = pd.DataFrame(
+            list(get_refcodes().items()), columns=["source_mat_id", "ref_code"]
+        )
+    else:
+        refcodes = combined[["source_mat_id", "ref_code"]]
+    report = audit_network(
+        pd.read_csv(args.observatories),
+        pd.read_csv(args.logsheets),
+        load_sheets("sampling"),
+        load_sheets("measured"),
+        load_sheets("observatory"),
+        refcodes,
+        combined,
+    )
+    print(", ".join(f"{k}={v}" for k, v in report.counters.items()))
+    if report.errors:
+        print("\n".join(describe_groups(report.errors.compress(), max_ids=args.ids)))
+    if args.out:
+        if str(args.out).endswith(".csv"):
+            report.errors.write_csv(args.out)
+        else:
+            report.errors.write_json(args.out)
+        print(f"Written {args.out}")
+    return 1 if report.errors else 0
+
+
+def outliers(args: argparse.Namespace) -> int:
+    import time
+
+    from .errors import ErrorStore, describe_groups
+    from .loaders import load_sheets
+    from .outliers import check_outliers
+
+    measured = load_sheets("measured")
+    sampling = load_sheets("sampling")
+    errors = ErrorStore()
+    start = time.perf_counter()
+    flagged = check_outliers(measured, sampling, errors, threshold=args.threshold)
+    seconds = time.perf_counter() - start
+    print(f"{len(flagged)} outlying values, {len(errors)} errors in {seconds:.2f} s")
+    if errors:
+        print("\n".join(describe_groups(errors.compress(), max_ids=args.ids)))
+    if args.out:
+        errors.write_csv(args.out)
+        print(f"Written {args.out}")
+    return 1 if errors else 0
+
+
+def cadence(args: argparse.Namespace) -> int:
+    import pandas as pd
+
+    from .cadence import check_cadence
+    from .errors import describe_groups
+    from .loaders import load_sheets
+
+    result = check_cadence(
+        pd.read_csv(args.observatories),
+        load_sheets("sampling"),
+        as_of=args.as_of,
+        freq=args.freq,
+    )
+    print(", ".join(f"{k}={v}" for k, v in result.counters.items()))
+    if result.errors:
+        print("\n".join(describe_groups(result.errors.compress(), max_ids=args.ids)))
+    if args.report:
+        result.report.to_csv(args.report)
+        print(f"Written {args.report}")
+    if args.out:
+        if str(args.out).endswith(".csv"):
+            result.errors.write_csv(args.out)
+        else:
+            result.errors.write_json(args.out)
+        print(f"Written {args.out}")
+    return 1 if result.errors else 0
+
+
+def duplicates(args: argparse.Namespace) -> int:
+    from .duplicates import find_duplicates
+    from .errors import describe_groups
+    from .loaders import load_sheets
+
+    result = find_duplicates(load_sheets("sampling", validated_dir=args.validated_dir))
+    print(", ".join(f"{k}={v}" for k, v in result.counters.items()))
+    if result.errors:
+        print("\n".join(describe_groups(result.errors.compress(), max_ids=args.ids)))
+    if args.report:
+        result.pairs.to_csv(args.report, index=False)
+        print(f"Written {args.report}")
+    if args.out:
+        if str(args.out).endswith(".csv"):
+            result.errors.write_csv(args.out)
+        else:
+            result.errors.write_json(args.out)
+        print(f"Written {args.out}")
+    return 1 if result.errors else 0
+
+
+def synthetic(args: argparse.Namespace) -> int:
+    from .synthetic import VIOLATIONS, generate_network, write_network
+
+    rates = dict.fromkeys(VIOLATIONS, args.rate)
+    for item in args.violation or []:
+        violation, _, rate = item.partition("=")
+        rates[violation] = float(rate)
+    network = generate_network(
+        args.observatories,
+        events=args.events,
+        rates=rates,
+        mandatory=args.mandatory,
+        seed=args.seed,
+    )
+    write_network(network, args.out_dir)
+    print(
+        f"Written {network.rows} rows of {args.observatories} observatories "
+        f"and {len(network.violations)} violations to {args.out_dir}"
+    )
+    return 0
+
+
+def rocrate(args: argparse.Namespace) -> int:
+    from .rocrate import write_crates
+
+    report = write_crates(args.root, args.logsheets, max_workers=args.workers)
+    print(
+        f"{report.crates_written} of {report.crates} crates written, "
+        f"{report.files_hashed} of {report.files} files hashed "
+        f"in {report.seconds:.3f} s"
+    )
+    return 0
+
+
+def ena(args: argparse.Namespace) -> int:
+    from .ena import COMBINED_DIR, export_samples
+    from .errors import ErrorStore, describe_groups
+
+    paths = args.combined or sorted(COMBINED_DIR.glob("*_combined_validated.csv"))
+    errors = ErrorStore()
+    written, counters = export_samples(
+        paths,
+        args.out,
+        tuple(args.format),
+        batch_size=args.batch_size,
+        logsheets_dir=args.logsheets_dir,
+        errors=errors,
+    )
+    print(", ".join(f"{k}={v}" for k, v in counters.items()))
+    if errors:
+        print("\n".join(describe_groups(errors.compress(), max_ids=args.ids)))
+    for path in written:
+        print(f"Written {path}")
+    return 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    from .service import Governance, ValidationServer, ValidationService
+
+    service = ValidationService(Governance.load(args.logsheets, args.observatories))
+    server = ValidationServer(service, args.host, args.port, verbose=True)
+    print(f"Serving on {server.base_url}, POST /validate?observatory=&strategy=&sheet=")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="validation_classes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser(
+        "validate", help="Fetch and validate the observatory logsheets"
+    )
+    p.add_argument("--logsheets", default=LOGSHEETS_VALIDATED_CSV)
+    p.add_argument(
+        "--sheet-type",
+        nargs="+",
+        choices=SHEET_TYPES,
+        default=list(SHEET_TYPES),
+    )
+    p.add_argument("--observatory", nargs="+", help="Only these observatory ids")
+    p.add_argument("--mandatory", action="store_true")
+    p.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Validate from the sheet columns rather than per-row dicts",
+    )
+    p.add_argument(
+        "--repair",
+        action="store_true",
+        help="Repair the mechanical errors, then validate in strict mode",
+    )
+    p.add_argument(
+        "--workers", type=int, default=None, help="Default: one per CPU core"
+    )
+    p.add_argument(
+        "--out",
+        default=None,
+        help=f"Directory to write to, e.g. {VALIDATED_DATA_DIR / 'logsheets'}",
+    )
+    p.add_argument(
+        "--snapshot",
+        default=None,
+        help="Validated sheets of a previous run to take the rows up to the "
+        "QC threshold from. Without it every row is validated",
+    )
+    p.add_argument(
+        "--full",
+        action="store_true",
+        help="Validate every row, ignoring the QC thresholds and the snapshot",
+    )
+    p.add_argument(
+        "--full-errors",
+        action="store_true",
+        help="Also write every error as a row of validation_errors.csv",
+    )
+    p.add_argument(
+        "--metrics",
+        default=None,
+        help="Directory for run_metrics.json and validation.prom. Default: --out",
+    )
+    p.add_argument(
+        "--replay", default=None, help="Replay responses from this fixture dir"
+    )
+    p.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added per replayed fetch"
+    )
+    p.add_argument(
+        "--combine",
+        default=None,
+        help="Then combine the sampling and measured sheets written to --out "
+        f"into this directory, e.g. {VALIDATED_DATA_DIR / 'combined_logsheets'}",
+    )
+    p.add_argument(
+        "--rocrate",
+        default=None,
+        help=f"Then package this directory as RO-Crates, e.g. {VALIDATED_DATA_DIR}",
+    )
+    p.set_defaults(func=validate)
+
+    p = subparsers.add_parser(
+        "record", help="Record every response the pipeline fetches, for replay"
+    )
+    p.add_argument("--logsheets", default=LOGSHEETS_VALIDATED_CSV)
+    p.add_argument("--fixtures", default=PROJECT_DIR / "fixtures" / "http")
+    p.set_defaults(func=record)
+
+    p = subparsers.add_parser(
+        "gazetteer", help="Check MRGIDs and coordinates against Marine Regions"
+    )
+    p.add_argument(
+        "--snapshot", default=None, help="Default: reference-data/marine_regions.csv"
+    )
+    p.add_argument(
+        "--fetch",
+        action="store_true",
+        help="Fetch the snapshot from marineregions.org first (not committed)",
+    )
+    p.add_argument("--tolerance", type=float, default=0.1, help="Degrees")
+    p.add_argument("--out", default=None, help="Errors CSV")
+    p.set_defaults(func=gazetteer)
+
+    p = subparsers.add_parser(
+        "completeness",
+        help="Mandatory-field completeness of all sampling sheets in one report",
+    )
+    p.add_argument("--logsheets", default=LOGSHEETS_VALIDATED_CSV)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--out", default=PROJECT_DIR / "logs" / "mandatory_completeness.csv")
+    p.set_defaults(func=completeness)
+
+    p = subparsers.add_parser(
+        "identifiers",
+        help="Check the ORCID iDs, emails, EDMO codes and URLs of validated-data",
+    )
+    p.add_argument("--out", default=None, help="Errors CSV")
+    p.set_defaults(func=identifiers)
+
+    p = subparsers.add_parser(
+        "taxonomy",
+        help="Check tax_id and scientific_name against a local NCBI taxonomy index",
+    )
+    p.add_argument("--index", default=None, help="Default: reference-data/taxonomy")
+    p.add_argument(
+        "--build", default=None, help="Build the index from this taxdump.tar.gz"
+    )
+    p.add_argument("--out", default=None, help="Errors CSV")
+    p.set_defaults(func=taxonomy)
+
+    p = subparsers.add_parser(
+        "keys",
+        help="Update the network-wide index of source_mat_ids and ENA accessions",
+    )
+    p.add_argument("--index", default=None, help="Default: validated-data/")
+    p.add_argument("--out", default=None, help="Errors CSV")
+    p.set_defaults(func=keys)
+
+    p = subparsers.add_parser(
+        "sample-ids",
+        help="Cross-check the parts of each source_mat_id with its sampling row",
+    )
+    p.add_argument("--out", default=None, help="Errors CSV")
+    p.set_defaults(func=sample_ids)
+
+    p = subparsers.add_parser(
+        "errors", help="Summarise a compressed validation_errors.json"
+    )
+    p.add_argument("path")
+    p.add_argument("--ids", type=int, default=5, help="source_mat_ids per group")
+    p.add_argument("--expand", default=None, help="Write one row per error to this CSV")
+    p.set_defaults(func=errors)
+
+    p = subparsers.add_parser(
+        "integrity",
+        help="Check obs_ids, sampling/measured rows and ref_codes across the network",
+    )
+    p.add_argument("--logsheets", default=LOGSHEETS_VALIDATED_CSV)
+    p.add_argument(
+        "--observatories",
+        default=VALIDATED_DATA_DIR / "governance" / "observatories_validated.csv",
+    )
+    p.add_argument("--refcodes", nargs="+", default=None, help="Run-information CSVs")
+    p.add_argument(
+        "--fetch-refcodes",
+        action="store_true",
+        help="Fetch the run-information sheets. Default: the combined logsheets",
+    )
+    p.add_argument("--ids", type=int, default=5, help="source_mat_ids per group")
+    p.add_argument("--out", default=None, help="Errors .json (compressed) or .csv")
+    p.set_defaults(func=integrity)
+
+    p = subparsers.add_parser(
+        "outliers", help="Flag outlying measured values per observatory and variable"
+    )
+    p.add_argument("--threshold", type=float, default=3.5, help="Robust z-score")
+    p.add_argument("--ids", type=int, default=5, help="source_mat_ids per group")
+    p.add_argument("--out", default=None, help="Errors CSV")
+    p.set_defaults(func=outliers)
+
+    p = subparsers.add_parser(
+        "cadence",
+        help="Check the sampling events against the observatories' dates and flags",
+    )
+    p.add_argument(
+        "--observatories",
+        default=VALIDATED_DATA_DIR / "governance" / "observatories_validated.csv",
+    )
+    p.add_argument(
+        "--as-of", default=None, help="Default: the last collection_date of the network"
+    )
+    p.add_argument("--freq", default="Q", help="Campaign period, e.g. Q or M")
+    p.add_argument("--ids", type=int, default=5, help="source_mat_ids per group")
+    p.add_argument("--report", default=None, help="Per observatory and strategy CSV")
+    p.add_argument("--out", default=None, help="Errors .json (compressed) or .csv")
+    p.set_defaults(func=cadence)
+
+    p = subparsers.add_parser(
+        "duplicates", help="Find sampling events logged under different ids"
+    )
+    p.add_argument("--validated-dir", default=VALIDATED_DATA_DIR)
+    p.add_argument("--ids", type=int, default=5, help="source_mat_ids per group")
+    p.add_argument("--report", default=None, help="CSV of the duplicate pairs")
+    p.add_argument("--out", default=None, help="Errors .json (compressed) or .csv")
+    p.set_defaults(func=duplicates)
+
+    p = subparsers.add_parser(
+        "synthetic", help="Generate a synthetic network of logsheets for scale tests"
+    )
+    p.add_argument("out_dir")
+    p.add_argument("--observatories", type=int, default=20)
+    p.add_argument("--events", type=int, default=16, help="Sampling events each")
+    p.add_argument("--rate", type=float, default=0.0, help="Of every violation")
+    p.add_argument(
+        "--violation",
+        nargs="+",
+        default=None,
+        help="Rates of single violations, e.g. bad_date=0.1",
+    )
+    p.add_argument(
+        "--mandatory", action="store_true", help="Conform to the mandatory models"
+    )
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=synthetic)
+
+    p = subparsers.add_parser(
+        "rocrate", help="Write RO-Crate metadata with checksums for each observatory"
+    )
+    p.add_argument("--root", default=VALIDATED_DATA_DIR)
+    p.add_argument("--logsheets", default=LOGSHEETS_VALIDATED_CSV)
+    p.add_argument("--workers", type=int, default=8, help="Hashing threads")
+    p.set_defaults(func=rocrate)
+
+    p = subparsers.add_parser(
+        "ena", help="Export the combined logsheets as ENA sample checklists"
+    )
+    p.add_argument("--out", required=True, help="Directory for the batch files")
+    p.add_argument(
+        "--combined",
+        nargs="+",
+        default=None,
+        help="Combined logsheet CSVs. Default: validated-data/combined_logsheets",
+    )
+    p.add_argument("--format", nargs="+", choices=["tsv", "xml"], default=["tsv"])
+    p.add_argument("--batch-size", type=int, default=1000, help="Samples per file")
+    p.add_argument(
+        "--logsheets-dir",
+        default=VALIDATED_DATA_DIR / "logsheets",
+        help="Where the observatory sheets are",
+    )
+    p.add_argument("--ids", type=int, default=5, help="source_mat_ids per group")
+    p.set_defaults(func=ena)
+
+    p = subparsers.add_parser(
+        "serve", help="Validate posted logsheet CSVs over HTTP, with warm models"
+    )
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--logsheets", default=LOGSHEETS_VALIDATED_CSV)
+    p.add_argument(
+        "--observatories",
+        default=VALIDATED_DATA_DIR / "governance" / "observatories_validated.csv",
+    )
+    p.set_defaults(func=serve)
+
+    args = parser.parse_args(argv)
+    if args.command == "validate" and args.combine and not args.out:
+        parser.error("--combine needs --out")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
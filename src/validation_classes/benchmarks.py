@@ -0,0 +1,236 @@
+"""Benchmarks for the validation paths, run from the src directory:
+
+python -m validation_classes.benchmarks
+
+By default these run over the sheets already in validated-data/logsheets
+so they need no network access.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import pandas as pd
+
+from .errors import ErrorStore
+from .loaders import load_sheets
+from .pipeline import VALIDATED_DATA_DIR, SheetJob, validate_sheet
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    rows: int
+    seconds: float
+    peak_bytes: int  # tracemalloc peak while running
+    allocated_blocks: int  # memory blocks still held by the result
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<24} {self.rows:>8} rows {self.seconds:>8.3f} s "
+            f"{self.peak_bytes / 2**20:>9.2f} MiB peak "
+            f"{self.allocated_blocks:>10} blocks"
+        )
+
+
+def measure(
+    name: str, func: Callable[[], Any], rows: int, repeat: int = 3
+) -> BenchmarkResult:
+    """Times func (best of repeat), then runs it once more under
+    tracemalloc for its peak memory and the blocks its result retains.
+    """
+    gc.collect()
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        blocks = sum(
+            s.count for s in tracemalloc.take_snapshot().statistics("filename")
+        )
+    finally:
+        tracemalloc.stop()
+    del result
+    return BenchmarkResult(name, rows, seconds, peak, blocks)
+
+
+def load_logsheets(
+    sheet_type: str = "sampling", validated_dir: str | Path = VALIDATED_DATA_DIR
+) -> dict[SheetJob, pd.DataFrame]:
+    """The validated logsheets of one sheet type as benchmark input, i.e.
+    untyped as a fetched sheet is (see `loaders.load_sheets`).
+    """
+    return load_sheets(sheet_type, validated_dir=validated_dir, typed=False)
+
+
+def bench_validation_paths(
+    sheets: dict[SheetJob, pd.DataFrame], repeat: int = 3
+) -> list[BenchmarkResult]:
+    """Record path vs columnar path over the same sheets."""
+    from .columnar import validate_sheet_columnar
+
+    rows = sum(len(df) for df in sheets.values())
+
+    def records():
+        return [validate_sheet(job, df) for job, df in sheets.items()]
+
+    def columnar():
+        return [validate_sheet_columnar(job, df) for job, df in sheets.items()]
+
+    return [
+        measure("records", records, rows, repeat),
+        measure("columnar", columnar, rows, repeat),
+    ]
+
+
+def bench_end_to_end(
+    fixture_dir: str | Path,
+    latency: float = 0.0,
+    max_workers: int | None = None,
+    repeat: int = 1,
+) -> BenchmarkResult:
+    """Fetch, validate and combine every observatory, replaying recorded
+    responses from a local server (see `transport.py`) with the given
+    per-request latency. Record the fixtures first with
+    'python -m validation_classes record'.
+    """
+    from .combine import combine_logsheets
+    from .parallel import run_jobs, write_summary
+    from .pipeline import build_jobs, get_refcodes, get_sheet_addresses
+    from .transport import ReplayServer, ServerTransport, use_transport
+
+    jobs = build_jobs(get_sheet_addresses(), ("sampling", "measured"))
+    observatories = sorted({(j.observatory_id, j.sampling_strategy) for j in jobs})
+
+    def end_to_end():
+        summary = run_jobs(jobs, max_workers=max_workers)
+        with tempfile.TemporaryDirectory() as tmp:
+            write_summary(summary, tmp)
+            written = {
+                (o, s)
+                for o, s in observatories
+                if (Path(tmp) / f"{o}_{s}_sampling_validated.csv").exists()
+                and (Path(tmp) / f"{o}_{s}_measured_validated.csv").exists()
+            }
+            combine_logsheets(sorted(written), get_refcodes(), tmp)
+        return summary
+
+    with (
+        ReplayServer(fixture_dir, latency=latency) as server,
+        use_transport(ServerTransport(server)),
+    ):
+        result = measure("end_to_end", end_to_end, 0, repeat)
+        rows = end_to_end().counters.get("rows_fetched", 0)
+    return result._replace(rows=rows)
+
+
+def scaling_steps(network: Any) -> dict[str, Callable[[], Any]]:
+    """The steps of `bench_scaling` over a `synthetic.SyntheticNetwork`."""
+    from .combine import combine_observatory
+    from .integrity import check_sampling_measured, stack_sheets
+
+    sheets = {**network.sampling, **network.measured}
+    ids = pd.concat([df["source_mat_id"] for df in network.sampling.values()])
+    refcodes = {
+        source_mat_id: f"REF{i}"
+        for i, source_mat_id in enumerate(ids.dropna().drop_duplicates())
+    }
+
+    def validate():
+        return [validate_sheet(job, df) for job, df in sheets.items()]
+
+    def join():
+        return check_sampling_measured(
+            stack_sheets(network.sampling), stack_sheets(network.measured), ErrorStore()
+        )
+
+    def combine():
+        return [
+            combine_observatory(
+                job.observatory_id,
+                df.drop_duplicates("source_mat_id"),
+                network.measured[job._replace(sheet_type="measured", model="measured")],
+                refcodes,
+                duplicates=(),
+            )
+            for job, df in network.sampling.items()
+        ]
+
+    return {"validate": validate, "join": join, "combine": combine}
+
+
+def bench_scaling(
+    scales: tuple[int, ...] = (1, 10),
+    repeat: int = 1,
+    rates: dict[str, float] | None = None,
+) -> list[BenchmarkResult]:
+    """Validation, the network-wide sampling/measured join and combine over
+    synthetic networks of scale times the observatories of the real one
+    (see `synthetic.py`), for scaling curves.
+    """
+    from .synthetic import Templates, generate_network
+
+    templates = Templates.load()
+    n_real = templates.observatories["observatory_id"].nunique()
+    results = []
+    for scale in scales:
+        network = generate_network(
+            n_real * scale, rates=rates, seed=scale, templates=templates
+        )
+        for step, func in scaling_steps(network).items():
+            results.append(measure(f"{step} x{scale}", func, network.rows, repeat))
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="validation_classes.benchmarks")
+    parser.add_argument(
+        "--sheet-type", default="sampling", choices=["sampling", "measured"]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--replay", default=None, help="Also run end to end from this fixture dir"
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--scales",
+        default=None,
+        help="Also run over synthetic networks of these scales, e.g. 1,10,100",
+    )
+    parser.add_argument(
+        "--violation-rate",
+        type=float,
+        default=0.0,
+        help="Share of synthetic rows with each violation",
+    )
+    args = parser.parse_args(argv)
+
+    sheets = load_logsheets(args.sheet_type)
+    for result in bench_validation_paths(sheets, args.repeat):
+        print(result)
+    if args.replay:
+        print(bench_end_to_end(args.replay, args.latency, args.workers))
+    if args.scales:
+        from .synthetic import VIOLATIONS
+
+        scales = tuple(int(scale) for scale in args.scales.split(","))
+        rates = dict.fromkeys(VIOLATIONS, args.violation_rate)
+        for result in bench_scaling(scales, args.repeat, rates):
+            print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Sampling cadence of every observatory against the governance table.
+
+`observatories.Model` has each observatory's start_date, end_date and
+whether it does water column and soft substrate sampling, but nothing
+compares them with the sampling events in its logsheets. Here the
+collection_dates of all sampling sheets are stacked into one frame of
+events, and each observatory and strategy is checked in one pass:
+
+- missing_campaign: a campaign period (a quarter by default) between its
+  start_date and end_date (or as_of) without a sampling event
+- outside_window: a sample collected before its start_date or after its
+  end_date
+- strategy_not_flagged: a strategy with samples that the observatories
+  table has as "N"
+- flagged_without_samples: a strategy flagged "Y" without any samples
+
+    python -m validation_classes cadence --report cadence.csv
+
+Problems are added to the ErrorStore with model "cadence", and the report
+has one row per observatory and strategy.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .errors import ErrorStore
+from .integrity import stack_sheets
+from .pipeline import SheetJob
+
+# The flag of the observatories table for each sampling strategy
+STRATEGY_FLAGS = {"water_column": "water_column", "soft_sediment": "soft_substrates"}
+CAMPAIGN_FREQ = "Q"  # A pandas period frequency
+PAIR_KEYS = ["observatory_id", "sampling_strategy"]
+
+
+class CadenceReport(NamedTuple):
+    errors: ErrorStore
+    report: pd.DataFrame
+    counters: dict[str, int]
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(
+        values, errors="coerce", format="mixed", utc=True
+    ).dt.tz_localize(None)
+
+
+def _flag(values: pd.Series) -> pd.Series:
+    """The Y/N (or True/False) flags of the observatories table as bools."""
+    text = values.astype(str).str.strip().str.lower()
+    return text.isin(["y", "true", "1"])
+
+
+def sampling_samples(sampling: dict[SheetJob, pd.DataFrame]) -> pd.DataFrame:
+    """One row per sample of the sampling sheets, with its observatory_id,
+    sampling_strategy, source_mat_id and collection_date (NaT if it does
+    not parse).
+    """
+    rows = stack_sheets(sampling)
+    if "collection_date" not in rows:
+        rows["collection_date"] = None
+    samples = rows[[*PAIR_KEYS, "source_mat_id", "collection_date"]].copy()
+    samples["collection_date"] = _dates(samples["collection_date"])
+    return samples
+
+
+def governance_windows(
+    observatories: pd.DataFrame, as_of: pd.Timestamp
+) -> pd.DataFrame:
+    """One row per observatory and sampling strategy, with its flag and
+    active window (start_date to end_date, or to as_of if it has none).
+    """
+    windows = observatories[["observatory_id", "start_date", "end_date"]].copy()
+    windows["start_date"] = _dates(windows["start_date"])
+    windows["end_date"] = _dates(windows["end_date"])
+    windows["window_end"] = windows["end_date"].fillna(as_of).clip(upper=as_of)
+    return pd.concat(
+        [
+            windows.assign(
+                sampling_strategy=strategy, flagged=_flag(observatories[flag])
+            )
+            for strategy, flag in STRATEGY_FLAGS.items()
+        ],
+        ignore_index=True,
+    )
+
+
+def expected_campaigns(
+    windows: pd.DataFrame, as_of: pd.Timestamp, freq: str = CAMPAIGN_FREQ
+) -> pd.DataFrame:
+    """The campaign periods each flagged observatory and strategy should have
+    sampled: those of its window, up to and including the period of its
+    end_date, but not the period of as_of (which may still be under way).
+    """
+    flagged = windows[windows["flagged"] & windows["start_date"].notna()]
+    first = pd.PeriodIndex(flagged["start_date"].dt.to_period(freq)).asi8
+    last = pd.PeriodIndex(flagged["window_end"].dt.to_period(freq)).asi8
+    last = np.minimum(last, pd.Period(as_of, freq).ordinal - 1)
+    lengths = np.clip(last - first + 1, 0, None)
+    rows = np.repeat(np.arange(len(flagged)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    return pd.DataFrame(
+        {
+            "observatory_id": flagged["observatory_id"].to_numpy()[rows],
+            "sampling_strategy": flagged["sampling_strategy"].to_numpy()[rows],
+            "period": first[rows] + offsets,
+        }
+    )
+
+
+def _add(
+    errors: ErrorStore,
+    rows: pd.DataFrame,
+    *,
+    loc: str,
+    type: str,
+    msg: str,
+    value: str,
+) -> int:
+    for row in rows.to_dict(orient="records"):
+        errors.add(
+            observatory_id=row["observatory_id"],
+            sampling_strategy=row["sampling_strategy"],
+            sheet_type="sampling",
+            model="cadence",
+            source_mat_id=row.get("source_mat_id"),
+            loc=loc,
+            type=type,
+            msg=msg,
+            input=row[value],
+        )
+    return len(rows)
+
+
+def check_cadence(
+    observatories: pd.DataFrame,
+    sampling: dict[SheetJob, pd.DataFrame],
+    as_of: str | pd.Timestamp | None = None,
+    freq: str = CAMPAIGN_FREQ,
+) -> CadenceReport:
+    """Compares the collection_dates of the sampling sheets with the
+    observatories table (see `governance_windows`).
+
+    as_of defaults to the last collection_date of the network, i.e. the
+    date of the logsheets snapshot.
+    """
+    errors = ErrorStore()
+    samples = sampling_samples(sampling)
+    dated = samples[samples["collection_date"].notna()]
+    if as_of is None:
+        as_of = dated["collection_date"].max()
+        if pd.isna(as_of):
+            as_of = pd.Timestamp.now().normalize()
+    as_of = pd.Timestamp(as_of)
+
+    windows = governance_windows(observatories, as_of)
+    known = dated.merge(windows, on=PAIR_KEYS, how="inner")
+    pairs = samples[PAIR_KEYS].drop_duplicates()
+    counters = {
+        "samples": len(samples),
+        "undated_samples": len(samples) - len(dated),
+        "unknown_observatory_samples": int(
+            (~dated["observatory_id"].isin(windows["observatory_id"])).sum()
+        ),
+    }
+
+    # Samples outside the active window
+    outside = known[
+        (known["collection_date"] < known["start_date"])
+        | (known["end_date"].notna() & (known["collection_date"] > known["end_date"]))
+    ].assign(collection_date=lambda df: df["collection_date"].dt.date.astype(str))
+    counters["outside_window"] = _add(
+        errors,
+        outside,
+        loc="collection_date",
+        type="outside_window",
+        msg="Collected outside the start_date and end_date of the observatory",
+        value="collection_date",
+    )
+
+    # Strategies flagged "N" with samples and "Y" without
+    status = windows.merge(pairs, on=PAIR_KEYS, how="left", indicator=True)
+    status["sampled"] = status["_merge"] == "both"
+    not_flagged = status[~status["flagged"] & status["sampled"]]
+    counters["strategy_not_flagged"] = _add(
+        errors,
+        not_flagged.assign(flag=not_flagged["sampling_strategy"].map(STRATEGY_FLAGS)),
+        loc="sampling_strategy",
+        type="strategy_not_flagged",
+        msg="Flagged N in the observatories table, but has samples",
+        value="flag",
+    )
+    unsampled = status[status["flagged"] & ~status["sampled"]]
+    counters["flagged_without_samples"] = _add(
+        errors,
+        unsampled.assign(flag=unsampled["sampling_strategy"].map(STRATEGY_FLAGS)),
+        loc="sampling_strategy",
+        type="flagged_without_samples",
+        msg="Flagged Y in the observatories table, but has no samples",
+        value="flag",
+    )
+
+    # Campaign periods without an event, of the strategies with samples
+    expected = expected_campaigns(
+        windows.merge(pairs, on=PAIR_KEYS, how="inner"), as_of, freq
+    )
+    sampled = dated[PAIR_KEYS].assign(
+        period=pd.PeriodIndex(dated["collection_date"].dt.to_period(freq)).asi8
+    )
+    campaigns = expected.merge(
+        sampled.drop_duplicates(), on=[*PAIR_KEYS, "period"], how="left", indicator=True
+    )
+    campaigns["missing"] = campaigns["_merge"] == "left_only"
+    missing = campaigns[campaigns["missing"]]
+    counters["missing_campaign"] = _add(
+        errors,
+        missing.assign(
+            period=pd.PeriodIndex.from_ordinals(missing["period"], freq=freq).astype(
+                str
+            )
+        ),
+        loc="collection_date",
+        type="missing_campaign",
+        msg="No sampling event in this campaign period",
+        value="period",
+    )
+
+    # One row per observatory and strategy
+    by_pair = dated.groupby(PAIR_KEYS)["collection_date"]
+    observed = pd.DataFrame(
+        {
+            "first_event": by_pair.min(),
+            "last_event": by_pair.max(),
+            "events": by_pair.nunique(),
+            "samples": samples.groupby(PAIR_KEYS).size(),
+        }
+    )
+    campaign_counts = campaigns.groupby(PAIR_KEYS)["missing"]
+    report = (
+        windows.set_index(PAIR_KEYS)[["flagged", "start_date", "end_date"]]
+        .join(observed, how="outer")
+        .join(
+            pd.DataFrame(
+                {
+                    "expected_campaigns": campaign_counts.size(),
+                    "missing_campaigns": campaign_counts.sum(),
+                }
+            )
+        )
+        .join(outside.groupby(PAIR_KEYS).size().rename("outside_window"))
+    )
+    count_columns = [
+        "events",
+        "samples",
+        "expected_campaigns",
+        "missing_campaigns",
+        "outside_window",
+    ]
+    report[count_columns] = report[count_columns].fillna(0).astype(int)
+    report["flagged"] = report["flagged"].astype("boolean")
+    counters["errors"] = len(errors)
+    return CadenceReport(errors, report.sort_index(), counters)
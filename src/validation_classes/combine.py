@@ -0,0 +1,137 @@
+"""Combine each observatory's validated sampling and measured sheets.
+
+Only sampling events that were sent for sequencing, i.e. have a ref_code
+in the run-information sheets, and have a measured row are combined.
+This is the combine step of the metadata-validation notebook done with
+joins rather than a scan of the measured rows for every sampling event.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from .metrics import RunMetrics, stage_timer
+from .pipeline import VALIDATED_DATA_DIR
+from .rules import default_rules
+from .uniqueness import INDEX_PATH, KeyIndex
+
+LOGSHEETS_DIR = VALIDATED_DATA_DIR / "logsheets"
+COMBINED_DIR = VALIDATED_DATA_DIR / "combined_logsheets"
+
+
+def known_duplicates(index_path: str | Path = INDEX_PATH) -> tuple[str, ...]:
+    """The real duplicates in the sampling sheets, which are left out of the
+    combine: the source_mat_ids used more than once in the key index (see
+    the keys command), and any listed in rules.json.
+    """
+    duplicated = KeyIndex.load(index_path).duplicated("source_mat_id")
+    return tuple(sorted({*duplicated, *default_rules().known_duplicates}))
+
+
+def combine_observatory(
+    observatory_id: str,
+    sampling: pd.DataFrame,
+    measured: pd.DataFrame,
+    refcodes: dict[str, str],
+    duplicates: tuple[str, ...] | None = None,
+) -> tuple[pd.DataFrame, dict[str, int]]:
+    """Returns the combined sampling events, indexed on source_mat_id, and
+    counters of the sampling events that were not combined and why.
+    duplicates defaults to `known_duplicates()`.
+
+    The sampling and measured frames are as read from the validated CSVs,
+    i.e. with source_mat_id as a column.
+    """
+    if duplicates is None:
+        duplicates = known_duplicates()
+    sampling_ids = sampling["source_mat_id"]
+    is_duplicate = sampling_ids.isin(duplicates)
+    ref_code = sampling_ids.map(refcodes)
+    has_refcode = ref_code.notna() & ~is_duplicate
+
+    events = sampling[has_refcode].copy()
+    events["ref_code"] = ref_code[has_refcode]
+    events["obs_id"] = observatory_id
+
+    # The first measured row of each source_mat_id, as the notebook did
+    measured = measured.drop_duplicates("source_mat_id", keep="first")
+    # An inner merge keeps the order of the sampling events
+    combined = events.merge(measured, on="source_mat_id", how="inner")
+
+    duplicated = combined["ref_code"].duplicated(keep=False)
+    if duplicated.any():
+        raise ValueError(
+            f"Error: ref_codes {sorted(combined.loc[duplicated, 'ref_code'].unique())} "
+            f"match more than one sampling event of {observatory_id}"
+        )
+
+    counters = {
+        "sampling_events": len(sampling),
+        "duplicates_ignored": int(is_duplicate.sum()),
+        "no_refcode": int((ref_code.isna() & ~is_duplicate).sum()),
+        "missing_measured": len(events) - len(combined),
+        "combined_events": len(combined),
+    }
+    return combined.set_index("source_mat_id"), counters
+
+
+def combine_logsheets(
+    observatories: list[tuple[str, str]],
+    refcodes: dict[str, str],
+    logsheets_dir: str | Path = LOGSHEETS_DIR,
+    save_dir: str | Path | None = None,
+    duplicates: tuple[str, ...] | None = None,
+    metrics: RunMetrics | None = None,
+) -> tuple[dict[tuple[str, str], pd.DataFrame], dict[str, int]]:
+    """Combines the validated sheets of each (observatory_id, strategy),
+    optionally writing each to save_dir as the notebook does. The counters
+    and combine time of each are added to metrics, as sheet "combined".
+
+    Returns the combined frames and the counters summed over them.
+    """
+    logsheets_dir = Path(logsheets_dir)
+    if duplicates is None:
+        duplicates = known_duplicates()
+    frames = {}
+    totals: dict[str, int] = {}
+    for observatory_id, sampling_strategy in observatories:
+        prefix = f"{observatory_id}_{sampling_strategy}"
+        timings: dict[str, float] = {}
+        with stage_timer(timings, "combine"):
+            sampling = pd.read_csv(logsheets_dir / f"{prefix}_sampling_validated.csv")
+            measured = pd.read_csv(logsheets_dir / f"{prefix}_measured_validated.csv")
+            combined, counters = combine_observatory(
+                observatory_id, sampling, measured, refcodes, duplicates
+            )
+        for k, v in counters.items():
+            totals[k] = totals.get(k, 0) + v
+        frames[(observatory_id, sampling_strategy)] = combined
+        if save_dir is not None and not combined.empty:
+            Path(save_dir).mkdir(parents=True, exist_ok=True)
+            with stage_timer(timings, "write"):
+                combined.to_csv(Path(save_dir) / f"{prefix}_combined_validated.csv")
+        if metrics is not None:
+            key = (observatory_id, sampling_strategy, "combined", "combined")
+            metrics.add_counters(key, counters)
+            for stage, seconds in timings.items():
+                metrics.add_time(key, stage, seconds)
+    return frames, totals
+
+
+def combine_network(frames: dict[tuple[str, str], pd.DataFrame]) -> pd.DataFrame:
+    """Stacks the combined frames of all observatories into the single
+    metadata table, with env_package set to the sampling strategy.
+    """
+    stacked = []
+    for (_, sampling_strategy), df in frames.items():
+        if df.empty:
+            continue
+        df = df.reset_index()
+        # This is the name given in the Observatory sheet Google Spreadsheet
+        df["env_package"] = sampling_strategy
+        stacked.append(df)
+    if not stacked:
+        return pd.DataFrame()
+    return pd.concat(stacked, ignore_index=True)
@@ -0,0 +1,164 @@
+"""Mandatory-field completeness of every observatory's sampling sheet.
+
+Rather than one run, and one ERRORS.log, per observatory with the
+mandatory models, every sampling sheet is read once and the fill rate,
+not-available rate and type-failure rate of each mandatory field are
+computed column-wise. The result is a single field x observatory table.
+"""
+
+from __future__ import annotations
+
+import types
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from .mandatory import SoftSedimentDataModel, WaterColumnDataModel
+from .pipeline import SheetJob, get_sheet
+from .rules import default_rules, source_mat_id_mask
+
+MANDATORY_MODELS: dict[str, type[BaseModel]] = {
+    "water_column": WaterColumnDataModel,
+    "soft_sediment": SoftSedimentDataModel,
+}
+
+# Written in the sheets rather than leaving the cell empty
+NOT_AVAILABLE = ("na", "n a", "n/a", "n / a", "none")
+
+METRICS = ("fill_rate", "not_available_rate", "type_failure_rate")
+
+
+def mandatory_fields(model: type[BaseModel]) -> list[str]:
+    return [name for name, info in model.model_fields.items() if info.is_required()]
+
+
+def field_kind(annotation: Any) -> str:
+    """Reduces a field annotation to what the type check needs:
+    'any' (str and numbers), 'str', 'int' or 'float'.
+    """
+    if isinstance(annotation, types.UnionType) or (
+        typing.get_origin(annotation) is typing.Union
+    ):
+        args = set(typing.get_args(annotation)) - {type(None)}
+    else:
+        args = {annotation}
+    if str in args:
+        return "any" if args & {int, float} else "str"
+    if float in args:
+        return "float"
+    if int in args:
+        return "int"
+    return "any"
+
+
+def _is_str(column: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(column):
+        return pd.Series(False, index=column.index)
+    return column.map(lambda value: isinstance(value, str)).astype(bool)
+
+
+def column_masks(column: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Returns (filled, not_available) masks for a sheet column."""
+    is_str = _is_str(column)
+    text = column.where(is_str, "").astype(str).str.strip().str.lower()
+    blank = column.isna() | (is_str & (text == ""))
+    not_available = is_str & text.isin(NOT_AVAILABLE)
+    return ~blank & ~not_available, not_available
+
+
+def type_failures(column: pd.Series, kind: str, filled: pd.Series) -> pd.Series:
+    """Returns a mask of the filled values the field's type would reject."""
+    if kind == "any":
+        return pd.Series(False, index=column.index)
+    if kind == "str":
+        return filled & ~_is_str(column)
+    numbers = pd.to_numeric(column, errors="coerce")
+    failed = numbers.isna()
+    if kind == "int":
+        failed |= (numbers % 1).fillna(0) != 0
+    return filled & failed
+
+
+def sheet_completeness(
+    df: pd.DataFrame, model: type[BaseModel], fields: list[str] | None = None
+) -> pd.DataFrame:
+    """Returns a (field x metric) frame of rates for one sheet. Fields that
+    are missing from the sheet altogether have a fill rate of 0.
+    """
+    if fields is None:
+        fields = mandatory_fields(model)
+    n_rows = len(df)
+    rows = {}
+    for field in fields:
+        if field not in df.columns or n_rows == 0:
+            rows[field] = (0.0, 0.0, 0.0)
+            continue
+        column = df[field]
+        filled, not_available = column_masks(column)
+        kind = field_kind(model.model_fields[field].annotation)
+        failed = type_failures(column, kind, filled)
+        rows[field] = (
+            filled.sum() / n_rows,
+            not_available.sum() / n_rows,
+            failed.sum() / n_rows,
+        )
+    return pd.DataFrame.from_dict(rows, orient="index", columns=list(METRICS))
+
+
+def completeness_matrix(sheets: dict[SheetJob, pd.DataFrame]) -> pd.DataFrame:
+    """Returns the rates of every mandatory field of every sheet as a long
+    frame indexed on (sampling_strategy, field, observatory_id), along with
+    the number of rows and whether the field is in the sheet at all.
+    """
+    frames = []
+    for job, df in sheets.items():
+        model = MANDATORY_MODELS[job.sampling_strategy]
+        scope = (job.observatory_id, job.sampling_strategy, job.model)
+        df = default_rules().apply(df, *scope)
+        if "source_mat_id" in df.columns:
+            df = df[source_mat_id_mask(df, *scope)]
+        rates = sheet_completeness(df, model)
+        rates["present"] = rates.index.isin(df.columns)
+        rates["rows"] = len(df)
+        rates["sampling_strategy"] = job.sampling_strategy
+        rates["observatory_id"] = job.observatory_id
+        frames.append(rates.rename_axis("field").reset_index())
+    if not frames:
+        return pd.DataFrame(
+            columns=[*METRICS, "present", "rows"],
+            index=pd.MultiIndex.from_tuples(
+                [], names=["sampling_strategy", "field", "observatory_id"]
+            ),
+        )
+    matrix = pd.concat(frames, ignore_index=True)
+    matrix[list(METRICS)] = matrix[list(METRICS)].astype(np.float64).round(4)
+    return matrix.set_index(["sampling_strategy", "field", "observatory_id"])
+
+
+def pivot(matrix: pd.DataFrame, metric: str = "fill_rate") -> pd.DataFrame:
+    """Returns one metric as a (sampling_strategy, field) x observatory table."""
+    return matrix[metric].unstack("observatory_id")
+
+
+def read_sampling_sheets(
+    jobs: list[SheetJob], max_workers: int = 8
+) -> dict[SheetJob, pd.DataFrame]:
+    """Fetches each sampling sheet once, in threads as it's all network."""
+    jobs = [job for job in jobs if job.sheet_type == "sampling"]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = pool.map(lambda job: get_sheet(job.sheet_link, job.sheet_type), jobs)
+        return dict(zip(jobs, frames, strict=True))
+
+
+def write_report(matrix: pd.DataFrame, out_path: str | Path) -> None:
+    """Writes the long table, and a wide fill-rate table next to it."""
+    out_path = Path(out_path)
+    matrix.to_csv(out_path)
+    pivot(matrix, "fill_rate").to_csv(
+        out_path.with_name(out_path.stem + "_fill_rate.csv")
+    )
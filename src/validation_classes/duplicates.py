@@ -0,0 +1,185 @@
+"""Sampling events logged twice under different source_mat_ids.
+
+A duplicated source_mat_id is caught by `uniqueness.py`, but the usual
+duplicate is the same event entered again under a slightly different id:
+same observatory, collection_date, size_frac, replicate and
+sampling_event. Soft sediments have no size_frac, so their
+size_frac_low and size_frac_up, investigation_type and samp_description
+are compared as well, which tell e.g. a meio from a macro sample.
+
+Comparing every pair of samples of the network grows with its square, so
+the samples are blocked on observatory and collection_date first and only
+the pairs within a block are compared, on their key fields normalized,
+e.g. a size_frac of ".2-3 µm" as "0.2-3" and a sampling_event of
+"OSD74 Wa 211218" as "osd74wa211218". Blocks are a day of one
+observatory, so the number of pairs grows linearly with the network.
+
+    python -m validation_classes duplicates --report pairs.csv
+
+Both samples of a pair are added to the ErrorStore with model
+"duplicates", each with the other's source_mat_id as input.
+"""
+
+from __future__ import annotations
+
+import difflib
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .errors import ErrorStore
+from .integrity import stack_sheets
+from .pipeline import SheetJob
+
+BLOCK_FIELDS = ("observatory_id", "collection_date")
+KEY_FIELDS = (
+    "size_frac",
+    "size_frac_low",
+    "size_frac_up",
+    "replicate",
+    "sampling_event",
+    "investigation_type",
+    "samp_description",
+)
+NUMBER = re.compile(r"\d*[.,]?\d+")
+UNITS = re.compile(r"µm|μm|um|microns?")
+
+
+class DuplicateReport(NamedTuple):
+    errors: ErrorStore
+    pairs: pd.DataFrame
+    counters: dict[str, int]
+
+
+def _text(values: pd.Series) -> pd.Series:
+    """The values as lower case text, with NaN as ""."""
+    return values.astype(object).where(values.notna(), "").astype(str).str.lower()
+
+
+def _number(match: re.Match[str]) -> str:
+    return f"{float(match.group().replace(',', '.')):g}"
+
+
+def normalize_size_frac(values: pd.Series) -> pd.Series:
+    """E.g. ".2-3 µm" and "0.2 - 3" as "0.2-3", and 20.0 as "20"."""
+    text = _text(values).str.replace(UNITS, "", regex=True)
+    text = text.str.replace(r"\s+", "", regex=True)
+    return text.str.replace(NUMBER, _number, regex=True)
+
+
+def normalize_replicate(values: pd.Series) -> pd.Series:
+    """E.g. 1.0 as "1" and "Blank 1" as "blank1"."""
+    text = _text(values).str.replace(r"[\s_-]+", "", regex=True)
+    return text.str.replace(NUMBER, _number, regex=True)
+
+
+def normalize_text(values: pd.Series) -> pd.Series:
+    """Letters and digits only, e.g. "OSD74 Wa 211218" as "osd74wa211218"."""
+    return _text(values).str.replace(r"[\W_]+", "", regex=True)
+
+
+NORMALIZERS = {
+    "size_frac": normalize_size_frac,
+    "size_frac_low": normalize_size_frac,
+    "size_frac_up": normalize_size_frac,
+    "replicate": normalize_replicate,
+    "sampling_event": normalize_text,
+    "investigation_type": normalize_text,
+    "samp_description": normalize_text,
+}
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(
+        values, errors="coerce", format="mixed", utc=True
+    ).dt.tz_localize(None)
+
+
+def candidate_pairs(samples: pd.DataFrame) -> pd.DataFrame:
+    """Every pair of samples (a before b) within a block, as the row
+    positions a and b of samples.
+    """
+    blocks = samples.groupby(list(BLOCK_FIELDS), sort=False).ngroup().to_numpy()
+    order = np.argsort(blocks, kind="stable")
+    sizes = np.bincount(blocks)
+    starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    # Within its block, each sample is paired with those after it
+    later = np.repeat(sizes, sizes) - (np.arange(len(order)) - starts) - 1
+    a = np.repeat(np.arange(len(order)), later)
+    b = a + 1 + np.arange(len(a)) - np.repeat(np.cumsum(later) - later, later)
+    return pd.DataFrame({"a": order[a], "b": order[b]})
+
+
+def _add(
+    errors: ErrorStore,
+    samples: pd.DataFrame,
+    positions: np.ndarray,
+    others: np.ndarray,
+) -> None:
+    rows = samples.iloc[positions].to_dict(orient="records")
+    for row, other in zip(
+        rows, samples["source_mat_id"].to_numpy()[others], strict=True
+    ):
+        errors.add(
+            observatory_id=row["observatory_id"],
+            sampling_strategy=row["sampling_strategy"],
+            sheet_type="sampling",
+            model="duplicates",
+            source_mat_id=row["source_mat_id"],
+            loc="source_mat_id",
+            type="fuzzy_duplicate",
+            msg="Same observatory, collection_date and key fields as another sample",
+            input=other,
+        )
+
+
+def find_duplicates(sampling: dict[SheetJob, pd.DataFrame]) -> DuplicateReport:
+    """Compares the samples of the sampling sheets that share a block (see
+    `candidate_pairs`) on their normalized KEY_FIELDS. Pairs with the same
+    source_mat_id are left to `uniqueness.py`.
+    """
+    errors = ErrorStore()
+    rows = stack_sheets(sampling)
+    for field in ("source_mat_id", "collection_date", *KEY_FIELDS):
+        if field not in rows:
+            rows[field] = None
+    rows["collection_date"] = _dates(rows["collection_date"])
+    samples = rows[rows["collection_date"].notna()].reset_index(drop=True)
+
+    pairs = candidate_pairs(samples)
+    a = pairs["a"].to_numpy()
+    b = pairs["b"].to_numpy()
+    ids = samples["source_mat_id"].to_numpy()
+    same = ids[a] != ids[b]
+    for field in KEY_FIELDS:
+        keys = NORMALIZERS[field](samples[field]).to_numpy()
+        same &= keys[a] == keys[b]
+    a, b = a[same], b[same]
+
+    _add(errors, samples, a, b)
+    _add(errors, samples, b, a)
+    report = pd.DataFrame(
+        {
+            "observatory_id": samples["observatory_id"].to_numpy()[a],
+            "collection_date": samples["collection_date"].dt.date.to_numpy()[a],
+            "source_mat_id_a": ids[a],
+            "sampling_strategy_a": samples["sampling_strategy"].to_numpy()[a],
+            "source_mat_id_b": ids[b],
+            "sampling_strategy_b": samples["sampling_strategy"].to_numpy()[b],
+            "id_similarity": [
+                round(difflib.SequenceMatcher(None, str(x), str(y)).ratio(), 3)
+                for x, y in zip(ids[a], ids[b], strict=True)
+            ],
+        }
+    )
+    counters = {
+        "samples": len(rows),
+        "undated_samples": len(rows) - len(samples),
+        "blocks": samples.groupby(list(BLOCK_FIELDS)).ngroups,
+        "candidate_pairs": len(pairs),
+        "duplicate_pairs": len(report),
+        "errors": len(errors),
+    }
+    return DuplicateReport(errors, report, counters)
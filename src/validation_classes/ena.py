@@ -0,0 +1,329 @@
+"""Export the combined logsheets as ENA sample checklists.
+
+The validated sampling fields are MIxS terms, so each combined sampling
+event maps onto an ENA sample of the GSC MIxS water (ERC000024) or
+sediment (ERC000021) checklist: sample_alias is the source_mat_id and
+the attributes come from the event (SAMPLE_ATTRIBUTES) and from its
+observatory sheet (OBSERVATORY_ATTRIBUTES, e.g. the latitude).
+
+The combined CSVs are read one row at a time with the csv module and the
+samples are written to numbered batch files of at most batch_size
+samples per checklist, as the Webin spreadsheet TSV and/or SAMPLE_SET
+XML. Memory does not grow with the number of samples. Samples with an
+ENA_accession_number_sample are skipped, and those missing a mandatory
+attribute are added to the ErrorStore with model "ena".
+
+    python -m validation_classes ena --out ena/ --format tsv xml
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+from pathlib import Path
+from typing import IO, Any, NamedTuple
+from xml.sax.saxutils import escape, quoteattr
+
+from .errors import ErrorStore
+from .pipeline import VALIDATED_DATA_DIR
+
+COMBINED_DIR = VALIDATED_DATA_DIR / "combined_logsheets"
+LOGSHEETS_DIR = VALIDATED_DATA_DIR / "logsheets"
+
+CHECKLISTS = {"water_column": "ERC000024", "soft_sediment": "ERC000021"}
+# The env_package of the combined network, see loaders.load_combined
+ENV_PACKAGES = {"water": "water_column", "sediment": "soft_sediment"}
+# (column, checklist attribute, units)
+SAMPLE_ATTRIBUTES = (
+    ("source_mat_id", "source material identifiers", None),
+    ("collection_date", "collection date", None),
+    ("depth", "depth", "m"),
+    ("env_material", "environmental medium", None),
+    ("samp_collect_device", "sample collection device", None),
+    ("samp_mat_process", "sample material processing", None),
+    ("size_frac", "size fraction selected", None),
+    ("samp_size_vol", "amount or size of sample collected", "L"),
+    ("samp_store_temp", "sample storage temperature", "ºC"),
+    ("samp_store_loc", "sample storage location", None),
+    ("tidal_stage", "tidal stage", None),
+    ("sea_surf_temp", "temperature", "ºC"),
+    ("sea_surf_salinity", "salinity", "psu"),
+    ("ph", "pH", None),
+    ("chlorophyll", "chlorophyll", "mg/m3"),
+    ("diss_oxygen", "dissolved oxygen", "µmol/kg"),
+)
+OBSERVATORY_ATTRIBUTES = (
+    ("project_name", "project name", None),
+    ("latitude", "geographic location (latitude)", "DD"),
+    ("longitude", "geographic location (longitude)", "DD"),
+    ("geo_loc_name", "geographic location (country and/or sea)", None),
+    ("loc_loc", "geographic location (region and locality)", None),
+    ("env_broad_biome", "broad-scale environmental context", None),
+    ("env_local", "local environmental context", None),
+    ("tot_depth_water_col", "total depth of water column", "m"),
+)
+MANDATORY_ATTRIBUTES = (
+    "collection date",
+    "geographic location (country and/or sea)",
+    "geographic location (latitude)",
+    "geographic location (longitude)",
+    "broad-scale environmental context",
+    "local environmental context",
+    "environmental medium",
+)
+SAMPLE_FIELDS = (
+    "sample_alias",
+    "tax_id",
+    "scientific_name",
+    "common_name",
+    "sample_title",
+    "sample_description",
+)
+BATCH_SIZE = 1000
+
+
+class EnaSample(NamedTuple):
+    alias: str
+    tax_id: str
+    scientific_name: str
+    title: str
+    description: str
+    attributes: dict[str, str]  # {attribute: value}, without empty values
+
+
+def _text(value: Any) -> str:
+    """value as in the sheet, with integral floats as ints (e.g. tax_id)."""
+    if value is None:
+        return ""
+    text = str(value).strip()
+    return re.sub(r"^(-?\d+)\.0$", r"\1", text)
+
+
+def read_observatory_sheets(
+    logsheets_dir: str | Path = LOGSHEETS_DIR,
+) -> dict[tuple[str, str], dict[str, str]]:
+    """{(observatory_id, sampling_strategy): its observatory sheet row}"""
+    sheets = {}
+    for path in sorted(Path(logsheets_dir).glob("*_observatory_validated.csv")):
+        observatory_id, rest = path.name.split("_", 1)
+        strategy = rest.removesuffix("_observatory_validated.csv")
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                sheets[(observatory_id, strategy)] = row
+                break
+    return sheets
+
+
+def iter_combined(paths: Iterable[str | Path]) -> Iterator[tuple[str, dict[str, str]]]:
+    """(sampling_strategy, row) of each row of the combined CSVs, one at a
+    time. The strategy is the row's env_package, or else from the file
+    name (<observatory>_<strategy>_combined_validated.csv).
+    """
+    for path in paths:
+        name = Path(path).name
+        strategy = None
+        if name.endswith("_combined_validated.csv"):
+            strategy = name.removesuffix("_combined_validated.csv").split("_", 1)[-1]
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                package = row.get("env_package")
+                yield ENV_PACKAGES.get(package, package or strategy or ""), row
+
+
+def to_sample(row: dict[str, str], observatory: dict[str, str] | None) -> EnaSample:
+    attributes = {}
+    for columns, source in (
+        (SAMPLE_ATTRIBUTES, row),
+        (OBSERVATORY_ATTRIBUTES, observatory or {}),
+    ):
+        for column, attribute, _ in columns:
+            value = _text(source.get(column))
+            if value:
+                attributes[attribute] = value
+    return EnaSample(
+        alias=_text(row.get("source_mat_id")),
+        tax_id=_text(row.get("tax_id")),
+        scientific_name=_text(row.get("scientific_name")),
+        title=_text(row.get("source_mat_id_orig")) or _text(row.get("source_mat_id")),
+        description=_text(row.get("samp_description")),
+        attributes=attributes,
+    )
+
+
+class _BatchWriter:
+    """Writes the samples of one checklist to numbered TSV and XML files of
+    at most batch_size samples.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        checklist: str,
+        formats: tuple[str, ...],
+        batch_size: int,
+    ) -> None:
+        self.out_dir = out_dir
+        self.checklist = checklist
+        self.formats = formats
+        self.batch_size = batch_size
+        self.attributes = [
+            (attribute, units)
+            for _, attribute, units in (*SAMPLE_ATTRIBUTES, *OBSERVATORY_ATTRIBUTES)
+        ]
+        self.batch = 0
+        self.count = 0
+        self.stack = ExitStack()  # The open files of the batch
+        self.files: dict[str, IO[str]] = {}
+        self.tsv: Any = None  # The csv.writer of the TSV file
+        self.paths: list[Path] = []
+
+    def _open(self) -> None:
+        self.batch += 1
+        stem = self.out_dir / f"{self.checklist}_samples_{self.batch:04d}"
+        if "tsv" in self.formats:
+            f = self.stack.enter_context(
+                stem.with_suffix(".tsv").open("w", newline="", encoding="utf-8")
+            )
+            self.tsv = csv.writer(f, delimiter="\t", lineterminator="\n")
+            self.tsv.writerow(["#checklist_accession", self.checklist])
+            self.tsv.writerow(["#unique_name_prefix", ""])
+            self.tsv.writerow([*SAMPLE_FIELDS, *(a for a, _ in self.attributes)])
+            self.tsv.writerow(
+                ["#units", *[""] * (len(SAMPLE_FIELDS) - 1)]
+                + [units or "" for _, units in self.attributes]
+            )
+            self.files["tsv"] = f
+            self.paths.append(Path(f.name))
+        if "xml" in self.formats:
+            f = self.stack.enter_context(
+                stem.with_suffix(".xml").open("w", encoding="utf-8")
+            )
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<SAMPLE_SET>\n')
+            self.files["xml"] = f
+            self.paths.append(Path(f.name))
+
+    def close(self) -> None:
+        if "xml" in self.files:
+            self.files["xml"].write("</SAMPLE_SET>\n")
+        self.stack.close()
+        self.files = {}
+        self.count = 0
+
+    def write(self, sample: EnaSample) -> None:
+        if not self.files:
+            self._open()
+        if "tsv" in self.files:
+            self.tsv.writerow(
+                [
+                    sample.alias,
+                    sample.tax_id,
+                    sample.scientific_name,
+                    "",
+                    sample.title,
+                    sample.description,
+                    *(sample.attributes.get(a, "") for a, _ in self.attributes),
+                ]
+            )
+        if "xml" in self.files:
+            self.files["xml"].write(sample_xml(sample, self.checklist, self.attributes))
+        self.count += 1
+        if self.count >= self.batch_size:
+            self.close()
+
+
+def sample_xml(
+    sample: EnaSample,
+    checklist: str,
+    attributes: list[tuple[str, str | None]],
+) -> str:
+    """The <SAMPLE> element of a sample."""
+    lines = [
+        f"  <SAMPLE alias={quoteattr(sample.alias)}>",
+        f"    <TITLE>{escape(sample.title)}</TITLE>",
+        "    <SAMPLE_NAME>",
+        f"      <TAXON_ID>{escape(sample.tax_id)}</TAXON_ID>",
+        f"      <SCIENTIFIC_NAME>{escape(sample.scientific_name)}</SCIENTIFIC_NAME>",
+        "    </SAMPLE_NAME>",
+        f"    <DESCRIPTION>{escape(sample.description)}</DESCRIPTION>",
+        "    <SAMPLE_ATTRIBUTES>",
+    ]
+    values = [(a, sample.attributes.get(a), units) for a, units in attributes]
+    for attribute, value, units in [*values, ("ENA-CHECKLIST", checklist, None)]:
+        if not value:
+            continue
+        lines.append("      <SAMPLE_ATTRIBUTE>")
+        lines.append(f"        <TAG>{escape(attribute)}</TAG>")
+        lines.append(f"        <VALUE>{escape(value)}</VALUE>")
+        if units:
+            lines.append(f"        <UNITS>{escape(units)}</UNITS>")
+        lines.append("      </SAMPLE_ATTRIBUTE>")
+    lines += ["    </SAMPLE_ATTRIBUTES>", "  </SAMPLE>", ""]
+    return "\n".join(lines)
+
+
+def export_samples(
+    paths: Iterable[str | Path],
+    out_dir: str | Path,
+    formats: tuple[str, ...] = ("tsv", "xml"),
+    batch_size: int = BATCH_SIZE,
+    logsheets_dir: str | Path = LOGSHEETS_DIR,
+    errors: ErrorStore | None = None,
+) -> tuple[list[Path], dict[str, int]]:
+    """Streams the combined CSVs at paths into ENA checklist batches in
+    out_dir. Returns the files written and the counters.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    observatories = read_observatory_sheets(logsheets_dir)
+    errors = errors if errors is not None else ErrorStore()
+    writers: dict[str, _BatchWriter] = {}
+    counters = dict.fromkeys(
+        ["samples", "already_submitted", "unknown_strategy", "incomplete", "exported"],
+        0,
+    )
+    try:
+        for strategy, row in iter_combined(paths):
+            counters["samples"] += 1
+            if _text(row.get("ENA_accession_number_sample")):
+                counters["already_submitted"] += 1
+                continue
+            if strategy not in CHECKLISTS:
+                counters["unknown_strategy"] += 1
+                continue
+            observatory_id = row.get("obs_id", "")
+            sample = to_sample(row, observatories.get((observatory_id, strategy)))
+            missing = [
+                attribute
+                for attribute in MANDATORY_ATTRIBUTES
+                if attribute not in sample.attributes
+            ]
+            if not sample.tax_id or not sample.scientific_name:
+                missing.append("tax_id" if not sample.tax_id else "scientific_name")
+            if missing:
+                counters["incomplete"] += 1
+                for attribute in missing:
+                    errors.add(
+                        observatory_id=observatory_id,
+                        sampling_strategy=strategy,
+                        sheet_type="combined",
+                        model="ena",
+                        source_mat_id=sample.alias,
+                        loc=attribute,
+                        type="missing_checklist_attribute",
+                        msg=f"Mandatory in the {CHECKLISTS[strategy]} checklist",
+                        input=None,
+                    )
+                continue
+            checklist = CHECKLISTS[strategy]
+            if checklist not in writers:
+                writers[checklist] = _BatchWriter(
+                    out_dir, checklist, formats, batch_size
+                )
+            writers[checklist].write(sample)
+            counters["exported"] += 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return [path for writer in writers.values() for path in writer.paths], counters
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+from typing import Any
+
+from pydantic import ValidationError
+
+# One flat record per error, whatever raised it (pydantic or a cross-check).
+# The first four fields say which sheet the error came from.
+ERROR_FIELDS = (
+    "observatory_id",
+    "sampling_strategy",
+    "sheet_type",
+    "model",
+    "source_mat_id",
+    "loc",
+    "type",
+    "msg",
+    "input",
+)
+
+# Errors are compressed into one group per distinct (model, loc, type, msg)
+GROUP_FIELDS = ("model", "loc", "type", "msg")
+SHEET_FIELDS = ("observatory_id", "sampling_strategy", "sheet_type")
+COMPRESSED_VERSION = 1
+
+
+def _runs(positions: list[int]) -> list[list[int]]:
+    """[[start, length], ...] of the consecutive runs in positions."""
+    runs: list[list[int]] = []
+    for position in positions:
+        if runs and runs[-1][0] + runs[-1][1] == position:
+            runs[-1][1] += 1
+        else:
+            runs.append([position, 1])
+    return runs
+
+
+def _positions(runs: list[list[int]]) -> list[int]:
+    return [position for start, n in runs for position in range(start, start + n)]
+
+
+class ErrorStore:
+    """Collects error records from validation and from the cross-sheet checks.
+
+    Records are kept in insertion order so that a run over the same sheets
+    always produces the same output.
+    """
+
+    def __init__(self) -> None:
+        self.records: list[dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def add(
+        self,
+        *,
+        observatory_id: str | None,
+        sampling_strategy: str | None,
+        sheet_type: str | None,
+        model: str,
+        source_mat_id: str | None,
+        loc: tuple[str | int, ...] | str,
+        type: str,
+        msg: str,
+        input: Any = None,
+    ) -> None:
+        if isinstance(loc, str):
+            loc = (loc,)
+        self.records.append(
+            {
+                "observatory_id": observatory_id,
+                "sampling_strategy": sampling_strategy,
+                "sheet_type": sheet_type,
+                "model": model,
+                "source_mat_id": source_mat_id,
+                "loc": tuple(loc),
+                "type": type,
+                "msg": msg,
+                "input": input,
+            }
+        )
+
+    def add_validation_error(
+        self,
+        error: ValidationError,
+        *,
+        model: str,
+        observatory_id: str | None,
+        sampling_strategy: str | None,
+        sheet_type: str | None,
+        source_mat_id: str | None,
+    ) -> None:
+        for e in error.errors(include_url=False, include_context=False):
+            self.add(
+                observatory_id=observatory_id,
+                sampling_strategy=sampling_strategy,
+                sheet_type=sheet_type,
+                model=model,
+                source_mat_id=source_mat_id,
+                loc=e["loc"],
+                type=e["type"],
+                msg=e["msg"],
+                input=e.get("input"),
+            )
+
+    def extend(self, other: ErrorStore | list[dict[str, Any]]) -> None:
+        records = other.records if isinstance(other, ErrorStore) else other
+        self.records.extend(records)
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame.from_records(self.records, columns=list(ERROR_FIELDS))
+
+    def write_csv(self, path: str | Path) -> None:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=ERROR_FIELDS)
+            writer.writeheader()
+            for record in self.records:
+                writer.writerow({**record, "loc": ".".join(map(str, record["loc"]))})
+
+    def compress(self, keep_row_inputs: bool = False) -> dict[str, Any]:
+        """Groups the records by (model, loc, type, msg). The source_mat_ids
+        of each sheet are listed once, and a group refers to them by runs of
+        positions, so the errors of a column that fails on every row take a
+        few numbers. Each group keeps its distinct inputs once.
+
+        `ErrorStore.expand()` gives the records back, in group order. The
+        only loss is dict inputs, i.e. the whole row that pydantic gives
+        for a missing field, which are dropped unless keep_row_inputs.
+        """
+        sheets: list[list[Any]] = []
+        sheet_indexes: dict[tuple[Any, ...], int] = {}
+        id_positions: list[dict[Any, int]] = []
+        groups: dict[tuple[Any, ...], dict[str, Any]] = {}
+        for record in self.records:
+            sheet_key = tuple(record[field] for field in SHEET_FIELDS)
+            sheet_index = sheet_indexes.get(sheet_key)
+            if sheet_index is None:
+                sheet_index = sheet_indexes[sheet_key] = len(sheets)
+                sheets.append([*sheet_key, []])
+                id_positions.append({})
+            positions = id_positions[sheet_index]
+            source_mat_id = record["source_mat_id"]
+            if source_mat_id not in positions:
+                positions[source_mat_id] = len(sheets[sheet_index][3])
+                sheets[sheet_index][3].append(source_mat_id)
+
+            key = tuple(record[field] for field in GROUP_FIELDS)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    **{field: record[field] for field in GROUP_FIELDS},
+                    "count": 0,
+                    "inputs": [],
+                    "_inputs": {},
+                    "_sheets": {},
+                }
+            value = record["input"]
+            if isinstance(value, dict) and not keep_row_inputs:
+                value = None
+            input_key = json.dumps(value, default=str)
+            if input_key not in group["_inputs"]:
+                group["_inputs"][input_key] = len(group["inputs"])
+                group["inputs"].append(value)
+            rows = group["_sheets"].setdefault(sheet_index, ([], []))
+            rows[0].append(positions[source_mat_id])
+            rows[1].append(group["_inputs"][input_key])
+            group["count"] += 1
+
+        for group in groups.values():
+            del group["_inputs"]
+            group["rows"] = [
+                [
+                    sheet_index,
+                    _runs(positions),
+                    inputs[0] if len(set(inputs)) == 1 else inputs,
+                ]
+                for sheet_index, (positions, inputs) in group.pop("_sheets").items()
+            ]
+        return {
+            "version": COMPRESSED_VERSION,
+            "sheets": sheets,
+            "groups": list(groups.values()),
+        }
+
+    @classmethod
+    def expand(cls, compressed: dict[str, Any]) -> ErrorStore:
+        if compressed.get("version") != COMPRESSED_VERSION:
+            raise ValueError(f"Unsupported errors version {compressed.get('version')}")
+        store = cls()
+        sheets = compressed["sheets"]
+        for group in compressed["groups"]:
+            for sheet_index, runs, inputs in group["rows"]:
+                *sheet, source_mat_ids = sheets[sheet_index]
+                positions = _positions(runs)
+                if isinstance(inputs, int):
+                    inputs = [inputs] * len(positions)
+                for position, input_index in zip(positions, inputs, strict=True):
+                    store.add(
+                        **dict(zip(SHEET_FIELDS, sheet, strict=True)),
+                        model=group["model"],
+                        source_mat_id=source_mat_ids[position],
+                        loc=tuple(group["loc"]),
+                        type=group["type"],
+                        msg=group["msg"],
+                        input=group["inputs"][input_index],
+                    )
+        return store
+
+    def write_json(self, path: str | Path) -> None:
+        """Writes the compressed records, see `compress()`."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.compress(), f, default=str, separators=(",", ":"))
+
+    @classmethod
+    def read_json(cls, path: str | Path) -> ErrorStore:
+        with open(path, encoding="utf-8") as f:
+            return cls.expand(json.load(f))
+
+
+def describe_groups(
+    compressed: dict[str, Any], max_ids: int = 5, max_inputs: int = 3
+) -> list[str]:
+    """One line per group, largest first, with a sample of the affected
+    source_mat_ids and of the distinct inputs.
+    """
+    sheets = compressed["sheets"]
+    lines = []
+    for group in sorted(compressed["groups"], key=lambda g: -g["count"]):
+        ids = [
+            sheets[sheet_index][3][position]
+            for sheet_index, runs, _ in group["rows"]
+            for position in _positions(runs)
+        ]
+        ids = [i for i in dict.fromkeys(ids) if i is not None]
+        more_ids = f" +{len(ids) - max_ids}" if len(ids) > max_ids else ""
+        inputs = ", ".join(repr(i) for i in group["inputs"][:max_inputs])
+        more_inputs = "..." if len(group["inputs"]) > max_inputs else ""
+        lines.append(
+            f"{group['count']:>6} {group['model']} {'.'.join(map(str, group['loc']))}"
+            f" {group['type']}: {group['msg']}\n"
+            f"       ids: {', '.join(map(str, ids[:max_ids]))}{more_ids}\n"
+            f"       inputs: {inputs}{more_inputs}"
+        )
+    return lines
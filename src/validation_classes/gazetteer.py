@@ -0,0 +1,278 @@
+"""Offline Marine Regions gazetteer for the MRGID and coordinate checks.
+
+The observatory sheets give the broad ocean, regional and local sea areas
+of each observatory as names plus Marine Regions identifiers (MRGIDs).
+A local snapshot of the gazetteer records for those MRGIDs is kept in
+reference-data/marine_regions.csv, so that the checks run in bulk without
+a request per row:
+
+- the MRGID exists,
+- its preferred name matches the name given in the sheet,
+- the observatory's coordinates, and the site coordinates in the
+  governance observatories table, fall inside the region's bounding box.
+
+The snapshot is not in the repository. Fetch it (and refresh it when the
+observatory sheets change) with
+
+    python -m validation_classes gazetteer --fetch
+
+which needs network access to marineregions.org.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .errors import ErrorStore
+from .pipeline import PROJECT_DIR
+from .transport import fetch
+
+REFERENCE_DATA_DIR = PROJECT_DIR / "reference-data"
+SNAPSHOT_PATH = REFERENCE_DATA_DIR / "marine_regions.csv"
+OBSERVATORY_SHEETS_CSV = (
+    PROJECT_DIR / "validated-data" / "Observatory_combined_logsheets_validated.csv"
+)
+OBSERVATORIES_CSV = (
+    PROJECT_DIR / "validated-data" / "governance" / "observatories_validated.csv"
+)
+MARINE_REGIONS_URL = (
+    "https://www.marineregions.org/rest/getGazetteerRecordByMRGID.json/{mrgid}/"
+)
+
+# The Marine Regions record fields kept in the snapshot
+SNAPSHOT_FIELDS = (
+    "MRGID",
+    "preferredGazetteerName",
+    "placeType",
+    "latitude",
+    "longitude",
+    "minLatitude",
+    "minLongitude",
+    "maxLatitude",
+    "maxLongitude",
+)
+
+# (MRGID field, name field) of the observatory sheet
+OBSERVATORY_REGION_FIELDS = (
+    ("loc_broad_ocean_mrgid", "loc_broad_ocean"),
+    ("loc_regional_mrgid", "loc_regional"),
+    ("loc_loc_mrgid", "loc_loc"),
+)
+
+# (latitude field, longitude field) of the governance observatories table
+# (sic longtitude)
+SITE_FIELDS = (
+    ("water_site_latitude", "water_site_longitude"),
+    ("sediment_site_latitude", "sediment_site_longtitude"),
+    ("hard_substrates_site1_latitude", "hard_substrates_site1_longitude"),
+    ("hard_substrates_site2_latitude", "hard_substrates_site2_longtitude"),
+)
+
+
+def normalise_name(name: object) -> str:
+    return " ".join(str(name).casefold().split()) if isinstance(name, str) else ""
+
+
+def _scalar(value: object) -> object:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class Gazetteer:
+    """Marine Regions records indexed by MRGID."""
+
+    def __init__(self, records: pd.DataFrame) -> None:
+        records = records.sort_values("MRGID").reset_index(drop=True)
+        self.records = records
+        self.mrgids = records["MRGID"].to_numpy(dtype=np.int64)
+        self.names = records["preferredGazetteerName"].map(normalise_name).to_numpy()
+        self.min_lat = records["minLatitude"].to_numpy(dtype=np.float64)
+        self.max_lat = records["maxLatitude"].to_numpy(dtype=np.float64)
+        self.min_lon = records["minLongitude"].to_numpy(dtype=np.float64)
+        self.max_lon = records["maxLongitude"].to_numpy(dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.mrgids)
+
+    @classmethod
+    def load(cls, path: str | Path = SNAPSHOT_PATH) -> Gazetteer:
+        if not Path(path).exists():
+            raise FileNotFoundError(
+                f"No gazetteer snapshot at {path}, fetch it with "
+                "python -m validation_classes gazetteer --fetch"
+            )
+        return cls(pd.read_csv(path))
+
+    def save(self, path: str | Path = SNAPSHOT_PATH) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.records.to_csv(path, index=False)
+
+    def lookup(self, mrgids: pd.Series | np.ndarray) -> np.ndarray:
+        """Returns the record position of each MRGID, -1 where unknown or
+        not an integer.
+        """
+        values = pd.to_numeric(pd.Series(mrgids), errors="coerce").to_numpy()
+        valid = ~np.isnan(values) & (values % 1 == 0)
+        keys = np.where(valid, values, -1).astype(np.int64)
+        positions = np.searchsorted(self.mrgids, keys)
+        positions = np.clip(positions, 0, max(len(self.mrgids) - 1, 0))
+        found = valid & (len(self.mrgids) > 0)
+        if len(self.mrgids):
+            found &= self.mrgids[positions] == keys
+        return np.where(found, positions, -1)
+
+    def contains(
+        self,
+        positions: np.ndarray,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        tolerance: float = 0.0,
+    ) -> np.ndarray:
+        """Whether each point is inside the bounding box of the record at the
+        same position (grown by tolerance degrees). Unknown records or
+        missing coordinates give False.
+        """
+        positions = np.asarray(positions)
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+        p = np.where(positions < 0, 0, positions)
+        if not len(self):
+            return np.zeros(len(positions), dtype=bool)
+        min_lon, max_lon = self.min_lon[p] - tolerance, self.max_lon[p] + tolerance
+        in_lat = (lat >= self.min_lat[p] - tolerance) & (
+            lat <= self.max_lat[p] + tolerance
+        )
+        crosses = self.min_lon[p] > self.max_lon[p]
+        in_lon = np.where(
+            crosses,
+            (lon >= min_lon) | (lon <= max_lon),
+            (lon >= min_lon) & (lon <= max_lon),
+        )
+        return (positions >= 0) & in_lat & in_lon
+
+
+def fetch_snapshot(
+    mrgids: list[int], path: str | Path | None = SNAPSHOT_PATH
+) -> Gazetteer:
+    """Fetches the Marine Regions record of each MRGID into a new snapshot,
+    saving it to path unless that is None.
+    """
+    rows = []
+    for mrgid in sorted(set(mrgids)):
+        record = json.loads(fetch(MARINE_REGIONS_URL.format(mrgid=mrgid)))
+        rows.append({field: record.get(field) for field in SNAPSHOT_FIELDS})
+    gazetteer = Gazetteer(pd.DataFrame(rows, columns=list(SNAPSHOT_FIELDS)))
+    if path is not None:
+        gazetteer.save(path)
+    return gazetteer
+
+
+def observatory_mrgids(observatory_sheets: pd.DataFrame) -> list[int]:
+    """All MRGIDs used in the observatory sheets, e.g. to fetch a snapshot."""
+    values = pd.concat(
+        [observatory_sheets[field] for field, _ in OBSERVATORY_REGION_FIELDS]
+    )
+    values = pd.to_numeric(values, errors="coerce").dropna()
+    return sorted(values.astype(np.int64).unique().tolist())
+
+
+def check_observatory_sheets(
+    gazetteer: Gazetteer,
+    observatory_sheets: pd.DataFrame,
+    errors: ErrorStore,
+    tolerance: float = 0.1,
+) -> None:
+    """Checks the MRGIDs, names and coordinates of the (combined)
+    observatory sheets, one row per observatory and sampling strategy.
+    """
+    df = observatory_sheets.reset_index()
+    obs_ids = df["obs_id"].to_numpy()
+    strategies = (
+        df["env_package"].to_numpy() if "env_package" in df else [None] * len(df)
+    )
+    for mrgid_field, name_field in OBSERVATORY_REGION_FIELDS:
+        positions = gazetteer.lookup(df[mrgid_field])
+        known = positions >= 0
+        names = df[name_field].map(normalise_name).to_numpy()
+        name_ok = ~known | (gazetteer.names[np.where(known, positions, 0)] == names)
+        inside = gazetteer.contains(
+            positions, df["latitude"], df["longitude"], tolerance
+        )
+        for i in np.flatnonzero(~known):
+            errors.add(
+                observatory_id=obs_ids[i],
+                sampling_strategy=strategies[i],
+                sheet_type="observatory",
+                model="gazetteer",
+                source_mat_id=None,
+                loc=mrgid_field,
+                type="mrgid_unknown",
+                msg="MRGID is not in the Marine Regions gazetteer snapshot",
+                input=_scalar(df[mrgid_field].iloc[i]),
+            )
+        for i in np.flatnonzero(~name_ok):
+            errors.add(
+                observatory_id=obs_ids[i],
+                sampling_strategy=strategies[i],
+                sheet_type="observatory",
+                model="gazetteer",
+                source_mat_id=None,
+                loc=name_field,
+                type="mrgid_name_mismatch",
+                msg=(
+                    f"Name does not match MRGID {df[mrgid_field].iloc[i]} "
+                    f"'{gazetteer.records['preferredGazetteerName'].iloc[positions[i]]}'"
+                ),
+                input=df[name_field].iloc[i],
+            )
+        for i in np.flatnonzero(known & ~inside):
+            errors.add(
+                observatory_id=obs_ids[i],
+                sampling_strategy=strategies[i],
+                sheet_type="observatory",
+                model="gazetteer",
+                source_mat_id=None,
+                loc=("latitude", "longitude"),
+                type="coordinates_outside_region",
+                msg=f"Coordinates are outside {mrgid_field} {df[mrgid_field].iloc[i]}",
+                input=(float(df["latitude"].iloc[i]), float(df["longitude"].iloc[i])),
+            )
+
+
+def check_observatory_sites(
+    gazetteer: Gazetteer,
+    observatories: pd.DataFrame,
+    observatory_sheets: pd.DataFrame,
+    errors: ErrorStore,
+    region_field: str = "loc_regional_mrgid",
+    tolerance: float = 0.1,
+) -> None:
+    """Checks that the site coordinates in the governance observatories
+    table fall inside the region the observatory's own sheets claim.
+    """
+    regions = (
+        observatory_sheets.reset_index()
+        .drop_duplicates("obs_id")
+        .set_index("obs_id")[region_field]
+    )
+    df = observatories.reset_index()
+    claimed = df["observatory_id"].map(regions)
+    positions = gazetteer.lookup(claimed)
+    for lat_field, lon_field in SITE_FIELDS:
+        has_site = df[lat_field].notna() & df[lon_field].notna()
+        inside = gazetteer.contains(positions, df[lat_field], df[lon_field], tolerance)
+        for i in np.flatnonzero(has_site.to_numpy() & (positions >= 0) & ~inside):
+            errors.add(
+                observatory_id=df["observatory_id"].iloc[i],
+                sampling_strategy=None,
+                sheet_type="observatories",
+                model="gazetteer",
+                source_mat_id=None,
+                loc=(lat_field, lon_field),
+                type="coordinates_outside_region",
+                msg=f"Site is outside {region_field} {int(claimed.iloc[i])}",
+                input=(float(df[lat_field].iloc[i]), float(df[lon_field].iloc[i])),
+            )
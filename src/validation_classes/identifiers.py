@@ -0,0 +1,176 @@
+"""Checks of the identifier fields: ORCID iDs, emails, EDMO codes and URLs.
+
+The models take these as plain strings. Here each identifier column is
+checked as a whole, with the result for each distinct value memoized:
+the same few people and institutes are on every row of a sheet, so after
+the first sheet nearly every check is a cache hit.
+
+Cells may hold more than one identifier, separated by "," or ";".
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+import pandas as pd
+import validators
+
+from .errors import ErrorStore
+
+# {field: kind of identifier}, across the sampling, observatory and
+# governance sheets
+IDENTIFIER_FIELDS = {
+    "sampl_person_orcid": "orcid",
+    "store_person_orcid": "orcid",
+    "other_person_orcid": "orcid",
+    "contact_orcid": "orcid",
+    "contact_email": "email",
+    "contact_person_email": "email",
+    "organization_edmoid": "edmo",
+    "rocrate_profile_uri": "url",
+}
+
+MESSAGES = {
+    "orcid": "Not a valid ORCID iD (format or check digit)",
+    "email": "Not a valid email address",
+    "edmo": "Not a valid EDMO code",
+    "url": "Not a valid URL",
+}
+
+ORCID_PATTERN = re.compile(
+    r"(?:https?://orcid\.org/)?(\d{4}-\d{4}-\d{4}-\d{3}[\dX])", re.IGNORECASE
+)
+EDMO_PATTERN = re.compile(r"[1-9]\d{0,5}")
+SEPARATORS = re.compile(r"[,;]")
+
+
+def orcid_check_digit(digits: str) -> str:
+    """ISO 7064 11,2 check digit of the first 15 digits of an ORCID iD."""
+    total = 0
+    for digit in digits:
+        total = (total + int(digit)) * 2
+    result = (12 - total % 11) % 11
+    return "X" if result == 10 else str(result)
+
+
+def is_orcid(value: str) -> bool:
+    match = ORCID_PATTERN.fullmatch(value)
+    if match is None:
+        return False
+    orcid = match.group(1).upper().replace("-", "")
+    return orcid_check_digit(orcid[:-1]) == orcid[-1]
+
+
+def is_email(value: str) -> bool:
+    """validators.email, which takes internationalized domains but only
+    ASCII local parts. Non-ASCII letters are allowed there too (RFC 6531),
+    e.g. josegonzález@uvigo.es.
+    """
+    local, at, domain = value.rpartition("@")
+    if at and not local.isascii():
+        if not all(c.isascii() or (c.isprintable() and not c.isspace()) for c in local):
+            return False
+        value = "".join(c if c.isascii() else "x" for c in local) + at + domain
+    return validators.email(value) is True
+
+
+def is_edmo(value: str) -> bool:
+    return EDMO_PATTERN.fullmatch(value) is not None
+
+
+def is_url(value: str) -> bool:
+    return validators.url(value) is True
+
+
+CHECKS = {"orcid": is_orcid, "email": is_email, "edmo": is_edmo, "url": is_url}
+
+
+@lru_cache(maxsize=8192)
+def invalid_parts(kind: str, value: str) -> tuple[str, ...]:
+    """The identifiers in a cell that fail the check, () if all pass."""
+    check = CHECKS[kind]
+    parts = [part.strip() for part in SEPARATORS.split(value)]
+    return tuple(part for part in parts if part and not check(part))
+
+
+def cache_stats() -> dict[str, float]:
+    info = invalid_parts.cache_info()
+    calls = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / calls if calls else 0.0,
+    }
+
+
+def _as_text(value: object) -> str | None:
+    """Cell value as a string, or None if empty. EDMO codes come back
+    from CSVs as floats when the column has gaps.
+    """
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, bool) or pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def check_column(column: pd.Series, kind: str) -> pd.Series:
+    """Returns the invalid identifiers of each cell, () for valid or empty
+    cells, with the same index as the column.
+    """
+    # As objects, so that a categorical column maps each cell, not each category
+    return column.astype(object).map(
+        lambda value: ()
+        if (text := _as_text(value)) is None
+        else invalid_parts(kind, text)
+    )
+
+
+def check_identifiers(
+    df: pd.DataFrame,
+    errors: ErrorStore,
+    *,
+    observatory_id: str | None,
+    sampling_strategy: str | None,
+    sheet_type: str | None,
+    fields: dict[str, str] = IDENTIFIER_FIELDS,
+) -> int:
+    """Checks every identifier field in df, adding an error per invalid
+    identifier. Without an observatory_id, it is taken from the obs_id or
+    observatory_id column of each row (as in the governance tables).
+
+    Returns the number of errors added.
+    """
+    df = df.reset_index()
+    if observatory_id is None:
+        obs_field = next((f for f in ("obs_id", "observatory_id") if f in df), None)
+        obs_ids = df[obs_field] if obs_field else pd.Series(None, index=df.index)
+    else:
+        obs_ids = pd.Series(observatory_id, index=df.index)
+    ids = (
+        df["source_mat_id"]
+        if "source_mat_id" in df
+        else pd.Series(None, index=df.index, dtype=object)
+    )
+    n_errors = len(errors)
+    for field, kind in fields.items():
+        if field not in df:
+            continue
+        invalid = check_column(df[field], kind)
+        for i in invalid.index[invalid.map(bool)]:
+            for part in invalid[i]:
+                errors.add(
+                    observatory_id=obs_ids[i],
+                    sampling_strategy=sampling_strategy,
+                    sheet_type=sheet_type,
+                    model="identifiers",
+                    source_mat_id=ids[i],
+                    loc=field,
+                    type=f"{kind}_invalid",
+                    msg=MESSAGES[kind],
+                    input=part,
+                )
+    return len(errors) - n_errors
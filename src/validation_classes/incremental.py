@@ -0,0 +1,241 @@
+"""Validate only the rows after each observatory's QC threshold date.
+
+The governance logsheets table has a data_quality_control_threshold_date
+per observatory: its sampling events up to that date have been through
+quality control and won't change. Rather than validating every event
+ever logged on every run, each sheet is split into
+
+- the frozen rows, those whose sampling event was collected on or before
+  the threshold and which passed validation before. They are served
+  from the snapshot, i.e. the validated CSVs of the previous run
+  (see `pipeline.write_result`), and
+- the active window, everything else, which is validated as usual.
+
+The collection_dates come from the snapshot of the sampling sheet, so
+the measured rows of an event are frozen along with it. Rows that failed
+before are never frozen, so their errors are reported on every run. A
+sheet without a snapshot, or an observatory without a threshold, is
+validated in full. The snapshot is only ever the directory given,
+
+    python -m validation_classes validate --snapshot SNAPSHOT --out DIR
+
+and never the run's own --out, so that a bad run isn't frozen by the
+next one. --full validates everything even with a --snapshot.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .metrics import stage_timer
+from .pipeline import (
+    INDEX_FIELDS,
+    LOGSHEETS_VALIDATED_CSV,
+    SheetJob,
+    SheetResult,
+    validate_sheet,
+)
+from .rules import default_rules, source_mat_id_mask
+
+THRESHOLD_FIELD = "data_quality_control_threshold_date"
+
+
+class QCWindow(NamedTuple):
+    """The thresholds of a run and the directory of its snapshot."""
+
+    thresholds: dict[str, pd.Timestamp]  # {observatory_id: threshold date}
+    snapshot_dir: Path
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(
+        values, errors="coerce", format="mixed", utc=True
+    ).dt.tz_localize(None)
+
+
+def qc_thresholds(
+    logsheets_csv: str | Path = LOGSHEETS_VALIDATED_CSV,
+) -> dict[str, pd.Timestamp]:
+    """{observatory_id: data_quality_control_threshold_date} of the
+    governance logsheets table, leaving out those without one.
+    """
+    df = pd.read_csv(logsheets_csv, usecols=["observatory_id", THRESHOLD_FIELD])
+    dates = _dates(df[THRESHOLD_FIELD])
+    return {
+        observatory_id: date
+        for observatory_id, date in zip(df["observatory_id"], dates, strict=True)
+        if pd.notna(date)
+    }
+
+
+def read_snapshot(job: SheetJob, snapshot_dir: str | Path) -> pd.DataFrame | None:
+    """The validated rows of the job's sheet from the previous run, or None.
+
+    Everything is read as text, see `_value` for how it's typed back.
+    """
+    path = Path(snapshot_dir) / f"{job.name}_validated.csv"
+    if not path.exists():
+        return None
+    return pd.read_csv(
+        path,
+        index_col=INDEX_FIELDS.get(job.sheet_type, "source_mat_id"),
+        dtype=str,
+        keep_default_na=False,
+    )
+
+
+def frozen_ids(
+    job: SheetJob, threshold: pd.Timestamp, snapshot_dir: str | Path
+) -> pd.Index:
+    """The source_mat_ids of the job's observatory and strategy collected on
+    or before threshold, according to the snapshot of its sampling sheet.
+    """
+    if job.sheet_type == "sampling":
+        models = [job.model]
+    else:
+        models = ["sampling", f"{job.sampling_strategy}_mandatory"]
+    for model in models:
+        sampling = read_snapshot(
+            job._replace(sheet_type="sampling", model=model), snapshot_dir
+        )
+        if sampling is not None and "collection_date" in sampling:
+            dates = _dates(sampling["collection_date"])
+            return sampling.index[(dates <= threshold).to_numpy()].unique()
+    return pd.Index([])
+
+
+def _value(text: str) -> Any:
+    """A snapshot cell as the value it was dumped from, as far as its text
+    tells: "" as None, and numbers and booleans only when they print back
+    as the same text (so e.g. "007" or "0.20" stay strings).
+    """
+    if text == "":
+        return None
+    if text in ("True", "False"):
+        return text == "True"
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    if text.lstrip("-").isdigit() and str(int(text)) == text:
+        return int(text)
+    return number if repr(number) == text else text
+
+
+def _typed(frozen: pd.DataFrame, validated: pd.DataFrame) -> pd.DataFrame:
+    """The snapshot rows typed back (see `_value`), so that the merged frame
+    infers its dtypes like a full run does, e.g. writes an int column as
+    floats only when it has a missing value. An int column the previous run
+    wrote as floats ("-80.0") is told by the validated column being ints.
+    """
+    typed = frozen.map(_value)
+    for field in validated.columns.intersection(typed.columns):
+        if pd.api.types.is_integer_dtype(validated[field]):
+            typed[field] = typed[field].map(
+                lambda value: int(value)
+                if isinstance(value, float) and value.is_integer()
+                else value
+            )
+    return typed
+
+
+def _in_sheet_order(
+    parts: list[tuple[pd.DataFrame, np.ndarray]], sheet_ids: pd.Series
+) -> pd.DataFrame:
+    """Merges the validated parts back into the order of the sheet.
+
+    Each part comes with the positions in the sheet of the rows it may
+    have. Its rows are matched to them by source_mat_id, the nth row of an
+    id to the nth position of that id, and rows without a position (e.g.
+    a snapshot row whose duplicate was deleted) are dropped.
+    """
+    frames, positions = [], []
+    for frame, sheet_positions in parts:
+        if frame.empty:
+            continue
+        ids = sheet_ids.iloc[sheet_positions]
+        keys = pd.MultiIndex.from_arrays(
+            [ids.to_numpy(), ids.groupby(ids, dropna=False).cumcount().to_numpy()]
+        )
+        index = frame.index.to_series()
+        matched = keys.get_indexer(
+            pd.MultiIndex.from_arrays(
+                [index.to_numpy(), index.groupby(index).cumcount().to_numpy()]
+            )
+        )
+        # As objects, the dtypes are inferred from the merged records below
+        frames.append(frame[matched >= 0].astype(object))
+        positions.append(sheet_positions[matched[matched >= 0]])
+    if not frames:
+        return pd.DataFrame()
+    order = np.argsort(np.concatenate(positions), kind="stable")
+    merged = pd.concat(frames).iloc[order]
+    return pd.DataFrame.from_records(
+        merged.reset_index().to_dict(orient="records"), index=merged.index.name
+    )
+
+
+def validate_sheet_window(
+    job: SheetJob,
+    df: pd.DataFrame,
+    threshold: pd.Timestamp,
+    snapshot_dir: str | Path,
+    columnar: bool = False,
+    strict: bool = False,
+) -> SheetResult:
+    """Validates the rows of an already fetched sheet after threshold,
+    taking the rest from the snapshot. The validated frame has the rows in
+    the order of the sheet, as a full validation would.
+    """
+    if columnar:
+        from .columnar import validate_sheet_columnar as validate
+    else:
+        validate = validate_sheet
+
+    timings: dict[str, float] = {}
+    with stage_timer(timings, "snapshot"):
+        snapshot = None
+        if job.sheet_type != "observatory":
+            df = default_rules().apply(
+                df, job.observatory_id, job.sampling_strategy, job.model
+            )
+            snapshot = read_snapshot(job, snapshot_dir)
+        if snapshot is not None and "source_mat_id" in df:
+            ids = frozen_ids(job, threshold, snapshot_dir)
+            ids = ids[ids.isin(snapshot.index)]
+            is_frozen = df["source_mat_id"].isin(ids).to_numpy()
+        else:
+            is_frozen = None
+    if is_frozen is None or not is_frozen.any():
+        return validate(job, df, strict)
+
+    result = validate(job, df[~is_frozen], strict)
+    # Only the snapshot rows of ids still in the sheet, so that deleted or
+    # corrected rows drop out
+    frozen_df = df[is_frozen]
+    frozen = _typed(snapshot.loc[frozen_df["source_mat_id"].unique()], result.validated)
+    # The active rows that validate_sheet didn't filter out
+    kept = source_mat_id_mask(
+        df[~is_frozen], job.observatory_id, job.sampling_strategy, job.model
+    ).to_numpy()
+    validated = _in_sheet_order(
+        [
+            (frozen, np.flatnonzero(is_frozen)),
+            (result.validated, np.flatnonzero(~is_frozen)[kept]),
+        ],
+        df["source_mat_id"],
+    )
+    n_frozen = int(is_frozen.sum())
+    return result._replace(
+        validated=validated,
+        counters={
+            **result.counters,
+            "rows_fetched": result.counters["rows_fetched"] + n_frozen,
+            "rows_frozen": n_frozen,
+        },
+        timings={**timings, **(result.timings or {})},
+    )
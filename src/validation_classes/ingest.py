@@ -0,0 +1,445 @@
+"""Validate CSV bytes without pandas.
+
+The pipeline reads every sheet into a DataFrame and then turns it back into
+one dict per row for the models. For the governance tables and one-off
+checks that is mostly import time: here the CSV is parsed with the csv
+module, each column's values are typed the way `pd.read_csv` would type
+them (so the models see the same input), and all rows are validated and
+dumped with one `TypeAdapter` call each. Floats are parsed as pandas'
+default parser does (`_strtod`), which can differ from float() in the last
+digit.
+
+    python -m validation_classes.ingest logsheets.csv --model logsheets
+    python -m validation_classes.ingest sampling.csv --model sampling --out out.csv
+
+Nothing in this module imports pandas.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import io
+import math
+import re
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from pydantic import AliasChoices, BaseModel, ValidationError
+
+from .errors import ErrorStore
+from .logsheets import Model as logsheetsModel
+from .mandatory import SoftSedimentDataModel, WaterColumnDataModel
+from .measured import Model as measuredModel
+from .observatories import Model as observatoriesModel
+from .observatory import Model as observatoryModel
+from .rules import default_rules, source_mat_id_ok
+from .sampling import Model as samplingModel
+from .serialize import list_adapter, write_csv, write_parquet
+
+# pipeline.VALIDATOR_CLASSES plus the governance tables
+MODELS: dict[str, type[BaseModel]] = {
+    "sampling": samplingModel,
+    "measured": measuredModel,
+    "observatory": observatoryModel,
+    "water_column_mandatory": WaterColumnDataModel,
+    "soft_sediment_mandatory": SoftSedimentDataModel,
+    "logsheets": logsheetsModel,
+    "observatories": observatoriesModel,
+}
+INDEX_FIELDS = {
+    "observatory": "obs_id",
+    "logsheets": "observatory_id",
+    "observatories": "observatory_id",
+}
+# Sheets filtered on source_mat_id before validation
+FILTERED_MODELS = (
+    "sampling",
+    "measured",
+    "water_column_mandatory",
+    "soft_sediment_mandatory",
+)
+
+# The strings pd.read_csv reads as NaN by default
+NA_VALUES = frozenset(
+    {
+        "",
+        "#N/A",
+        "#N/A N/A",
+        "#NA",
+        "-1.#IND",
+        "-1.#QNAN",
+        "-NaN",
+        "-nan",
+        "1.#IND",
+        "1.#QNAN",
+        "<NA>",
+        "N/A",
+        "NA",
+        "NULL",
+        "NaN",
+        "None",
+        "n/a",
+        "nan",
+        "null",
+    }
+)
+TRUE_VALUES = frozenset({"True", "TRUE", "true"})
+FALSE_VALUES = frozenset({"False", "FALSE", "false"})
+INT_PATTERN = re.compile(r"\s*[+-]?\d+\s*")
+FLOAT_PATTERN = re.compile(
+    r"\s*[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|inf|Inf|INF|infinity|Infinity)\s*"
+)
+INT64_MAX = 2**63 - 1
+# pandas' precise_xstrtod keeps 17 significant digits and scales by these
+MAX_DIGITS = 17
+POWERS_OF_TEN = [float(f"1e{i}") for i in range(309)]
+# The governance table gives its dates as 31/12/2021, see the notebook
+THRESHOLD_DATE_FIELD = "data_quality_control_threshold_date"
+THRESHOLD_DATE_FORMAT = "%d/%m/%Y"
+
+
+class IngestResult(NamedTuple):
+    model: str
+    rows: list[dict[str, Any]]
+    errors: ErrorStore
+    counters: dict[str, int]
+
+
+def _header(names: list[str]) -> list[str]:
+    """Column names as pandas gives them: 'Unnamed: i' for blanks and
+    'name.1', 'name.2'... for repeats.
+    """
+    header = []
+    seen: dict[str, int] = defaultdict(int)
+    for i, name in enumerate(names):
+        if name == "":
+            name = f"Unnamed: {i}"
+        if seen[name]:
+            unique = f"{name}.{seen[name]}"
+            while unique in seen:
+                seen[name] += 1
+                unique = f"{name}.{seen[name]}"
+            seen[name] += 1
+            name = unique
+        seen[name] += 1
+        header.append(name)
+    return header
+
+
+def _digits(text: str, i: int, limit: int) -> tuple[int, int, int]:
+    """The value and count of the (at most limit) digits of text from i,
+    and the position after them.
+    """
+    value = count = 0
+    while count < limit and i < len(text) and "0" <= text[i] <= "9":
+        value = value * 10 + ord(text[i]) - 48
+        count += 1
+        i += 1
+    return value, count, i
+
+
+def _strtod(text: str) -> float:
+    """float(text) as pandas' default parser (precise_xstrtod) reads it:
+    the first 17 significant digits accumulated in a float, then scaled by
+    a power of ten. text matches FLOAT_PATTERN. Raises OverflowError
+    where pandas would leave the column as strings.
+    """
+    text = text.strip()
+    if not any("0" <= c <= "9" for c in text):  # inf, infinity
+        return float(text)
+    i = 1 if text[0] in "+-" else 0
+    negative = text[0] == "-"
+    number = 0.0
+    exponent = n_digits = 0
+    while i < len(text) and "0" <= text[i] <= "9":
+        if n_digits < MAX_DIGITS:
+            number = number * 10.0 + (ord(text[i]) - 48)
+            n_digits += 1
+        else:
+            exponent += 1
+        i += 1
+    if i < len(text) and text[i] == ".":
+        i += 1
+        n_decimals = 0
+        while n_digits < MAX_DIGITS and i < len(text) and "0" <= text[i] <= "9":
+            number = number * 10.0 + (ord(text[i]) - 48)
+            n_digits += 1
+            n_decimals += 1
+            i += 1
+        exponent -= n_decimals
+        while i < len(text) and "0" <= text[i] <= "9":
+            i += 1
+    if negative:
+        number = -number
+    if i < len(text) and text[i] in "eE":
+        i += 1
+        negative_exponent = i < len(text) and text[i] == "-"
+        i += i < len(text) and text[i] in "+-"
+        value, _, i = _digits(text, i, MAX_DIGITS)
+        exponent += -value if negative_exponent else value
+    if exponent > 308:
+        raise OverflowError(text)
+    if exponent > 0:
+        number *= POWERS_OF_TEN[exponent]
+    elif exponent < -616:
+        number = 0.0
+    elif exponent < -308:
+        number = number / POWERS_OF_TEN[-308 - exponent] / POWERS_OF_TEN[308]
+    else:
+        number /= POWERS_OF_TEN[-exponent]
+    if math.isinf(number):
+        raise OverflowError(text)
+    return number
+
+
+def _infer(values: list[str]) -> list[Any]:
+    """Types one column's values as pd.read_csv would: int, float or bool
+    if every value is one (NaN allowed, except for int and bool), else str.
+    """
+    missing = [value in NA_VALUES for value in values]
+    present = [value for value, na in zip(values, missing, strict=True) if not na]
+    if not present:
+        return [math.nan] * len(values)
+    has_na = len(present) < len(values)
+    if all(v in TRUE_VALUES or v in FALSE_VALUES for v in present):
+        return [
+            math.nan if na else value in TRUE_VALUES
+            for value, na in zip(values, missing, strict=True)
+        ]
+    if all(INT_PATTERN.fullmatch(v) for v in present):
+        numbers = [int(v) for v in present]
+        if all(abs(n) <= INT64_MAX for n in numbers):
+            cast = float if has_na else int
+            it = iter(numbers)
+            return [math.nan if na else cast(next(it)) for na in missing]
+    if all(FLOAT_PATTERN.fullmatch(v) for v in present):
+        with contextlib.suppress(OverflowError):
+            return [
+                math.nan if na else _strtod(value)
+                for value, na in zip(values, missing, strict=True)
+            ]
+    return [
+        math.nan if na else value for value, na in zip(values, missing, strict=True)
+    ]
+
+
+def read_csv_records(
+    data: bytes | str, encoding: str = "utf-8", encoding_errors: str = "strict"
+) -> list[dict[str, Any]]:
+    """The rows of a CSV as dicts, typed as `df.to_dict("records")` of
+    `pd.read_csv` would give them.
+    """
+    if isinstance(data, bytes):
+        data = data.decode(encoding, errors=encoding_errors)
+    data = data.removeprefix("\ufeff")
+    reader = csv.reader(io.StringIO(data, newline=""))
+    try:
+        header = _header(next(reader))
+    except StopIteration:
+        return []
+    n_columns = len(header)
+    lines = []
+    for line in reader:
+        if not line:  # pandas skips blank lines
+            continue
+        if len(line) > n_columns:
+            raise ValueError(
+                f"Expected {n_columns} fields in line {reader.line_num}, saw {len(line)}"
+            )
+        lines.append(line + [""] * (n_columns - len(line)))
+    if not lines:
+        return []
+    columns = [_infer(list(values)) for values in zip(*lines, strict=True)]
+    return [
+        dict(zip(header, values, strict=True)) for values in zip(*columns, strict=True)
+    ]
+
+
+def parse_threshold_dates(records: list[dict[str, Any]]) -> None:
+    """Reads the governance table's day-first threshold dates, as the
+    notebook does before validating it with `logsheets.Model`.
+    """
+    for record in records:
+        value = record.get(THRESHOLD_DATE_FIELD)
+        if isinstance(value, str):
+            with contextlib.suppress(ValueError):  # left to the model
+                record[THRESHOLD_DATE_FIELD] = datetime.strptime(
+                    value.strip(), THRESHOLD_DATE_FORMAT
+                )
+
+
+def index_value(
+    model: type[BaseModel], record: dict[str, Any], index_field: str
+) -> Any:
+    """The value of the index field in record, under any of the field's
+    aliases, e.g. EMOBON_observatory_id for logsheets' observatory_id.
+    """
+    names = [index_field]
+    field = model.model_fields.get(index_field)
+    alias = field.validation_alias if field is not None else None
+    if isinstance(alias, AliasChoices):
+        names += [choice for choice in alias.choices if isinstance(choice, str)]
+    elif isinstance(alias, str):
+        names.append(alias)
+    if field is not None and field.alias:
+        names.append(field.alias)
+    return next((record[name] for name in names if name in record), None)
+
+
+def keep_record(
+    record: dict[str, Any],
+    observatory_id: str | None = None,
+    sampling_strategy: str | None = None,
+    model: str | None = None,
+) -> bool:
+    """`pipeline.filter_on_source_mat_id`, which only needs the dict."""
+    try:
+        value = record["source_mat_id"]
+    except KeyError as e:
+        raise ValueError("Cannot find source_mat_id field") from e
+    return source_mat_id_ok(value) and default_rules().keep_record(
+        record, observatory_id, sampling_strategy, model
+    )
+
+
+def validate_bulk(
+    model: type[BaseModel], records: list[dict[str, Any]]
+) -> tuple[list[BaseModel], dict[int, list[dict[str, Any]]]]:
+    """Validates all records with one call. If any fail, the remaining
+    records are validated again.
+
+    Returns the models of the records that passed and the errors of those
+    that failed, by their position in records.
+    """
+    adapter = list_adapter(model)
+    # Keyword construction in the record path gets a fresh dict per row
+    records = [dict(record) for record in records]
+    failed: dict[int, list[dict[str, Any]]] = defaultdict(list)
+    try:
+        models = adapter.validate_python(records)
+    except ValidationError as e:
+        for error in e.errors(include_url=False, include_context=False):
+            failed[error["loc"][0]].append({**error, "loc": error["loc"][1:]})
+        records = [r for i, r in enumerate(records) if i not in failed]
+        models = adapter.validate_python(records)
+    return models, dict(sorted(failed.items()))
+
+
+def validate_records_bulk(
+    model: type[BaseModel],
+    records: list[dict[str, Any]],
+    errors: ErrorStore,
+    *,
+    model_name: str,
+    index_field: str = "source_mat_id",
+    observatory_id: str | None = None,
+    sampling_strategy: str | None = None,
+    sheet_type: str | None = None,
+) -> list[dict[str, Any]]:
+    """Validates all records with one call and dumps the valid ones with
+    another, adding the errors of the others to the store.
+    """
+    models, failed = validate_bulk(model, records)
+    for i, row_errors in failed.items():
+        for error in row_errors:
+            errors.add(
+                observatory_id=observatory_id,
+                sampling_strategy=sampling_strategy,
+                sheet_type=sheet_type,
+                model=model_name,
+                source_mat_id=index_value(model, records[i], index_field),
+                loc=error["loc"],
+                type=error["type"],
+                msg=error["msg"],
+                input=error.get("input"),
+            )
+    return list_adapter(model).dump_python(models)
+
+
+def validate_csv(
+    data: bytes | str,
+    model_name: str,
+    *,
+    observatory_id: str | None = None,
+    sampling_strategy: str | None = None,
+    sheet_type: str | None = None,
+    encoding: str = "utf-8",
+    encoding_errors: str = "strict",
+) -> IngestResult:
+    """Parses, filters and validates a CSV of the given model, with the
+    counters of `pipeline.validate_sheet`.
+    """
+    records = default_rules().apply_records(
+        read_csv_records(data, encoding, encoding_errors),
+        observatory_id,
+        sampling_strategy,
+        model_name,
+    )
+    n_fetched = len(records)
+    if model_name == "logsheets":
+        parse_threshold_dates(records)
+    if model_name in FILTERED_MODELS:
+        records = [
+            record
+            for record in records
+            if keep_record(record, observatory_id, sampling_strategy, model_name)
+        ]
+    errors = ErrorStore()
+    rows = validate_records_bulk(
+        MODELS[model_name],
+        records,
+        errors,
+        model_name=model_name,
+        index_field=INDEX_FIELDS.get(model_name, "source_mat_id"),
+        observatory_id=observatory_id,
+        sampling_strategy=sampling_strategy,
+        sheet_type=sheet_type or model_name,
+    )
+    counters = {
+        "rows_fetched": n_fetched,
+        "rows_filtered": n_fetched - len(records),
+        "rows_validated": len(rows),
+        "rows_failed": len(records) - len(rows),
+        "errors": len(errors),
+    }
+    return IngestResult(model_name, rows, errors, counters)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="validation_classes.ingest")
+    parser.add_argument("path", help="CSV file, or - for stdin")
+    parser.add_argument("--model", choices=MODELS, required=True)
+    parser.add_argument("--errors", default=None, help="Errors CSV")
+    parser.add_argument(
+        "--out", default=None, help="Validated rows, .csv or .parquet (needs pyarrow)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.path == "-":
+        data = sys.stdin.buffer.read()
+    else:
+        with open(args.path, "rb") as f:
+            data = f.read()
+    result = validate_csv(data, args.model, encoding_errors="ignore")
+    print(", ".join(f"{k}={v}" for k, v in result.counters.items()))
+    for record in result.errors:
+        print(
+            f"{record['source_mat_id']}: {'.'.join(map(str, record['loc']))} "
+            f"{record['msg']}"
+        )
+    if args.errors:
+        result.errors.write_csv(args.errors)
+    if args.out and result.rows:
+        write = write_parquet if args.out.endswith(".parquet") else write_csv
+        write(
+            result.rows, args.out, index=INDEX_FIELDS.get(args.model, "source_mat_id")
+        )
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Referential integrity of the whole network in one pass.
+
+The combine step finds sampling events without a measured row, one
+observatory at a time, and only for the events with a ref_code. Here all
+sheets are stacked into one frame per sheet type and the references are
+checked with joins and set differences over the whole network:
+
+- every obs_id (of the governance logsheets, the observatory sheets and
+  the combined logsheets) is an observatory_id of the observatories table
+- every sampling source_mat_id has a measured row, and vice versa
+- every ref_code maps to exactly one source_mat_id, which is in exactly
+  one sampling sheet
+
+    python -m validation_classes integrity --out integrity.json
+
+Problems are added to the ErrorStore with model "integrity".
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+from .errors import ErrorStore
+from .pipeline import SheetJob
+
+REFERENCE_KEYS = ["observatory_id", "sampling_strategy", "source_mat_id"]
+
+
+class IntegrityReport(NamedTuple):
+    errors: ErrorStore
+    counters: dict[str, int]
+
+
+def stack_sheets(sheets: dict[SheetJob, pd.DataFrame]) -> pd.DataFrame:
+    """The sheets as one frame, with the observatory_id and
+    sampling_strategy of each row's sheet.
+    """
+    frames = [
+        df.reset_index(drop=df.index.name is None).assign(
+            observatory_id=job.observatory_id,
+            sampling_strategy=job.sampling_strategy,
+            sheet_type=job.sheet_type,
+        )
+        for job, df in sheets.items()
+    ]
+    if not frames:
+        return pd.DataFrame(columns=[*REFERENCE_KEYS, "sheet_type"])
+    columns = list(dict.fromkeys(c for df in frames for c in df.columns))
+    # A column that is empty in one sheet takes its dtype from the others
+    frames = [df.dropna(axis=1, how="all") for df in frames]
+    return pd.concat(frames, ignore_index=True).reindex(columns=columns)
+
+
+def read_refcodes(path: str | Path) -> pd.DataFrame:
+    """The source_mat_id and ref_code columns of a run-information CSV (or
+    of combined logsheets).
+    """
+    return pd.read_csv(path, usecols=["source_mat_id", "ref_code"])
+
+
+def _add(
+    errors: ErrorStore,
+    rows: pd.DataFrame,
+    *,
+    loc: str,
+    type: str,
+    msg: str,
+    value: str,
+) -> int:
+    for row in rows.to_dict(orient="records"):
+        errors.add(
+            observatory_id=row.get("observatory_id"),
+            sampling_strategy=row.get("sampling_strategy"),
+            sheet_type=row.get("sheet_type"),
+            model="integrity",
+            source_mat_id=row.get("source_mat_id"),
+            loc=loc,
+            type=type,
+            msg=msg,
+            input=row.get(value),
+        )
+    return len(rows)
+
+
+def check_obs_ids(
+    observatory_ids: set[str], references: pd.DataFrame, errors: ErrorStore
+) -> int:
+    """references has an obs_id column, and sheet_type to say where from."""
+    unknown = references[~references["obs_id"].isin(observatory_ids)]
+    unknown = unknown.drop_duplicates(["obs_id", "sheet_type", "sampling_strategy"])
+    return _add(
+        errors,
+        unknown,
+        loc="obs_id",
+        type="unknown_obs_id",
+        msg="Not an observatory_id of the observatories table",
+        value="obs_id",
+    )
+
+
+def check_sampling_measured(
+    sampling: pd.DataFrame, measured: pd.DataFrame, errors: ErrorStore
+) -> tuple[int, int]:
+    """Matches the sampling and measured rows on observatory, strategy and
+    source_mat_id. Returns the number without a partner on each side.
+    """
+    merged = pd.merge(
+        sampling[REFERENCE_KEYS].drop_duplicates(),
+        measured[REFERENCE_KEYS].drop_duplicates(),
+        on=REFERENCE_KEYS,
+        how="outer",
+        indicator=True,
+    )
+    n_missing_measured = _add(
+        errors,
+        merged[merged["_merge"] == "left_only"].assign(sheet_type="sampling"),
+        loc="source_mat_id",
+        type="missing_measured",
+        msg="No measured row for this sampling event",
+        value="source_mat_id",
+    )
+    n_missing_sampling = _add(
+        errors,
+        merged[merged["_merge"] == "right_only"].assign(sheet_type="measured"),
+        loc="source_mat_id",
+        type="missing_sampling",
+        msg="No sampling row for this measured row",
+        value="source_mat_id",
+    )
+    return n_missing_measured, n_missing_sampling
+
+
+def check_refcodes(
+    refcodes: pd.DataFrame, sampling: pd.DataFrame, errors: ErrorStore
+) -> dict[str, int]:
+    """Each ref_code must map to one source_mat_id, in one sampling row."""
+    refcodes = refcodes.dropna(subset=["ref_code"]).drop_duplicates()
+    counts = {}
+
+    n_ids = refcodes.groupby("ref_code")["source_mat_id"].transform("nunique")
+    counts["ref_code_ambiguous"] = _add(
+        errors,
+        refcodes[n_ids > 1].assign(sheet_type="run_information"),
+        loc="ref_code",
+        type="ref_code_ambiguous",
+        msg="Given to more than one source_mat_id",
+        value="ref_code",
+    )
+
+    samples = sampling[[*REFERENCE_KEYS, "sheet_type"]].dropna(subset=["source_mat_id"])
+    matched = refcodes.merge(samples, on="source_mat_id", how="left")
+    unmatched = matched[matched["observatory_id"].isna()]
+    counts["ref_code_unmatched"] = _add(
+        errors,
+        unmatched.assign(sheet_type="run_information"),
+        loc="ref_code",
+        type="ref_code_unmatched",
+        msg="Its source_mat_id is in no sampling sheet",
+        value="ref_code",
+    )
+    n_samples = matched.groupby("ref_code")["observatory_id"].transform("size")
+    counts["ref_code_duplicated_sample"] = _add(
+        errors,
+        matched[matched["observatory_id"].notna() & (n_samples > 1)],
+        loc="source_mat_id",
+        type="ref_code_duplicated_sample",
+        msg="Matches more than one sampling row",
+        value="ref_code",
+    )
+    return counts
+
+
+def audit_network(
+    observatories: pd.DataFrame,
+    logsheets: pd.DataFrame,
+    sampling: dict[SheetJob, pd.DataFrame],
+    measured: dict[SheetJob, pd.DataFrame],
+    observatory: dict[SheetJob, pd.DataFrame],
+    refcodes: pd.DataFrame | None = None,
+    combined: pd.DataFrame | None = None,
+) -> IntegrityReport:
+    """Checks the references between the governance tables, the sheets and
+    the run-information ref_codes (if given) of every observatory.
+
+    observatories and logsheets are the governance tables, combined the
+    output of `combine.combine_network` (or `loaders.load_combined`).
+    """
+    errors = ErrorStore()
+    sampling_rows = stack_sheets(sampling)
+    measured_rows = stack_sheets(measured)
+    observatory_rows = stack_sheets(observatory)
+
+    references = [
+        logsheets[["observatory_id"]].assign(
+            obs_id=logsheets["observatory_id"], sheet_type="logsheets"
+        ),
+        observatory_rows[["observatory_id", "sampling_strategy", "obs_id"]].assign(
+            sheet_type="observatory"
+        ),
+    ]
+    if combined is not None and not combined.empty:
+        references.append(
+            combined[["obs_id", "env_package"]]
+            .rename(columns={"env_package": "sampling_strategy"})
+            .assign(observatory_id=combined["obs_id"], sheet_type="combined")
+        )
+    observatory_ids = set(observatories["observatory_id"].dropna())
+    n_unknown = check_obs_ids(
+        observatory_ids, pd.concat(references, ignore_index=True), errors
+    )
+    n_missing_measured, n_missing_sampling = check_sampling_measured(
+        sampling_rows, measured_rows, errors
+    )
+    counters = {
+        "observatories": len(observatory_ids),
+        "sampling_rows": len(sampling_rows),
+        "measured_rows": len(measured_rows),
+        "unknown_obs_id": n_unknown,
+        "missing_measured": n_missing_measured,
+        "missing_sampling": n_missing_sampling,
+    }
+    if refcodes is not None:
+        counters["ref_codes"] = int(refcodes["ref_code"].nunique())
+        counters.update(check_refcodes(refcodes, sampling_rows, errors))
+    counters["errors"] = len(errors)
+    return IntegrityReport(errors, counters)
@@ -0,0 +1,287 @@
+"""Typed, cached loaders for the CSVs in validated-data.
+
+    from validation_classes.loaders import load_combined, load_sheets, load_validated
+
+    df = load_validated("AAOT", "water_column", "sampling")
+    sampling = load_sheets("sampling")  # {SheetJob: DataFrame}
+    network = load_combined()
+
+Column dtypes come from the sheet's model: integer fields are read as
+nullable Int64, float fields as float64, and repetitive string columns
+(sampl_person, env_material, the *_method fields...) as categoricals,
+which is most of the memory of the combined tables.
+
+Frames are kept in an LRU cache. A repeat load only stats the file; the
+file is hashed if its mtime or size has changed, and re-read only if the
+hash has too. Each call returns a copy, so callers can modify it.
+
+With typed=False the sheets are read as plain `pd.read_csv` gives them,
+e.g. as input to validation, which expects what a fetched sheet looks like.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+from pydantic import BaseModel
+
+from .completeness import field_kind
+from .pipeline import (
+    GITHUB_STRATEGIES,
+    VALIDATED_DATA_DIR,
+    VALIDATOR_CLASSES,
+    SheetJob,
+)
+
+# {tier: path of a sheet under validated-data}
+TIERS = {
+    "logsheets": "logsheets/{observatory}_{strategy}_{sheet}_validated.csv",
+    "github": "logsheets_github/{observatory}_{github_strategy}_{sheet}_github_validated.csv",
+    "mandatory": "logsheets_mandatory/{observatory}_{strategy}_{strategy}_mandatory_validated.csv",
+    "combined": "combined_logsheets/{observatory}_{strategy}_combined_validated.csv",
+}
+
+# Object columns with at most this fraction of distinct values are made
+# categorical
+CATEGORY_RATIO = 0.5
+
+CACHE_SIZE = 64
+
+
+class _CacheEntry(NamedTuple):
+    mtime_ns: int
+    size: int
+    digest: str
+    df: pd.DataFrame
+
+
+_cache: OrderedDict[tuple[Path, str, bool], _CacheEntry] = OrderedDict()
+# The stacked combined frames, with the digests of the files they are from
+_combined_cache: dict[
+    tuple[Path, str | None, str | None], tuple[tuple[str, ...], pd.DataFrame]
+] = {}
+
+
+def clear_cache() -> None:
+    _cache.clear()
+    _combined_cache.clear()
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _models(sheet: str, strategy: str) -> list[type[BaseModel]]:
+    if sheet == "combined":
+        return [VALIDATOR_CLASSES["sampling"], VALIDATOR_CLASSES["measured"]]
+    if sheet == "mandatory":
+        return [VALIDATOR_CLASSES[f"{strategy}_mandatory"]]
+    return [VALIDATOR_CLASSES[sheet]] if sheet in VALIDATOR_CLASSES else []
+
+
+def model_dtypes(models: list[type[BaseModel]]) -> dict[str, str]:
+    """{field: dtype} for the numeric fields of the models."""
+    dtypes = {}
+    for model in models:
+        for name, info in model.model_fields.items():
+            kind = field_kind(info.annotation)
+            if kind == "int":
+                dtypes[name] = "Int64"
+            elif kind == "float":
+                dtypes[name] = "float64"
+    return dtypes
+
+
+def apply_dtypes(df: pd.DataFrame, dtypes: dict[str, str]) -> pd.DataFrame:
+    """Sets the model dtypes where the values allow it, then makes the
+    repetitive string columns categorical.
+    """
+    for column, dtype in dtypes.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        numbers = pd.to_numeric(df[column], errors="coerce")
+        # Leave columns with values the type can't hold, e.g. "blank"
+        if numbers.notna().sum() != df[column].notna().sum():
+            continue
+        if dtype == "Int64" and (numbers.dropna() % 1 != 0).any():
+            continue
+        df[column] = numbers.astype(dtype)
+    for column in df.columns:
+        values = df[column]
+        if values.dtype != object or len(values) == 0:
+            continue
+        if values.nunique() > CATEGORY_RATIO * len(values):
+            continue
+        if values.dropna().map(type).eq(str).all():
+            df[column] = values.astype("category")
+    return df
+
+
+def _read(path: Path, models: list[type[BaseModel]], typed: bool) -> pd.DataFrame:
+    if not typed:
+        return pd.read_csv(path)
+    df = pd.read_csv(path, low_memory=False)
+    return apply_dtypes(df, model_dtypes(models))
+
+
+def _entry(path: Path, sheet: str, strategy: str, typed: bool = True) -> _CacheEntry:
+    stat = path.stat()
+    key = (path, sheet, typed)
+    entry = _cache.get(key)
+    if entry is not None and (entry.mtime_ns, entry.size) != (
+        stat.st_mtime_ns,
+        stat.st_size,
+    ):
+        digest = _file_digest(path)
+        if digest == entry.digest:
+            entry = entry._replace(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        else:
+            entry = None
+    if entry is None:
+        digest = _file_digest(path)
+        entry = _CacheEntry(
+            stat.st_mtime_ns,
+            stat.st_size,
+            digest,
+            _read(path, _models(sheet, strategy), typed),
+        )
+    _cache[key] = entry
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return entry
+
+
+def validated_path(
+    observatory: str,
+    strategy: str,
+    sheet: str,
+    tier: str = "logsheets",
+    validated_dir: str | Path = VALIDATED_DATA_DIR,
+) -> Path:
+    try:
+        template = TIERS[tier]
+    except KeyError:
+        raise ValueError(
+            f"Unknown tier {tier}, expected one of {list(TIERS)}"
+        ) from None
+    return Path(validated_dir) / template.format(
+        observatory=observatory,
+        strategy=strategy,
+        github_strategy=GITHUB_STRATEGIES.get(strategy, strategy),
+        sheet=sheet,
+    )
+
+
+def load_validated(
+    observatory: str,
+    strategy: str,
+    sheet: str,
+    tier: str = "logsheets",
+    validated_dir: str | Path = VALIDATED_DATA_DIR,
+) -> pd.DataFrame:
+    """One validated sheet, e.g. ("AAOT", "water_column", "sampling"). The
+    mandatory and combined tiers have a single sheet per observatory and
+    strategy, so sheet is ignored for them.
+    """
+    path = validated_path(observatory, strategy, sheet, tier, validated_dir)
+    if tier in ("mandatory", "combined"):
+        sheet = tier
+    return _entry(path, sheet, strategy).df.copy()
+
+
+def _sheet_name_pattern(tier: str, sheet: str) -> re.Pattern[str]:
+    """Matches the file names of the tier's sheets, capturing the
+    observatory and strategy.
+    """
+    name = re.escape(TIERS[tier].split("/")[-1]).replace(
+        re.escape("{sheet}"), re.escape(sheet)
+    )
+    groups = {
+        "observatory": "[^_]+",
+        "strategy": ".+?",
+        "github_strategy": ".+?",
+    }
+    for group, part in groups.items():
+        placeholder = re.escape(f"{{{group}}}")
+        # Placeholders after the first are the same value again
+        name = name.replace(placeholder, f"(?P<{group}>{part})", 1)
+        name = name.replace(placeholder, f"(?P={group})")
+    return re.compile(name)
+
+
+def load_sheets(
+    sheet_type: str = "sampling",
+    tier: str = "logsheets",
+    validated_dir: str | Path = VALIDATED_DATA_DIR,
+    typed: bool = True,
+) -> dict[SheetJob, pd.DataFrame]:
+    """Every validated sheet of one type in a tier, by the job it is of,
+    e.g. {SheetJob("AAOT", "water_column", "sampling", "", "sampling"): df}.
+    The mandatory and combined tiers have the tier as sheet type and model
+    ("{strategy}_mandatory" for the mandatory one).
+    """
+    path = validated_path("*", "*", sheet_type, tier, validated_dir)
+    if tier in ("mandatory", "combined"):
+        sheet_type = tier
+    pattern = _sheet_name_pattern(tier, sheet_type)
+    strategies = {v: k for k, v in GITHUB_STRATEGIES.items()}
+    sheets = {}
+    for this_path in sorted(path.parent.glob(path.name)):
+        match = pattern.fullmatch(this_path.name)
+        if match is None:
+            continue
+        parts = match.groupdict()
+        strategy = parts.get("strategy") or strategies.get(
+            parts["github_strategy"], parts["github_strategy"]
+        )
+        model = f"{strategy}_mandatory" if tier == "mandatory" else sheet_type
+        job = SheetJob(parts["observatory"], strategy, sheet_type, "", model)
+        sheets[job] = _entry(this_path, sheet_type, strategy, typed).df.copy()
+    return sheets
+
+
+def load_combined(
+    observatory: str | None = None,
+    strategy: str | None = None,
+    validated_dir: str | Path = VALIDATED_DATA_DIR,
+) -> pd.DataFrame:
+    """The combined logsheets of every observatory and strategy (or just
+    those given) stacked into one frame, with env_package set to the
+    strategy as in `combine.combine_network`.
+    """
+    combined_dir = Path(validated_dir) / "combined_logsheets"
+    entries = {}
+    for path in sorted(combined_dir.glob("*_combined_validated.csv")):
+        this_observatory, rest = path.name.split("_", 1)
+        this_strategy = rest.removesuffix("_combined_validated.csv")
+        if observatory is not None and observatory != this_observatory:
+            continue
+        if strategy is not None and strategy != this_strategy:
+            continue
+        entries[this_strategy, path] = _entry(path, "combined", this_strategy)
+    if not entries:
+        return pd.DataFrame()
+
+    key = (combined_dir, observatory, strategy)
+    signature = tuple(entry.digest for entry in entries.values())
+    cached = _combined_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1].copy()
+    frames = []
+    for (this_strategy, _), entry in entries.items():
+        # Categories differ between the frames, so set them on the whole table
+        df = entry.df.astype({c: object for c in entry.df.select_dtypes("category")})
+        frames.append(df.assign(env_package=this_strategy))
+    stacked = apply_dtypes(pd.concat(frames, ignore_index=True), {})
+    _combined_cache[key] = (signature, stacked)
+    return stacked.copy()
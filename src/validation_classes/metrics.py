@@ -0,0 +1,184 @@
+"""Per-sheet run metrics, written as JSON and as a Prometheus textfile.
+
+Each `SheetResult` carries its counters (rows fetched, filtered, validated
+and failed, errors and bytes downloaded) and the seconds spent in each
+stage. `RunMetrics` gathers them by observatory, strategy, sheet and
+model, along with the write and combine times, and writes
+
+- run_metrics.json, for the run reports, and
+- validation.prom, for the node_exporter textfile collector, so the
+  scheduler can alert on failed, slow or regressing observatories.
+
+Nothing in this module imports pandas.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+METRICS_VERSION = 1
+METRICS_JSON = "run_metrics.json"
+METRICS_PROM = "validation.prom"
+METRIC_PREFIX = "emobon_validation"
+
+STAGES = ("fetch", "normalize", "validate", "write", "combine")
+COUNTER_HELP = {
+    "rows_fetched": "Rows in the sheet as fetched",
+    "rows_filtered": "Rows dropped before validation, e.g. without a source_mat_id",
+    "rows_validated": "Rows that passed validation",
+    "rows_failed": "Rows that failed validation",
+    "rows_frozen": "Rows before the QC threshold, taken from the snapshot",
+    "cells_repaired": "Cells changed by the repairs before validation",
+    "rows_repaired": "Rows with a cell changed by the repairs",
+    "errors": "Validation errors",
+    "bytes_downloaded": "Bytes downloaded for the sheet",
+    "jobs_failed": "1 if the job raised rather than validated",
+    # combine.combine_observatory
+    "sampling_events": "Validated sampling events",
+    "duplicates_ignored": "Sampling events ignored as known duplicates",
+    "no_refcode": "Sampling events without a ref_code",
+    "missing_measured": "Sampling events without a measured row",
+    "combined_events": "Sampling events combined",
+}
+LABELS = ("observatory", "strategy", "sheet", "model")
+
+
+@contextmanager
+def stage_timer(timings: dict[str, float], stage: str) -> Iterator[None]:
+    """Adds the seconds spent in the block to timings[stage]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+
+
+class RunMetrics:
+    """The counters and stage seconds of a run, by (observatory, strategy,
+    sheet, model).
+    """
+
+    def __init__(self) -> None:
+        self.started = datetime.now(timezone.utc)
+        self.sheets: dict[tuple[str, str, str, str], dict[str, dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.sheets)
+
+    def _sheet(self, key: tuple[str, str, str, str]) -> dict[str, dict[str, Any]]:
+        return self.sheets.setdefault(key, {"counters": {}, "seconds": {}})
+
+    def add_counters(
+        self, key: tuple[str, str, str, str], counters: dict[str, int]
+    ) -> None:
+        sheet_counters = self._sheet(key)["counters"]
+        for name, value in counters.items():
+            sheet_counters[name] = sheet_counters.get(name, 0) + value
+
+    def add_time(
+        self, key: tuple[str, str, str, str], stage: str, seconds: float
+    ) -> None:
+        sheet_seconds = self._sheet(key)["seconds"]
+        sheet_seconds[stage] = sheet_seconds.get(stage, 0.0) + seconds
+
+    def add_result(self, result: Any) -> None:
+        """Adds a `pipeline.SheetResult`."""
+        job = result.job
+        key = (job.observatory_id, job.sampling_strategy, job.sheet_type, job.model)
+        self.add_counters(key, result.counters)
+        for stage, seconds in (result.timings or {}).items():
+            self.add_time(key, stage, seconds)
+
+    @classmethod
+    def from_results(cls, results: list[Any]) -> RunMetrics:
+        metrics = cls()
+        for result in results:
+            metrics.add_result(result)
+        return metrics
+
+    def totals(self) -> dict[str, dict[str, Any]]:
+        totals: dict[str, dict[str, Any]] = {"counters": {}, "seconds": {}}
+        for sheet in self.sheets.values():
+            for part in ("counters", "seconds"):
+                for name, value in sheet[part].items():
+                    totals[part][name] = totals[part].get(name, 0) + value
+        return totals
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "version": METRICS_VERSION,
+            "started": self.started.isoformat(timespec="seconds"),
+            "sheets": [
+                {
+                    **dict(zip(LABELS, key, strict=True)),
+                    "counters": sheet["counters"],
+                    "seconds": {k: round(v, 6) for k, v in sheet["seconds"].items()},
+                }
+                for key, sheet in sorted(self.sheets.items())
+            ],
+            "totals": self.totals(),
+        }
+
+    def write_json(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=1), encoding="utf-8")
+
+    def prometheus_lines(self) -> list[str]:
+        """The metrics in the Prometheus text exposition format, as gauges
+        since each textfile replaces the previous run's.
+        """
+        counter_names = sorted(
+            {name for sheet in self.sheets.values() for name in sheet["counters"]}
+        )
+        lines = []
+        for name in counter_names:
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} gauge")
+            for key, sheet in sorted(self.sheets.items()):
+                if name in sheet["counters"]:
+                    labels = _labels(**dict(zip(LABELS, key, strict=True)))
+                    lines.append(f"{metric}{{{labels}}} {sheet['counters'][name]}")
+        metric = f"{METRIC_PREFIX}_stage_seconds"
+        lines.append(f"# HELP {metric} Seconds spent in each stage")
+        lines.append(f"# TYPE {metric} gauge")
+        for key, sheet in sorted(self.sheets.items()):
+            for stage, seconds in sheet["seconds"].items():
+                labels = _labels(**dict(zip(LABELS, key, strict=True)), stage=stage)
+                lines.append(f"{metric}{{{labels}}} {seconds:.6f}")
+        metric = f"{METRIC_PREFIX}_last_run_timestamp_seconds"
+        lines.append(f"# HELP {metric} Start time of the run")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {self.started.timestamp():.0f}")
+        return lines
+
+    def write_prometheus(self, path: str | Path) -> None:
+        """Writes the textfile through a temporary file, so the collector
+        never reads a partial one.
+        """
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text("\n".join(self.prometheus_lines()) + "\n", encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def write(self, save_dir: str | Path) -> list[Path]:
+        """Writes run_metrics.json and validation.prom to save_dir."""
+        save_dir = Path(save_dir)
+        save_dir.mkdir(parents=True, exist_ok=True)
+        self.write_json(save_dir / METRICS_JSON)
+        self.write_prometheus(save_dir / METRICS_PROM)
+        return [save_dir / METRICS_JSON, save_dir / METRICS_PROM]
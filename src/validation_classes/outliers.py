@@ -0,0 +1,252 @@
+"""Robust outlier detection for the measured values of every observatory.
+
+`measured.Model` only checks that a value is a number (or an annotation),
+so unit slips such as a temperature in Kelvin or a salinity of 3.8 for
+38 pass. Here the numeric measured fields of all sheets are stacked into
+one long array of (observatory and strategy, variable, value), joined to
+the collection_date of the sampling sheets, and each value is compared
+with its group with NumPy:
+
+- median: more than THRESHOLD robust z-scores (0.6745 (x - median) / MAD,
+  Iglewicz and Hoaglin) from the median of its observatory and variable
+- seasonal: the same, within the values of the same calendar month
+- rolling: from the rolling median of the neighbouring dates, scaled by
+  the MAD of those residuals
+
+A median outlier that is close to a power of ten times the median is also
+reported as a likely magnitude slip. Groups with a MAD of zero are
+skipped: most of their values are identical, e.g. a detection limit.
+
+    python -m validation_classes outliers --out outliers.csv
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .completeness import field_kind
+from .errors import ErrorStore
+from .integrity import stack_sheets
+from .measured import Model as measuredModel
+from .pipeline import SheetJob
+
+# The measured fields that hold numbers
+VARIABLES = tuple(
+    name
+    for name, info in measuredModel.model_fields.items()
+    if field_kind(info.annotation) in ("float", "any") and not name.endswith("_method")
+)
+THRESHOLD = 3.5
+MAD_SCALE = 0.6745
+MIN_VALUES = 8  # per observatory and variable
+MIN_SEASON_VALUES = 8  # per month
+ROLLING_WINDOW = 9  # values, centred
+MIN_ROLLING_VALUES = 5
+# A ratio to the median within this of a power of ten is a magnitude slip
+MAGNITUDE_TOLERANCE = 0.15
+
+GROUP_KEYS = ["observatory_id", "sampling_strategy", "variable"]
+
+
+def group_median(codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """The median of values in each group 0..n_groups-1, NaN for empty
+    groups. values must have no NaNs.
+    """
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(n_groups, np.nan)
+    filled = counts > 0
+    lo = starts[filled] + (counts[filled] - 1) // 2
+    hi = starts[filled] + counts[filled] // 2
+    medians[filled] = (sorted_values[lo] + sorted_values[hi]) / 2
+    return medians
+
+
+def robust_z(
+    codes: np.ndarray, values: np.ndarray, n_groups: int, min_values: int
+) -> np.ndarray:
+    """The robust z-score of each value in its group, NaN where the group
+    has fewer than min_values or a MAD of zero.
+    """
+    medians = group_median(codes, values, n_groups)
+    deviations = np.abs(values - medians[codes])
+    mads = group_median(codes, deviations, n_groups)
+    counts = np.bincount(codes, minlength=n_groups)
+    usable = (counts >= min_values) & (mads > 0)
+    z = np.full(len(values), np.nan)
+    in_usable = usable[codes]
+    z[in_usable] = (
+        MAD_SCALE
+        * (values[in_usable] - medians[codes][in_usable])
+        / mads[codes][in_usable]
+    )
+    return z
+
+
+def rolling_median(codes: np.ndarray, values: np.ndarray, window: int) -> np.ndarray:
+    """The centred rolling median of values within each group. The values
+    must be sorted by group (and date within it).
+    """
+    half = window // 2
+    padded_values = np.pad(values, half, constant_values=np.nan)
+    padded_codes = np.pad(codes, half, constant_values=-1)
+    windows = np.lib.stride_tricks.sliding_window_view(padded_values, window).copy()
+    same_group = (
+        np.lib.stride_tricks.sliding_window_view(padded_codes, window) == codes[:, None]
+    )
+    windows[~same_group] = np.nan
+    enough = (~np.isnan(windows)).sum(axis=1) >= MIN_ROLLING_VALUES
+    medians = np.full(len(values), np.nan)
+    medians[enough] = np.nanmedian(windows[enough], axis=1)
+    return medians
+
+
+def measured_values(
+    measured: dict[SheetJob, pd.DataFrame],
+    sampling: dict[SheetJob, pd.DataFrame] | None = None,
+) -> pd.DataFrame:
+    """One row per numeric measured value, with its observatory_id,
+    sampling_strategy, source_mat_id, variable and collection_date (if the
+    sampling sheets are given), sorted by group and date.
+    """
+    rows = stack_sheets(measured)
+    variables = [v for v in VARIABLES if v in rows]
+    numbers = rows[variables].apply(pd.to_numeric, errors="coerce")
+    keys = rows[["observatory_id", "sampling_strategy", "source_mat_id"]]
+    values = (
+        pd.concat([keys, numbers], axis=1)
+        .melt(id_vars=list(keys.columns), var_name="variable", value_name="value")
+        .dropna(subset=["value"])
+    )
+    if sampling:
+        dates = stack_sheets(sampling)[
+            ["observatory_id", "sampling_strategy", "source_mat_id", "collection_date"]
+        ].drop_duplicates(["observatory_id", "sampling_strategy", "source_mat_id"])
+        dates["collection_date"] = pd.to_datetime(
+            dates["collection_date"], errors="coerce", format="mixed", utc=True
+        )
+        values = values.merge(
+            dates,
+            on=["observatory_id", "sampling_strategy", "source_mat_id"],
+            how="left",
+        )
+    else:
+        values["collection_date"] = pd.NaT
+    return values.sort_values(
+        [*GROUP_KEYS, "collection_date"], kind="stable"
+    ).reset_index(drop=True)
+
+
+def detect_outliers(values: pd.DataFrame, threshold: float = THRESHOLD) -> pd.DataFrame:
+    """Adds the z_median, z_seasonal and z_rolling scores and the median and
+    magnitude (the power of ten of a magnitude slip, else 0) to values.
+
+    The size fractions and replicates of a sampling event share its measured
+    values, so each value of an event is only counted once.
+    """
+    event_keys = [*GROUP_KEYS, "collection_date", "value"]
+    events = values.drop_duplicates(event_keys)
+    if len(events) < len(values):
+        scores = _score(events, threshold).drop(
+            columns=values.columns.difference(event_keys)
+        )
+        return values.merge(scores, on=event_keys, how="left")
+    return _score(values, threshold)
+
+
+def _score(values: pd.DataFrame, threshold: float) -> pd.DataFrame:
+    codes, groups = pd.factorize(
+        pd.MultiIndex.from_frame(values[GROUP_KEYS]), sort=False
+    )
+    x = values["value"].to_numpy(dtype=float)
+    n_groups = len(groups)
+    values = values.copy()
+    values["z_median"] = robust_z(codes, x, n_groups, MIN_VALUES)
+    values["median"] = group_median(codes, x, n_groups)[codes]
+
+    dated = values["collection_date"].notna().to_numpy()
+    z_seasonal = np.full(len(x), np.nan)
+    z_rolling = np.full(len(x), np.nan)
+    if dated.any():
+        months = values.loc[dated, "collection_date"].dt.month.to_numpy()
+        season_codes, seasons = pd.factorize(
+            pd.MultiIndex.from_arrays([codes[dated], months]), sort=False
+        )
+        z_seasonal[dated] = robust_z(
+            season_codes, x[dated], len(seasons), MIN_SEASON_VALUES
+        )
+        # values is sorted by group then date, so the dated values are too
+        residuals = x[dated] - rolling_median(codes[dated], x[dated], ROLLING_WINDOW)
+        has_residual = ~np.isnan(residuals)
+        z = np.full(int(dated.sum()), np.nan)
+        z[has_residual] = robust_z(
+            codes[dated][has_residual],
+            residuals[has_residual],
+            n_groups,
+            MIN_VALUES,
+        )
+        z_rolling[dated] = z
+    values["z_seasonal"] = z_seasonal
+    values["z_rolling"] = z_rolling
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_ratio = np.log10(np.abs(x / values["median"].to_numpy()))
+        powers = np.round(log_ratio)
+        slip = (
+            (np.abs(values["z_median"].to_numpy()) > threshold)
+            & np.isfinite(log_ratio)
+            & (powers != 0)
+            & (np.abs(log_ratio - powers) < MAGNITUDE_TOLERANCE)
+        )
+    values["magnitude"] = np.where(slip, powers, 0).astype(int)
+    return values
+
+
+def check_outliers(
+    measured: dict[SheetJob, pd.DataFrame],
+    sampling: dict[SheetJob, pd.DataFrame] | None,
+    errors: ErrorStore,
+    threshold: float = THRESHOLD,
+) -> pd.DataFrame:
+    """Adds an error for each outlier of each method. Returns the flagged
+    values with their scores.
+    """
+    scored = detect_outliers(measured_values(measured, sampling), threshold)
+    methods = {
+        "median": "From the median of the observatory",
+        "seasonal": "From the median of the observatory in the same month",
+        "rolling": "From the rolling median over collection_date",
+    }
+    flagged = np.zeros(len(scored), dtype=bool)
+    for method, description in methods.items():
+        is_outlier = (scored[f"z_{method}"].abs() > threshold).to_numpy()
+        flagged |= is_outlier
+        for row in scored[is_outlier].to_dict(orient="records"):
+            errors.add(
+                observatory_id=row["observatory_id"],
+                sampling_strategy=row["sampling_strategy"],
+                sheet_type="measured",
+                model="outliers",
+                source_mat_id=row["source_mat_id"],
+                loc=row["variable"],
+                type=f"outlier_{method}",
+                msg=f"{description}, more than {threshold:g} robust z-scores",
+                input=row["value"],
+            )
+    for row in scored[scored["magnitude"] != 0].to_dict(orient="records"):
+        errors.add(
+            observatory_id=row["observatory_id"],
+            sampling_strategy=row["sampling_strategy"],
+            sheet_type="measured",
+            model="outliers",
+            source_mat_id=row["source_mat_id"],
+            loc=row["variable"],
+            type="magnitude_slip",
+            msg=f"About 10^{row['magnitude']} times the observatory median, a unit "
+            "or decimal slip?",
+            input=row["value"],
+        )
+    return scored[flagged]
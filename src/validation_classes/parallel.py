@@ -0,0 +1,108 @@
+"""Run the observatory/strategy/sheet validation jobs across a process pool.
+
+The observatories are independent of each other so each sheet is a job of
+its own. Results come back in the order the jobs were given, whatever
+order the workers finish in, so a parallel run gives the same output as
+a sequential one.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple
+
+from .errors import ErrorStore
+from .incremental import QCWindow
+from .metrics import RunMetrics, stage_timer
+from .pipeline import SheetJob, SheetResult, run_job, write_result
+from .repair import write_repairs
+
+
+class RunSummary(NamedTuple):
+    results: list[SheetResult]
+    errors: ErrorStore
+    counters: dict[str, int]
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def run_jobs(
+    jobs: list[SheetJob],
+    max_workers: int | None = None,
+    chunksize: int = 1,
+    columnar: bool = False,
+    window: QCWindow | None = None,
+    repair: bool = False,
+) -> RunSummary:
+    """Runs the jobs, in a process pool unless max_workers is 1, validating
+    only the rows after the QC thresholds of window if given, and repairing
+    the sheets first if repair is set.
+
+    The jobs are mostly waiting on the network, then on pydantic, so one
+    worker per core is a sensible default. chunksize > 1 cuts the pickling
+    overhead when there are many small jobs.
+    """
+    run = partial(run_job, columnar=columnar, window=window, repair=repair)
+    if max_workers is None:
+        max_workers = default_workers()
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1 not {max_workers}")
+
+    if max_workers == 1 or len(jobs) <= 1:
+        results = [run(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+            # map() yields in submission order
+            results = list(pool.map(run, jobs, chunksize=chunksize))
+    return summarise(results)
+
+
+def summarise(results: list[SheetResult]) -> RunSummary:
+    """Gathers the error records and sums the counters of all results."""
+    errors = ErrorStore()
+    counters: Counter[str] = Counter()
+    for result in results:
+        errors.extend(result.errors)
+        counters.update(result.counters)
+        counters["jobs"] += 1
+    return RunSummary(results, errors, dict(sorted(counters.items())))
+
+
+def write_summary(
+    summary: RunSummary,
+    save_dir: str | Path,
+    full_errors: bool = False,
+    metrics: RunMetrics | None = None,
+) -> list[Path]:
+    """Writes every validated sheet and the run's errors, compressed into
+    validation_errors.json, plus one row per error in validation_errors.csv
+    if full_errors. The time spent writing each sheet is added to metrics.
+    """
+    written = []
+    for result in summary.results:
+        timings: dict[str, float] = {}
+        with stage_timer(timings, "write"):
+            out_path = write_result(result, save_dir)
+        if metrics is not None:
+            job = result.job
+            key = (job.observatory_id, job.sampling_strategy, job.sheet_type, job.model)
+            metrics.add_time(key, "write", timings["write"])
+        if out_path is not None:
+            written.append(out_path)
+        if result.repaired is not None:
+            written.extend(write_repairs(result.job, *result.repaired, save_dir))
+    if summary.errors:
+        errors_path = Path(save_dir) / "validation_errors.json"
+        summary.errors.write_json(errors_path)
+        written.append(errors_path)
+        if full_errors:
+            errors_path = errors_path.with_suffix(".csv")
+            summary.errors.write_csv(errors_path)
+            written.append(errors_path)
+    return written
@@ -0,0 +1,363 @@
+"""Fetch, filter and validate the observatory logsheets.
+
+These are the steps of `parse_sample_sheets` from the validation notebooks,
+split up so that each observatory/strategy/sheet can be run on its own
+(see `parallel.py`).
+"""
+
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+from urllib.error import HTTPError
+
+import pandas as pd
+from pydantic import BaseModel, ValidationError
+
+from .errors import ErrorStore
+from .mandatory import SoftSedimentDataModel, WaterColumnDataModel
+from .measured import Model as measuredModel
+from .metrics import stage_timer
+from .observatory import Model as observatoryModel
+from .rules import default_rules, source_mat_id_mask, source_mat_id_ok
+from .sampling import Model as samplingModel
+from .serialize import dump_models
+from .transport import bytes_fetched, read_csv_url
+
+if TYPE_CHECKING:
+    from .incremental import QCWindow
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+VALIDATED_DATA_DIR = PROJECT_DIR / "validated-data"
+LOGSHEETS_VALIDATED_CSV = VALIDATED_DATA_DIR / "governance" / "logsheets_validated.csv"
+
+GOVERNANCE_URL = "https://raw.githubusercontent.com/emo-bon/governance-data/main/"
+GITHUB_URL = "https://raw.githubusercontent.com/emo-bon"
+RUN_INFORMATION_URLS = (
+    "https://raw.githubusercontent.com/emo-bon/sequencing-data/main/shipment/batch-001/run-information-batch-001.csv",
+    "https://raw.githubusercontent.com/emo-bon/sequencing-data/main/shipment/batch-002/run-information-batch-002.csv",
+)
+
+SAMPLING_STRATEGIES = ("water_column", "soft_sediment")
+# The crate repositories on Github name the strategies differently
+GITHUB_STRATEGIES = {"water_column": "water", "soft_sediment": "sediment"}
+SHEET_TYPES = ("sampling", "measured", "observatory")
+
+VALIDATOR_CLASSES: dict[str, type[BaseModel]] = {
+    "sampling": samplingModel,
+    "measured": measuredModel,
+    "observatory": observatoryModel,
+    "water_column_mandatory": WaterColumnDataModel,
+    "soft_sediment_mandatory": SoftSedimentDataModel,
+}
+
+# The observatory sheet has a single row keyed on obs_id
+INDEX_FIELDS = {"observatory": "obs_id"}
+
+
+class SheetJob(NamedTuple):
+    observatory_id: str
+    sampling_strategy: str
+    sheet_type: str
+    sheet_link: str
+    model: str  # key into VALIDATOR_CLASSES
+
+    @property
+    def name(self) -> str:
+        return f"{self.observatory_id}_{self.sampling_strategy}_{self.model}"
+
+
+class SheetResult(NamedTuple):
+    job: SheetJob
+    validated: pd.DataFrame
+    errors: ErrorStore
+    counters: dict[str, int]
+    failure: str | None = None  # Set if the job raised rather than validated
+    timings: dict[str, float] | None = None  # Seconds per stage, see metrics.py
+    # The repaired sheet and its change log, see repair.py
+    repaired: tuple[pd.DataFrame, pd.DataFrame] | None = None
+
+
+def get_sheet_addresses(
+    logsheets_csv: str | Path = LOGSHEETS_VALIDATED_CSV,
+) -> list[tuple[str, str, Any]]:
+    """Returns (observatory_id, sampling_strategy, sheet_link) for every
+    observatory and strategy in the validated governance logsheets table.
+    The sheet_link is NaN where an observatory doesn't do that strategy.
+    """
+    df = pd.read_csv(logsheets_csv)
+    addresses = []
+    for observatory_id, water_column, soft_sediment in df[
+        ["observatory_id", *SAMPLING_STRATEGIES]
+    ].values.tolist():
+        addresses.append((observatory_id, "water_column", water_column))
+        addresses.append((observatory_id, "soft_sediment", soft_sediment))
+    return addresses
+
+
+def build_jobs(
+    addresses: list[tuple[str, str, Any]],
+    sheet_types: tuple[str, ...] = SHEET_TYPES,
+    mandatory: bool = False,
+) -> list[SheetJob]:
+    """Returns the jobs for all addresses with a valid sheet link, ordered
+    by sheet type, then sampling strategy, then as in the governance table
+    (i.e. the order the notebooks process them in).
+
+    If mandatory is set the 'sampling' sheets are checked with the
+    mandatory-field models instead. The skip_sheets of rules.json are left
+    out.
+    """
+    rules = default_rules()
+    jobs = []
+    for sheet_type in sheet_types:
+        for strategy in SAMPLING_STRATEGIES:
+            for observatory_id, sampling_strategy, sheet_link in addresses:
+                if sampling_strategy != strategy:
+                    continue
+                if not isinstance(sheet_link, str):
+                    if isinstance(sheet_link, float) and math.isnan(sheet_link):
+                        continue  # Observatory doesn't do this strategy
+                    raise ValueError(
+                        f"Unknown link {sheet_link} to observatory {observatory_id}"
+                    )
+                if mandatory and sheet_type == "sampling":
+                    model = f"{sampling_strategy}_mandatory"
+                else:
+                    model = sheet_type
+                if rules.skip_reason(observatory_id, sampling_strategy, model):
+                    continue
+                jobs.append(
+                    SheetJob(
+                        observatory_id, sampling_strategy, sheet_type, sheet_link, model
+                    )
+                )
+    return jobs
+
+
+def get_governance_table(file_name: str) -> pd.DataFrame:
+    """Returns one of the governance CSVs, e.g. 'logsheets.csv'."""
+    return read_csv_url(GOVERNANCE_URL + file_name, encoding_errors="ignore")
+
+
+def sheet_url(sheet_link: str, sheet_type: str) -> str:
+    """The CSV export URL of one sheet of an observatory's Google Sheet."""
+    sampling_sheet_base = sheet_link.split("/edit")[0]
+    sampling_sheet_suffix = f"/gviz/tq?tqx=out:csv&sheet={sheet_type}"
+    return sampling_sheet_base + sampling_sheet_suffix
+
+
+def get_sheet(sheet_link: str, sheet_type: str) -> pd.DataFrame:
+    """Returns a Pandas dataframe of the 'sampling', 'measured' or
+    'observatory' sheet from the observatories' Google Sheets.
+    """
+    return read_csv_url(sheet_url(sheet_link, sheet_type), encoding="utf-8")
+
+
+def get_crate_sheet(
+    observatory_id: str, sampling_strategy: str, sheet_type: str
+) -> pd.DataFrame | None:
+    """Returns the QC'd 'transformed' sheet from the observatory's crate on
+    Github, or None if it doesn't have one (yet).
+    """
+    strategy = GITHUB_STRATEGIES.get(sampling_strategy, sampling_strategy)
+    url = (
+        f"{GITHUB_URL}/observatory-{observatory_id}-crate/main/logsheets/"
+        f"transformed/{strategy}_{sheet_type}.csv"
+    )
+    try:
+        return read_csv_url(url)
+    except HTTPError:
+        return None
+
+
+def get_refcodes() -> dict[str, str]:
+    """Returns {source_mat_id: ref_code} from the sequencing run-information
+    sheets of all batches.
+    """
+    refcodes: dict[str, str] = {}
+    for url in RUN_INFORMATION_URLS:
+        df = read_csv_url(url)
+        for source_mat_id, ref_code in df[
+            ["source_mat_id", "ref_code"]
+        ].values.tolist():
+            if source_mat_id in refcodes:
+                raise ValueError(f"Duplicate source material id {source_mat_id}")
+            refcodes[source_mat_id] = ref_code
+    return refcodes
+
+
+def filter_on_source_mat_id(d: dict[str, Any], job: SheetJob | None = None) -> bool:
+    """Whether to validate a record: its source_mat_id is filled in and no
+    exclude_rows rule of rules.json drops it (the unscoped ones only,
+    without the job).
+    """
+    try:
+        value = d["source_mat_id"]
+    except KeyError as e:
+        raise ValueError("Cannot find source_mat_id field") from e
+    if not source_mat_id_ok(value):
+        return False
+    if job is None:
+        return default_rules().keep_record(d)
+    return default_rules().keep_record(
+        d, job.observatory_id, job.sampling_strategy, job.model
+    )
+
+
+def validate_records(
+    validator: type[BaseModel],
+    records: list[dict[str, Any]],
+    errors: ErrorStore,
+    job: SheetJob,
+    strict: bool = False,
+) -> list[dict[str, Any]]:
+    """Validates each record, returning the dumped rows that passed and
+    adding the errors of those that did not to the error store. The passed
+    models are dumped together, see `serialize.dump_models`.
+
+    In strict mode pydantic doesn't coerce values, e.g. "7.9" to a float.
+    """
+    key = INDEX_FIELDS.get(job.sheet_type, "source_mat_id")
+    validated = []
+    for row in records:
+        row_id = row.get(key)
+        try:
+            vr = validator.model_validate(row, strict=strict)
+        except ValidationError as e:
+            errors.add_validation_error(
+                e,
+                model=job.model,
+                observatory_id=job.observatory_id,
+                sampling_strategy=job.sampling_strategy,
+                sheet_type=job.sheet_type,
+                source_mat_id=row_id,
+            )
+        else:
+            validated.append(vr)
+    return dump_models(validator, validated)
+
+
+def validate_sheet(
+    job: SheetJob, df: pd.DataFrame, strict: bool = False
+) -> SheetResult:
+    """Filters and validates an already fetched sheet, in pydantic's strict
+    mode if strict is set.
+    """
+    errors = ErrorStore()
+    timings: dict[str, float] = {}
+    n_fetched = len(df)
+    with stage_timer(timings, "normalize"):
+        df = default_rules().apply(
+            df, job.observatory_id, job.sampling_strategy, job.model
+        )
+        if job.sheet_type == "observatory":
+            # Note there is only one row per sheet
+            if n_fetched != 1:
+                raise RuntimeError(f"Error: {n_fetched} != 1")
+            obs_id = df["obs_id"].iloc[0]
+            if job.observatory_id != obs_id:
+                raise ValueError(f"Error: {job.observatory_id=} != {obs_id=}")
+        else:
+            df = df[
+                source_mat_id_mask(
+                    df, job.observatory_id, job.sampling_strategy, job.model
+                )
+            ]
+        data_records_filtered = df.to_dict(orient="records")
+
+    with stage_timer(timings, "validate"):
+        validated_rows = validate_records(
+            VALIDATOR_CLASSES[job.model], data_records_filtered, errors, job, strict
+        )
+        index = INDEX_FIELDS.get(job.sheet_type, "source_mat_id")
+        if validated_rows:
+            ndf = pd.DataFrame.from_records(validated_rows, index=index)
+        else:
+            ndf = pd.DataFrame()
+
+    counters = {
+        "rows_fetched": n_fetched,
+        "rows_filtered": n_fetched - len(data_records_filtered),
+        "rows_validated": len(validated_rows),
+        "rows_failed": len(data_records_filtered) - len(validated_rows),
+        "errors": len(errors),
+    }
+    return SheetResult(job, ndf, errors, counters, timings=timings)
+
+
+def run_job(
+    job: SheetJob,
+    columnar: bool = False,
+    window: QCWindow | None = None,
+    repair: bool = False,
+) -> SheetResult:
+    """Fetches and validates a single observatory/strategy/sheet, with the
+    columnar path (see `columnar.py`) if columnar is set. With a window only
+    the rows after the observatory's QC threshold are validated (see
+    `incremental.py`). If repair is set the sheet's mechanical errors are
+    repaired first and it is then validated in strict mode (see
+    `repair.py`).
+
+    Any exception is caught and returned in the result so that one broken
+    sheet doesn't stop the rest of the run.
+    """
+    timings: dict[str, float] = {}
+    n_bytes = bytes_fetched()
+    try:
+        with stage_timer(timings, "fetch"):
+            df = get_sheet(job.sheet_link, job.sheet_type)
+        repaired = None
+        if repair:
+            from .repair import repair_job_sheet
+
+            with stage_timer(timings, "repair"):
+                repaired = repair_job_sheet(job, df)
+            df = repaired[0]
+        threshold = window.thresholds.get(job.observatory_id) if window else None
+        if threshold is not None:
+            from .incremental import validate_sheet_window
+
+            result = validate_sheet_window(
+                job, df, threshold, window.snapshot_dir, columnar, strict=repair
+            )
+        elif columnar:
+            from .columnar import validate_sheet_columnar
+
+            result = validate_sheet_columnar(job, df, strict=repair)
+        else:
+            result = validate_sheet(job, df, strict=repair)
+        if repaired is not None:
+            changes = repaired[1]
+            result = result._replace(
+                counters={
+                    **result.counters,
+                    "cells_repaired": len(changes),
+                    "rows_repaired": changes["row"].nunique(),
+                },
+                repaired=repaired,
+            )
+    except Exception as e:
+        result = SheetResult(
+            job,
+            pd.DataFrame(),
+            ErrorStore(),
+            {"jobs_failed": 1},
+            failure=f"{type(e).__name__}: {e}",
+        )
+    return result._replace(
+        counters={**result.counters, "bytes_downloaded": bytes_fetched() - n_bytes},
+        timings={**timings, **(result.timings or {})},
+    )
+
+
+def write_result(result: SheetResult, save_dir: str | Path) -> Path | None:
+    """Writes the validated sheet, as the notebooks do, returning its path."""
+    if result.failure is not None or result.validated.empty:
+        return None
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    out_path = save_dir / f"{result.job.name}_validated.csv"
+    result.validated.to_csv(out_path)
+    return out_path
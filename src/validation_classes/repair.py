@@ -0,0 +1,248 @@
+"""Repair the mechanical errors of a sheet before validating it.
+
+Most of the recurring errors are the same few mistakes, which the model
+validators either coerce on every run or reject back to the observatory
+to fix by hand. Here they are fixed column-wise before validation:
+
+- date_dmy: dd/mm/YYYY (or dd.mm.YYYY) dates as YYYY-MM-DD
+- decimal_comma: 7,9 and 36,356.62 in float fields as 7.9 and 36356.62
+- number_text: numbers written as text in float-only fields as floats
+- yes_no: y/n, t/f, yes/no and true/false in bool fields as bools
+- integer: whole floats in int fields (e.g. a tax_id read as 1234.0)
+- replicate_text: replicate numbers as text, see
+  https://github.com/emo-bon/observatory-profile/issues/33
+
+Every changed cell is logged, and the repaired sheet is then validated in
+pydantic's strict mode, so that anything the repairs didn't fix is an
+error rather than being coerced quietly:
+
+    python -m validation_classes validate --repair --out DIR
+
+writes DIR/<sheet>_repaired.csv and DIR/<sheet>_repaired.changes.csv
+next to the validated sheets.
+"""
+
+from __future__ import annotations
+
+import types
+import typing
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from .pipeline import INDEX_FIELDS, VALIDATOR_CLASSES, SheetJob
+
+DATE_FIELDS = (
+    "collection_date",
+    "samp_store_date",
+    "ship_date",
+    "arr_date_hq",
+    "ship_date_seq",
+    "arr_date_seq",
+)
+BOOL_FIELDS = ("membr_cut", "failure", "long_store")
+INT_FIELDS = ("tax_id", "samp_store_temp", "store_temp_hq")
+TEXT_FIELDS = ("replicate",)
+BOOL_VALUES = {
+    "y": True,
+    "yes": True,
+    "t": True,
+    "true": True,
+    "τ": True,  # A Greek Tau in ROSKOGO
+    "n": False,
+    "no": False,
+    "f": False,
+    "false": False,
+}
+NUMBER = r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?"
+CHANGE_FIELDS = ("row", "source_mat_id", "column", "repair", "old", "new")
+
+# (repaired values, changed mask) of a column
+Repair = Callable[[pd.Series], tuple[pd.Series, pd.Series]]
+
+
+def _types(annotation: Any) -> set[Any]:
+    if isinstance(annotation, types.UnionType) or (
+        typing.get_origin(annotation) is typing.Union
+    ):
+        return set(typing.get_args(annotation)) - {type(None)}
+    return {annotation}
+
+
+def float_fields(validator: type[BaseModel], text: bool = True) -> list[str]:
+    """The fields of the model that take a float, and also text if set."""
+    return [
+        name
+        for name, info in validator.model_fields.items()
+        if float in _types(info.annotation)
+        and (text or str not in _types(info.annotation))
+        and name not in INT_FIELDS
+    ]
+
+
+def _text(column: pd.Series) -> pd.Series:
+    """The str values of column, stripped, and NaN elsewhere."""
+    if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+        return pd.Series(np.nan, index=column.index, dtype=object)
+    is_str = column.map(lambda value: isinstance(value, str)).astype(bool)
+    return column.where(is_str).str.strip()
+
+
+def _numbers(column: pd.Series) -> pd.Series:
+    """The int and float (but not bool) values of column, NaN elsewhere."""
+    if pd.api.types.is_bool_dtype(column):
+        return pd.Series(np.nan, index=column.index)
+    if pd.api.types.is_numeric_dtype(column):
+        return column.astype(float)
+    is_number = column.map(
+        lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+    ).astype(bool)
+    return column.where(is_number).astype(float)
+
+
+def _to_float(text: pd.Series) -> pd.Series:
+    """The text that is a number as floats, and NaN elsewhere. Unlike
+    pd.to_numeric the floats are parsed exactly.
+    """
+    is_number = text.str.fullmatch(NUMBER, na=False)
+    return text.where(is_number).astype(float)
+
+
+def repair_dates(column: pd.Series) -> tuple[pd.Series, pd.Series]:
+    parts = _text(column).str.extract(r"^(\d{1,2})[/.](\d{1,2})[/.](\d{4})$")
+    iso = parts[2] + "-" + parts[1].str.zfill(2) + "-" + parts[0].str.zfill(2)
+    changed = pd.to_datetime(iso, format="%Y-%m-%d", errors="coerce").notna()
+    return iso, changed
+
+
+def repair_decimal_commas(column: pd.Series) -> tuple[pd.Series, pd.Series]:
+    text = _text(column)
+    thousands = text.str.fullmatch(r"[+-]?\d{1,3}(,\d{3})+\.\d+", na=False)
+    text = text.where(thousands, text.str.replace(",", ".", regex=False))
+    text = text.mask(thousands, text.str.replace(",", "", regex=False))
+    numbers = _to_float(text)
+    return numbers, numbers.notna() & _text(column).str.contains(",", na=False)
+
+
+def repair_number_text(column: pd.Series) -> tuple[pd.Series, pd.Series]:
+    numbers = _to_float(_text(column))
+    return numbers, numbers.notna()
+
+
+def repair_bools(column: pd.Series) -> tuple[pd.Series, pd.Series]:
+    values = _text(column).str.lower().map(BOOL_VALUES)
+    return values, values.notna()
+
+
+def repair_integers(column: pd.Series) -> tuple[pd.Series, pd.Series]:
+    numbers = _numbers(column)
+    changed = numbers.notna() & (numbers % 1 == 0)
+    if not pd.api.types.is_float_dtype(column):
+        # Only the floats need it
+        changed &= column.map(lambda value: isinstance(value, float)).astype(bool)
+    return numbers.where(changed).astype("Int64").astype(object), changed
+
+
+def repair_replicates(column: pd.Series) -> tuple[pd.Series, pd.Series]:
+    numbers = _numbers(column)
+    changed = numbers.notna() & (numbers % 1 == 0)
+    return (
+        numbers.where(changed).map(lambda value: str(int(value)), na_action="ignore"),
+        changed,
+    )
+
+
+def column_repairs(validator: type[BaseModel]) -> list[tuple[str, str, Repair]]:
+    """(column, repair name, repair) of the model's fields, in the order
+    they are applied.
+    """
+    fields = validator.model_fields
+    repairs: list[tuple[str, str, Repair]] = []
+    repairs += [(f, "date_dmy", repair_dates) for f in DATE_FIELDS if f in fields]
+    repairs += [
+        (f, "decimal_comma", repair_decimal_commas) for f in float_fields(validator)
+    ]
+    # Where text is allowed it is left as it is, e.g. a size_frac of "3"
+    repairs += [
+        (f, "number_text", repair_number_text)
+        for f in float_fields(validator, text=False)
+    ]
+    repairs += [(f, "yes_no", repair_bools) for f in BOOL_FIELDS if f in fields]
+    repairs += [(f, "integer", repair_integers) for f in INT_FIELDS if f in fields]
+    repairs += [
+        (f, "replicate_text", repair_replicates) for f in TEXT_FIELDS if f in fields
+    ]
+    return repairs
+
+
+def repair_sheet(
+    df: pd.DataFrame, validator: type[BaseModel], key: str = "source_mat_id"
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Applies the repairs of `column_repairs` to the columns of df.
+
+    Returns the repaired sheet and its change log, one row per changed
+    cell with its row position, the key of its row, the column, the name
+    of the repair and the old and new values.
+    """
+    repaired = df
+    changes = []
+    for column, name, repair in column_repairs(validator):
+        if column not in repaired:
+            continue
+        values, changed = repair(repaired[column])
+        if not changed.any():
+            continue
+        if repaired is df:
+            repaired = df.copy()
+        old = repaired[column]
+        rows = np.flatnonzero(changed.to_numpy())
+        changes.append(
+            pd.DataFrame(
+                {
+                    "row": rows,
+                    "source_mat_id": (
+                        repaired[key].to_numpy()[rows] if key in repaired else None
+                    ),
+                    "column": column,
+                    "repair": name,
+                    "old": old.to_numpy()[rows],
+                    "new": values.to_numpy()[rows],
+                }
+            )
+        )
+        repaired[column] = old.astype(object).mask(changed, values)
+    if not changes:
+        return repaired, pd.DataFrame(columns=list(CHANGE_FIELDS))
+    return repaired, pd.concat(changes, ignore_index=True).sort_values(
+        ["row", "column"], kind="stable", ignore_index=True
+    )
+
+
+def repair_job_sheet(
+    job: SheetJob, df: pd.DataFrame
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """`repair_sheet` with the model and index field of the job."""
+    return repair_sheet(
+        df,
+        VALIDATOR_CLASSES[job.model],
+        INDEX_FIELDS.get(job.sheet_type, "source_mat_id"),
+    )
+
+
+def write_repairs(
+    job: SheetJob, repaired: pd.DataFrame, changes: pd.DataFrame, save_dir: str | Path
+) -> list[Path]:
+    """Writes the repaired sheet and its change log, if anything changed."""
+    if changes.empty:
+        return []
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    sheet_path = save_dir / f"{job.name}_repaired.csv"
+    repaired.to_csv(sheet_path, index=False)
+    changes_path = save_dir / f"{job.name}_repaired.changes.csv"
+    changes.to_csv(changes_path, index=False)
+    return [sheet_path, changes_path]
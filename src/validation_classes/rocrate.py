@@ -0,0 +1,294 @@
+"""RO-Crate metadata for the validated outputs of each observatory.
+
+Each observatory gets an RO-Crate 1.1 metadata file,
+
+    validated-data/rocrates/<observatory_id>/ro-crate-metadata.json
+
+listing its validated sheets (of logsheets/, logsheets_mandatory/,
+logsheets_github/, combined_logsheets/ and observatories/, by their file
+name prefix where that is an observatory of the governance table or the
+file is a *_validated.csv) with their size, modification date and SHA-256 checksum, and conforming
+to the rocrate_profile_uri of the governance logsheets table. The files
+are referenced relative to the crate, i.e. as ../../logsheets/...
+
+The checksums are kept in validated-data/checksums.json along with each
+file's size and modification time, and only files where either changed
+are hashed again, in a thread pool. A crate is only rewritten if its
+content changed, so packaging the whole tree after a run is cheap:
+
+    python -m validation_classes rocrate
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from collections.abc import Collection, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from .pipeline import LOGSHEETS_VALIDATED_CSV, VALIDATED_DATA_DIR
+
+ROCRATE_SPEC = "https://w3id.org/ro/crate/1.1"
+METADATA_FILE = "ro-crate-metadata.json"
+CRATES_DIR = "rocrates"
+CHECKSUMS_FILE = "checksums.json"
+# The directories with per-observatory files, named <observatory_id>_...
+SHEET_DIRS = (
+    "logsheets",
+    "logsheets_mandatory",
+    "logsheets_github",
+    "combined_logsheets",
+    "observatories",
+)
+CHUNK_BYTES = 2**20
+# encodingFormat by file suffix
+ENCODING_FORMATS = {
+    ".csv": "text/csv",
+    ".json": "application/json",
+    ".parquet": "application/vnd.apache.parquet",
+    ".prom": "text/plain",
+    ".txt": "text/plain",
+}
+DEFAULT_ENCODING_FORMAT = "application/octet-stream"
+
+
+class FileRecord(NamedTuple):
+    path: str  # Relative to the root, with / separators
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+class PackageReport(NamedTuple):
+    crates: int
+    crates_written: int
+    files: int
+    files_hashed: int
+    seconds: float
+
+
+def sha256_file(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_text(path: Path, text: str) -> None:
+    """Writes text atomically, through a temporary file."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class ChecksumCache:
+    """{relative path: FileRecord} of the files hashed before."""
+
+    def __init__(self, root: str | Path, path: str | Path | None = None) -> None:
+        self.root = Path(root)
+        self.path = Path(path) if path is not None else self.root / CHECKSUMS_FILE
+        self.records: dict[str, FileRecord] = {}
+        self.changed = False
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.records = {
+                rel: FileRecord(rel, **record) for rel, record in data.items()
+            }
+
+    def update(
+        self, paths: Iterable[Path], max_workers: int = 8
+    ) -> tuple[dict[str, FileRecord], int]:
+        """The records of paths, hashing only those whose size or mtime
+        differ from the cache. Returns them and the number hashed.
+        """
+        records = {}
+        stale = []
+        for path in paths:
+            rel = path.relative_to(self.root).as_posix()
+            stat = path.stat()
+            cached = self.records.get(rel)
+            if (
+                cached is not None
+                and cached.size == stat.st_size
+                and cached.mtime_ns == stat.st_mtime_ns
+            ):
+                records[rel] = cached
+            else:
+                stale.append((rel, path, stat))
+        if stale:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                digests = pool.map(sha256_file, [path for _, path, _ in stale])
+                for (rel, _, stat), digest in zip(stale, digests, strict=True):
+                    records[rel] = FileRecord(
+                        rel, stat.st_size, stat.st_mtime_ns, digest
+                    )
+        self.changed = bool(stale) or records.keys() != self.records.keys()
+        self.records = records
+        return records, len(stale)
+
+    def save(self) -> None:
+        data = {rel: record._asdict() for rel, record in sorted(self.records.items())}
+        for record in data.values():
+            del record["path"]
+        _write_text(self.path, json.dumps(data, indent=1) + "\n")
+
+
+def observatory_files(
+    root: str | Path, observatory_ids: Collection[str] = ()
+) -> dict[str, list[Path]]:
+    """{observatory_id: its files in the SHEET_DIRS of root}. A file
+    belongs to the observatory of its name prefix if that is one of
+    observatory_ids or the file is a *_validated.csv, so run outputs such
+    as validation_errors.json are not taken for observatories.
+    """
+    files: dict[str, list[Path]] = {}
+    for sheet_dir in SHEET_DIRS:
+        directory = Path(root) / sheet_dir
+        if not directory.is_dir():
+            continue
+        for path in sorted(directory.iterdir()):
+            if not path.is_file() or "_" not in path.name:
+                continue
+            observatory_id = path.name.split("_", 1)[0]
+            if observatory_id in observatory_ids or path.name.endswith(
+                "_validated.csv"
+            ):
+                files.setdefault(observatory_id, []).append(path)
+    return files
+
+
+def encoding_format(path: str) -> str:
+    """The media type of a file, by its suffix."""
+    return ENCODING_FORMATS.get(Path(path).suffix.lower(), DEFAULT_ENCODING_FORMAT)
+
+
+def _isoformat(mtime_ns: int) -> str:
+    return (
+        datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc)
+        .replace(microsecond=0)
+        .isoformat()
+    )
+
+
+def crate_metadata(
+    observatory_id: str,
+    files: list[FileRecord],
+    governance: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """The RO-Crate JSON-LD of an observatory's files. governance is its
+    row of the logsheets table, if it has one.
+    """
+    parts = [
+        {
+            "@id": "../../" + record.path,  # From CRATES_DIR/<observatory_id>
+            "@type": "File",
+            "name": record.path.rsplit("/", 1)[-1],
+            "encodingFormat": encoding_format(record.path),
+            "contentSize": str(record.size),
+            "dateModified": _isoformat(record.mtime_ns),
+            "sha256": record.sha256,
+        }
+        for record in sorted(files)
+    ]
+    dataset: dict[str, Any] = {
+        "@id": "./",
+        "@type": "Dataset",
+        "identifier": observatory_id,
+        "name": f"EMO BON {observatory_id} validated logsheets",
+        "description": (
+            f"The sampling, measured and observatory logsheets of {observatory_id} "
+            "as validated by emo-bon-data-validation"
+        ),
+        "datePublished": max(
+            (part["dateModified"] for part in parts), default=_isoformat(0)
+        ),
+        "hasPart": [{"@id": part["@id"]} for part in parts],
+    }
+    graph: list[dict[str, Any]] = [
+        {
+            "@id": METADATA_FILE,
+            "@type": "CreativeWork",
+            "conformsTo": {"@id": ROCRATE_SPEC},
+            "about": {"@id": "./"},
+        },
+        dataset,
+        *parts,
+    ]
+    governance = governance or {}
+    profile = governance.get("rocrate_profile_uri")
+    if isinstance(profile, str) and profile:
+        dataset["conformsTo"] = {"@id": profile}
+        graph.append(
+            {"@id": profile, "@type": "CreativeWork", "name": "EMO BON profile"}
+        )
+    institute = governance.get("institute")
+    if isinstance(institute, str) and institute:
+        dataset["publisher"] = {"@id": "#publisher"}
+        graph.append(
+            {
+                "@id": "#publisher",
+                "@type": "Organization",
+                "name": institute,
+                "location": governance.get("country"),
+            }
+        )
+    return {"@context": f"{ROCRATE_SPEC}/context", "@graph": graph}
+
+
+def read_governance(
+    logsheets_csv: str | Path = LOGSHEETS_VALIDATED_CSV,
+) -> dict[str, dict[str, Any]]:
+    """{observatory_id: its row of the governance logsheets table}"""
+    from .ingest import read_csv_records
+
+    if not Path(logsheets_csv).exists():
+        return {}
+    return {
+        record["observatory_id"]: record
+        for record in read_csv_records(Path(logsheets_csv).read_bytes())
+    }
+
+
+def write_crates(
+    root: str | Path = VALIDATED_DATA_DIR,
+    logsheets_csv: str | Path | None = LOGSHEETS_VALIDATED_CSV,
+    max_workers: int = 8,
+) -> PackageReport:
+    """Writes the crate of every observatory with files under root."""
+    start = time.perf_counter()
+    root = Path(root)
+    governance = read_governance(logsheets_csv) if logsheets_csv is not None else {}
+    files = observatory_files(root, governance.keys())
+    cache = ChecksumCache(root)
+    records, n_hashed = cache.update(
+        [path for paths in files.values() for path in paths], max_workers
+    )
+    n_written = 0
+    for observatory_id, paths in files.items():
+        metadata = crate_metadata(
+            observatory_id,
+            [records[path.relative_to(root).as_posix()] for path in paths],
+            governance.get(observatory_id),
+        )
+        text = json.dumps(metadata, indent=1, ensure_ascii=False) + "\n"
+        path = root / CRATES_DIR / observatory_id / METADATA_FILE
+        if path.exists() and path.read_text(encoding="utf-8") == text:
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_text(path, text)
+        n_written += 1
+    if cache.changed:
+        cache.save()
+    return PackageReport(
+        len(files),
+        n_written,
+        len(records),
+        n_hashed,
+        time.perf_counter() - start,
+    )
@@ -0,0 +1,309 @@
+"""The observatory exceptions, from the versioned rules.json.
+
+The notebooks hardcode the sheets to skip (Plenzia, UMF soft sediment),
+Bergen's source_material_id column, the rows to drop ("si les filets",
+EMOBON_VB_Wa_230509_um_), NRMCB's "expected 06-2024" dates and the known
+duplicates. These are now entries of rules.json, each scoped by any of
+observatory_id, sampling_strategy and models, with the reason for it:
+
+    {"observatory_id": "VB", "column": "source_mat_id",
+     "equals": "EMOBON_VB_Wa_230509_um_", "reason": "..."}
+
+"contains" and "pattern" are matched case-sensitively, as the notebooks
+did, unless the entry has "ignore_case": true.
+
+The file is compiled once into per-column value sets and regexes, which
+are applied to a whole sheet with isin and str.contains, or to one record
+for the pandas-free paths.
+
+Nothing in this module imports pandas, it only calls the frame's methods.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+RULES_PATH = Path(__file__).with_name("rules.json")
+RULES_VERSION = 1
+
+
+class Scope(NamedTuple):
+    observatory_id: str | None = None
+    sampling_strategy: str | None = None
+    models: frozenset[str] | None = None
+
+    def applies(
+        self,
+        observatory_id: str | None,
+        sampling_strategy: str | None,
+        model: str | None,
+    ) -> bool:
+        """Unscoped fields apply to everything, and a scoped field never
+        applies to an unknown (None) sheet.
+        """
+        return (
+            (self.observatory_id is None or self.observatory_id == observatory_id)
+            and (
+                self.sampling_strategy is None
+                or self.sampling_strategy == sampling_strategy
+            )
+            and (self.models is None or model in self.models)
+        )
+
+
+class ColumnRule(NamedTuple):
+    scope: Scope
+    column: str
+    values: frozenset[str]  # Exact values
+    pattern: re.Pattern[str] | None  # Searched for in str values
+
+
+def _scope(entry: dict[str, Any]) -> Scope:
+    models = entry.get("models")
+    return Scope(
+        entry.get("observatory_id"),
+        entry.get("sampling_strategy"),
+        frozenset(models) if models is not None else None,
+    )
+
+
+def _compile(entries: list[dict[str, Any]]) -> list[ColumnRule]:
+    """Merges the entries with the same scope and column into one value set
+    and one regex.
+    """
+    merged: dict[tuple[Scope, str], tuple[set[str], list[str]]] = {}
+    for entry in entries:
+        columns = entry.get("columns") or [entry["column"]]
+        for column in columns:
+            values, patterns = merged.setdefault((_scope(entry), column), (set(), []))
+            if "equals" in entry:
+                values.add(entry["equals"])
+            # Case-sensitive unless the entry says otherwise
+            group = "(?i:{})" if entry.get("ignore_case") else "(?:{})"
+            if "contains" in entry:
+                patterns.append(group.format(re.escape(entry["contains"])))
+            if "pattern" in entry:
+                patterns.append(group.format(entry["pattern"]))
+    return [
+        ColumnRule(
+            scope,
+            column,
+            frozenset(values),
+            re.compile("|".join(patterns)) if patterns else None,
+        )
+        for (scope, column), (values, patterns) in merged.items()
+    ]
+
+
+def _is_str(values: pd.Series) -> pd.Series:
+    return values.map(lambda value: isinstance(value, str)).astype(bool)
+
+
+def _matches(rule: ColumnRule, values: pd.Series) -> pd.Series:
+    """Where the column's values match the rule."""
+    matches = values.isin(rule.values)
+    if rule.pattern is not None:
+        is_str = _is_str(values)
+        matches |= is_str & values.where(is_str, "").str.contains(
+            rule.pattern, regex=True
+        )
+    return matches
+
+
+def _value_matches(rule: ColumnRule, value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    return value in rule.values or (
+        rule.pattern is not None and rule.pattern.search(value) is not None
+    )
+
+
+class Rules:
+    """The compiled rules. The methods take the sheet's observatory_id,
+    sampling_strategy and model, e.g. from a `pipeline.SheetJob`.
+    """
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        if data.get("version") != RULES_VERSION:
+            raise ValueError(f"Unsupported rules version {data.get('version')}")
+        self.version = data["version"]
+        self.skip_sheets = [
+            (_scope(entry), entry.get("reason", "")) for entry in data["skip_sheets"]
+        ]
+        self.column_aliases = [
+            (_scope(entry), entry["column"], entry["alias_of"])
+            for entry in data["column_aliases"]
+        ]
+        self.exclude_rows = _compile(data["exclude_rows"])
+        self.null_values = _compile(data["null_values"])
+        self.known_duplicates = tuple(data["known_duplicates"])
+
+    @classmethod
+    def load(cls, path: str | Path = RULES_PATH) -> Rules:
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def skip_reason(
+        self, observatory_id: str, sampling_strategy: str, model: str
+    ) -> str | None:
+        """Why the sheet is not validated, or None if it is."""
+        for scope, reason in self.skip_sheets:
+            if scope.applies(observatory_id, sampling_strategy, model):
+                return reason
+        return None
+
+    def aliases(
+        self,
+        observatory_id: str | None = None,
+        sampling_strategy: str | None = None,
+        model: str | None = None,
+    ) -> dict[str, str]:
+        """{column in the sheet: the column the models expect}"""
+        return {
+            column: alias_of
+            for scope, column, alias_of in self.column_aliases
+            if scope.applies(observatory_id, sampling_strategy, model)
+        }
+
+    def apply(
+        self,
+        df: pd.DataFrame,
+        observatory_id: str | None = None,
+        sampling_strategy: str | None = None,
+        model: str | None = None,
+    ) -> pd.DataFrame:
+        """Renames the aliased columns and blanks the null_values. Returns
+        df itself if no rule changes it.
+        """
+        aliases = {
+            column: alias_of
+            for column, alias_of in self.aliases(
+                observatory_id, sampling_strategy, model
+            ).items()
+            if column in df.columns and alias_of not in df.columns
+        }
+        copied = bool(aliases)
+        if aliases:
+            df = df.rename(columns=aliases)
+        for rule in self.null_values:
+            if rule.column not in df.columns or not rule.scope.applies(
+                observatory_id, sampling_strategy, model
+            ):
+                continue
+            matches = _matches(rule, df[rule.column])
+            if matches.any():
+                if not copied:
+                    df = df.copy()
+                    copied = True
+                df[rule.column] = df[rule.column].mask(matches, None)
+        return df
+
+    def apply_records(
+        self,
+        records: list[dict[str, Any]],
+        observatory_id: str | None = None,
+        sampling_strategy: str | None = None,
+        model: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """`apply` for the records of a sheet, e.g. from `ingest`."""
+        if not records:
+            return records
+        aliases = {
+            column: alias_of
+            for column, alias_of in self.aliases(
+                observatory_id, sampling_strategy, model
+            ).items()
+            if column in records[0] and alias_of not in records[0]
+        }
+        null_values = [
+            rule
+            for rule in self.null_values
+            if (rule.column in records[0] or rule.column in aliases.values())
+            and rule.scope.applies(observatory_id, sampling_strategy, model)
+        ]
+        if not aliases and not null_values:
+            return records
+        applied = []
+        for record in records:
+            record = {aliases.get(k, k): v for k, v in record.items()}
+            for rule in null_values:
+                if _value_matches(rule, record.get(rule.column)):
+                    record[rule.column] = None
+            applied.append(record)
+        return applied
+
+    def keep_mask(
+        self,
+        df: pd.DataFrame,
+        observatory_id: str | None = None,
+        sampling_strategy: str | None = None,
+        model: str | None = None,
+    ) -> pd.Series:
+        """False for the rows of df that an exclude_rows rule drops."""
+        keep = df.iloc[:, :0].assign(keep=True)["keep"]
+        for rule in self.exclude_rows:
+            if rule.column in df.columns and rule.scope.applies(
+                observatory_id, sampling_strategy, model
+            ):
+                keep &= ~_matches(rule, df[rule.column])
+        return keep
+
+    def keep_record(
+        self,
+        record: dict[str, Any],
+        observatory_id: str | None = None,
+        sampling_strategy: str | None = None,
+        model: str | None = None,
+    ) -> bool:
+        """`keep_mask` for one record."""
+        return not any(
+            _value_matches(rule, record.get(rule.column))
+            for rule in self.exclude_rows
+            if rule.scope.applies(observatory_id, sampling_strategy, model)
+        )
+
+
+@lru_cache(maxsize=1)
+def default_rules() -> Rules:
+    return Rules.load()
+
+
+def source_mat_id_ok(value: Any) -> bool:
+    """Whether a row's source_mat_id is filled in. Sheets have many
+    partially filled rows, and the source_mat_id is the primary key.
+    """
+    if isinstance(value, float):
+        if math.isnan(value):
+            return False
+        raise ValueError(f"Unrecognised float value: {value} in source_mat_id")
+    return isinstance(value, str) and len(value.split("_")) >= 4
+
+
+def source_mat_id_mask(
+    df: pd.DataFrame,
+    observatory_id: str | None = None,
+    sampling_strategy: str | None = None,
+    model: str | None = None,
+    rules: Rules | None = None,
+) -> pd.Series:
+    """The rows with a source_mat_id that no exclude_rows rule drops."""
+    if "source_mat_id" not in df.columns:
+        raise ValueError("Cannot find source_mat_id field")
+    ids = df["source_mat_id"]
+    is_str = _is_str(ids)
+    bad_floats = ids[~is_str & ids.notna()]
+    if not bad_floats.empty:
+        raise ValueError(
+            f"Unrecognised float value: {bad_floats.iloc[0]} in source_mat_id"
+        )
+    mask = is_str & (ids.where(is_str, "").str.count("_") >= 3)
+    if rules is None:
+        rules = default_rules()
+    return mask & rules.keep_mask(df, observatory_id, sampling_strategy, model)
@@ -0,0 +1,182 @@
+"""Parse source_mat_id into its parts and cross-check them with the sheet.
+
+source_mat_ids come in two forms:
+
+    EMOBON_AAOT_Wa_1                       project_observatory_strategy_number
+    EMOBON_AAOT_Wa_210622_3um_1            ..._yymmdd_size fraction_replicate
+    EMOBON_EMT21_So_211020_macro_1mm_1
+
+Each sheet's ids are parsed in one vectorized `str.extract` with a single
+compiled pattern, rather than split on "_" per row. The parts are then
+checked against obs_id, the sampling strategy, collection_date, size_frac
+and replicate. Ids that match neither form, e.g. EMOBON_VB_Wa_230509_um_,
+are reported as malformed.
+
+The Google Sheets give the short form, which has no date, size fraction
+or replicate to check. Those come from the long form, in the QC'd Github
+sheets (logsheets_github/) or, where it parses, in source_mat_id_orig:
+
+    python -m validation_classes sample-ids --out errors.csv
+"""
+
+from __future__ import annotations
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .errors import ErrorStore
+from .pipeline import SheetJob
+
+SOURCE_MAT_ID_PATTERN = re.compile(
+    r"^(?P<project>EMOBON)_(?P<observatory>[A-Za-z0-9-]+)_(?P<strategy>Wa|So)_"
+    r"(?:(?P<number>\d+)"
+    r"|(?P<date>\d{6})"
+    r"_(?P<size_frac>(?:\d+(?:\.\d+)?um|micro|meio|macro)(?:_\d+(?:\.\d+)?mm)?)"
+    r"_(?P<replicate>\d+|blank\d*))$"
+)
+
+STRATEGY_CODES = {"Wa": "water_column", "So": "soft_sediment"}
+
+# The lower bound of a size_frac such as "0.2-3", ">200" or "3"
+SIZE_FRAC_LOWER = re.compile(r"\s*>?\s*(\d+(?:\.\d+)?)")
+
+
+def parse_source_mat_ids(ids: pd.Series) -> pd.DataFrame:
+    """Returns the parts of each id, all NaN where it does not parse, with
+    the same index as ids.
+    """
+    is_str = ids.map(lambda value: isinstance(value, str)).astype(bool)
+    return ids.where(is_str, "").astype(str).str.extract(SOURCE_MAT_ID_PATTERN)
+
+
+def _size_frac_lower(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(
+        values.astype(str).str.extract(SIZE_FRAC_LOWER, expand=False),
+        errors="coerce",
+    )
+
+
+def _replicate_text(value: object) -> str | None:
+    """E.g. 1.0 as "1", and "blank", "blank1" and "Blank_1" as "blank1"."""
+    if isinstance(value, float):
+        return None if np.isnan(value) else f"{value:g}"
+    if value is None or value is pd.NA:
+        return None
+    text = re.sub(r"[\s_]+", "", str(value)).casefold()
+    return "blank1" if text == "blank" else text
+
+
+def check_source_mat_ids(
+    df: pd.DataFrame, errors: ErrorStore, job: SheetJob
+) -> pd.DataFrame:
+    """Adds an error for each id that does not parse and for each part that
+    disagrees with the row. Returns the parsed parts.
+    """
+    df = df.reset_index()
+    # Typed frames (see `loaders.py`) have categorical and nullable columns
+    for field in ("source_mat_id", "source_mat_id_orig", "size_frac", "replicate"):
+        if field in df:
+            df[field] = df[field].astype(object)
+    ids = df["source_mat_id"]
+    parts = parse_source_mat_ids(ids)
+    parsed = parts["project"].notna()
+    from_orig = pd.Series(False, index=df.index)
+    if "source_mat_id_orig" in df:
+        # The date, size fraction and replicate of a short-form id from the
+        # long form in source_mat_id_orig, if it has one
+        orig = parse_source_mat_ids(df["source_mat_id_orig"])
+        from_orig = parts["number"].notna() & orig["date"].notna()
+        for part in ("date", "size_frac", "replicate"):
+            parts[part] = parts[part].where(~from_orig, orig[part])
+    long_form = parts["date"].notna()
+
+    checks: list[tuple[str, str, pd.Series, pd.Series]] = []
+    obs_ids = (
+        df["obs_id"]
+        if "obs_id" in df
+        else pd.Series(job.observatory_id, index=df.index)
+    )
+    checks.append(
+        ("obs_id", "observatory", obs_ids, parsed & (parts["observatory"] != obs_ids))
+    )
+    strategies = parts["strategy"].map(STRATEGY_CODES)
+    checks.append(
+        (
+            "source_mat_id",
+            "strategy",
+            ids,
+            parsed & (strategies != job.sampling_strategy),
+        )
+    )
+    if "collection_date" in df:
+        dates = pd.to_datetime(
+            df["collection_date"], errors="coerce", format="mixed"
+        ).dt.strftime("%y%m%d")
+        checks.append(
+            (
+                "collection_date",
+                "date",
+                df["collection_date"],
+                long_form & dates.notna() & (dates != parts["date"]),
+            )
+        )
+    if "size_frac" in df:
+        in_id = pd.to_numeric(
+            parts["size_frac"].str.extract(r"^(\d+(?:\.\d+)?)um", expand=False),
+            errors="coerce",
+        )
+        in_sheet = _size_frac_lower(df["size_frac"].where(df["size_frac"].notna(), ""))
+        checks.append(
+            (
+                "size_frac",
+                "size_frac",
+                df["size_frac"],
+                in_id.notna() & df["size_frac"].notna() & (in_id != in_sheet),
+            )
+        )
+    if "replicate" in df:
+        replicates = df["replicate"].map(_replicate_text)
+        checks.append(
+            (
+                "replicate",
+                "replicate",
+                df["replicate"],
+                long_form
+                & replicates.notna()
+                & (replicates != parts["replicate"].map(_replicate_text)),
+            )
+        )
+
+    for i in np.flatnonzero((ids.notna() & ~parsed).to_numpy()):
+        errors.add(
+            observatory_id=job.observatory_id,
+            sampling_strategy=job.sampling_strategy,
+            sheet_type=job.sheet_type,
+            model="source_mat_id",
+            source_mat_id=ids.iloc[i],
+            loc="source_mat_id",
+            type="source_mat_id_malformed",
+            msg="Not of the form EMOBON_<obs>_<Wa|So>_<n> or ..._<yymmdd>_<size>_<rep>",
+            input=ids.iloc[i],
+        )
+    for field, part, values, mismatch in checks:
+        for i in np.flatnonzero(mismatch.fillna(False).to_numpy(dtype=bool)):
+            source = (
+                "source_mat_id_orig"
+                if from_orig.iloc[i] and part in ("date", "size_frac", "replicate")
+                else "source_mat_id"
+            )
+            errors.add(
+                observatory_id=job.observatory_id,
+                sampling_strategy=job.sampling_strategy,
+                sheet_type=job.sheet_type,
+                model="source_mat_id",
+                source_mat_id=ids.iloc[i],
+                loc=field,
+                type=f"source_mat_id_{part}_mismatch",
+                msg=f"Does not match the {part} '{parts[part].iloc[i]}' of {source}",
+                input=values.iloc[i],
+            )
+    return parts
@@ -183,11 +183,9 @@ class ModelGithub(BaseModel):
                     # Day, month, year - 23/10/2023
                     return datetime.datetime.strptime(value, "%d/%m/%Y")
                 except ValueError as err:
-                    # NRMCB has "expected 06-2024"
-                    if "expected" in value.lower():
-                        return None
-                    else:
-                        raise ValueError(f"Unrecognised value: {value}") from err
+                    # Placeholders such as NRMCB's "expected 06-2024" are
+                    # blanked by the null_values of rules.json
+                    raise ValueError(f"Unrecognised value: {value}") from err
         else:
             raise ValueError(f"Unrecognised value: {value}")
 
@@ -314,11 +312,9 @@ class StrictModelGithub(BaseModel):
                     # Day, month, year - 23/10/2023
                     return datetime.datetime.strptime(value, "%d/%m/%Y")
                 except ValueError as err:
-                    # NRMCB has "expected 06-2024"
-                    if "expected" in value.lower():
-                        return None
-                    else:
-                        raise ValueError(f"Unrecognised value: {value}") from err
+                    # Placeholders such as NRMCB's "expected 06-2024" are
+                    # blanked by the null_values of rules.json
+                    raise ValueError(f"Unrecognised value: {value}") from err
         else:
             raise ValueError(f"Unrecognised value: {value}")
 
@@ -440,11 +436,9 @@ class SemiStrictModelGithub(BaseModel):
                     # Day, month, year - 23/10/2023
                     return datetime.datetime.strptime(value, "%d/%m/%Y")
                 except ValueError as err:
-                    # NRMCB has "expected 06-2024"
-                    if "expected" in value.lower():
-                        return None
-                    else:
-                        raise ValueError(f"Unrecognised value: {value}") from err
+                    # Placeholders such as NRMCB's "expected 06-2024" are
+                    # blanked by the null_values of rules.json
+                    raise ValueError(f"Unrecognised value: {value}") from err
         else:
             raise ValueError(f"Unrecognised value: {value}")
 
@@ -0,0 +1,146 @@
+"""Dump validated models in bulk and write them without a DataFrame.
+
+`model_dump()` per row runs the field serializers (serialize_dates,
+serialize_str_float_to_str...) one model at a time; `dump_models()` dumps
+a whole batch with a single `TypeAdapter(list[Model])` call instead.
+
+`write_csv()` writes the dumped rows with the csv module, byte for byte
+what `pd.DataFrame.from_records(rows, index=...).to_csv()` writes: each
+column is formatted as the dtype pandas would give it, e.g. an int column
+with gaps is written as floats. `write_parquet()` writes the same columns
+with pyarrow, if it is installed.
+
+Nothing in this module imports pandas.
+"""
+
+from __future__ import annotations
+
+import csv
+import math
+from collections.abc import Iterable, Sequence
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: type[BaseModel]) -> TypeAdapter[list[BaseModel]]:
+    return TypeAdapter(list[model])
+
+
+def dump_models(
+    model: type[BaseModel], models: Sequence[BaseModel]
+) -> list[dict[str, Any]]:
+    """The `model_dump()` of every model, from one call."""
+    return list_adapter(model).dump_python(models)
+
+
+def _is_null(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def column_kind(values: Iterable[Any]) -> str:
+    """The dtype pandas gives a column of these values, as one of 'int',
+    'float', 'bool', 'datetime' or 'object'.
+    """
+    kinds = set()
+    has_null = False
+    for value in values:
+        if _is_null(value):
+            has_null = True
+        elif isinstance(value, bool):
+            kinds.add("bool")
+        elif isinstance(value, int):
+            kinds.add("int")
+        elif isinstance(value, float):
+            kinds.add("float")
+        elif isinstance(value, datetime) and value.tzinfo is None:
+            kinds.add("datetime")
+        else:
+            kinds.add("object")
+    if not kinds:
+        return "float" if has_null else "object"
+    if kinds <= {"int", "float"}:
+        return "float" if has_null or "float" in kinds else "int"
+    if kinds == {"bool"}:
+        return "object" if has_null else "bool"
+    if kinds == {"datetime"}:
+        return "datetime"
+    return "object"
+
+
+def _datetime_format(values: list[Any]) -> str:
+    """pandas writes a datetime column as dates if all times are midnight."""
+    if all(
+        _is_null(v) or (v.hour, v.minute, v.second, v.microsecond) == (0, 0, 0, 0)
+        for v in values
+    ):
+        return "%Y-%m-%d"
+    if any(not _is_null(v) and v.microsecond for v in values):
+        return "%Y-%m-%d %H:%M:%S.%f"
+    return "%Y-%m-%d %H:%M:%S"
+
+
+def format_column(values: list[Any]) -> list[str]:
+    kind = column_kind(values)
+    if kind == "float":
+        return ["" if _is_null(v) else repr(float(v)) for v in values]
+    if kind == "datetime":
+        fmt = _datetime_format(values)
+        return ["" if _is_null(v) else v.strftime(fmt) for v in values]
+    return ["" if _is_null(v) else str(v) for v in values]
+
+
+def _columns(
+    rows: list[dict[str, Any]], index: str | None
+) -> tuple[list[str], list[list[Any]]]:
+    """The field names (index first) and values of the rows, with the
+    field order of the first row as from_records does.
+    """
+    fields = list(rows[0]) if rows else []
+    if index is not None:
+        fields.remove(index)
+        fields.insert(0, index)
+    return fields, [[row.get(field) for row in rows] for field in fields]
+
+
+def write_csv(
+    rows: list[dict[str, Any]], path: str | Path, index: str | None = None
+) -> None:
+    """Writes the rows as `DataFrame.from_records(rows, index=index).to_csv()`
+    would.
+    """
+    fields, columns = _columns(rows, index)
+    formatted = [format_column(values) for values in columns]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(fields if index is not None else ["", *fields])
+        if index is None:
+            formatted.insert(0, [str(i) for i in range(len(rows))])
+        writer.writerows(zip(*formatted, strict=True))
+
+
+def write_parquet(
+    rows: list[dict[str, Any]], path: str | Path, index: str | None = None
+) -> None:
+    """Writes the rows to Parquet, one column at a time. Needs pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Writing Parquet needs pyarrow, pip install pyarrow") from e
+
+    fields, columns = _columns(rows, index)
+    arrays = []
+    for values in columns:
+        kind = column_kind(values)
+        if kind in ("int", "float", "bool", "datetime"):
+            values = [None if _is_null(v) else v for v in values]
+        else:  # Mixed columns are written as they are in the CSV
+            values = format_column(values)
+            values = [None if v == "" else v for v in values]
+        arrays.append(pa.array(values))
+    pq.write_table(pa.table(arrays, names=fields), path)
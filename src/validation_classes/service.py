@@ -0,0 +1,368 @@
+"""A local HTTP service that validates posted logsheet CSVs.
+
+Instead of waiting on a notebook run, an operator (or their sheet's
+script) posts the CSV export of one sheet and gets back the result of
+every row. The models, their TypeAdapters and the governance tables are
+loaded once when the service starts, so a request only pays for parsing
+and validating its own rows (see `ingest.py`).
+
+    python -m validation_classes serve --port 8080
+
+    curl --data-binary @sampling.csv \\
+        "http://127.0.0.1:8080/validate?observatory=AAOT&strategy=water_column&sheet=sampling"
+
+GET /health returns the loaded models and observatories. The service
+binds to localhost by default and makes no outside requests.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from .errors import GROUP_FIELDS, ErrorStore
+from .ingest import (
+    FILTERED_MODELS,
+    INDEX_FIELDS,
+    MODELS,
+    keep_record,
+    read_csv_records,
+    validate_bulk,
+)
+from .pipeline import (
+    LOGSHEETS_VALIDATED_CSV,
+    SAMPLING_STRATEGIES,
+    SHEET_TYPES,
+    VALIDATED_DATA_DIR,
+)
+from .rules import default_rules
+
+OBSERVATORIES_VALIDATED_CSV = (
+    VALIDATED_DATA_DIR / "governance" / "observatories_validated.csv"
+)
+MAX_BODY_BYTES = 32 * 2**20
+# Source_mat_ids listed per error group of the summary
+SUMMARY_IDS = 5
+
+
+def _json_value(value: Any) -> Any:
+    """value as something json.dumps writes as valid JSON."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is None or isinstance(value, bool | int | float | str):
+        return value
+    if isinstance(value, list | tuple):
+        return [_json_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _json_value(v) for k, v in value.items()}
+    return str(value)
+
+
+class Governance:
+    """The observatories and their logsheet links from the governance
+    tables in validated-data.
+    """
+
+    def __init__(
+        self,
+        logsheets: list[dict[str, Any]],
+        observatories: list[dict[str, Any]] | None = None,
+    ) -> None:
+        self.strategies = {
+            record["observatory_id"]: {
+                strategy
+                for strategy in SAMPLING_STRATEGIES
+                if isinstance(record.get(strategy), str)
+            }
+            for record in logsheets
+        }
+        self.observatories = {
+            record["observatory_id"]: record for record in observatories or []
+        }
+
+    @classmethod
+    def load(
+        cls,
+        logsheets_csv: str | Path = LOGSHEETS_VALIDATED_CSV,
+        observatories_csv: str | Path | None = OBSERVATORIES_VALIDATED_CSV,
+    ) -> Governance:
+        logsheets = read_csv_records(Path(logsheets_csv).read_bytes())
+        observatories = None
+        if observatories_csv is not None and Path(observatories_csv).exists():
+            observatories = read_csv_records(Path(observatories_csv).read_bytes())
+        return cls(logsheets, observatories)
+
+    def check(
+        self, observatory_id: str, sampling_strategy: str
+    ) -> list[tuple[str, str]]:
+        """(type, msg) of each way the observatory and strategy disagree
+        with the governance tables.
+        """
+        if observatory_id not in self.strategies:
+            return [("unknown_observatory", "Not in the governance logsheets table")]
+        if sampling_strategy not in self.strategies[observatory_id]:
+            return [
+                (
+                    "unregistered_strategy",
+                    f"{observatory_id} has no {sampling_strategy} logsheet link",
+                )
+            ]
+        return []
+
+
+class ValidationService:
+    """Validates CSVs against the warm models. Safe to call from several
+    threads.
+    """
+
+    def __init__(self, governance: Governance | None = None) -> None:
+        self.governance = governance if governance is not None else Governance.load()
+        # Build every TypeAdapter up front
+        for model in MODELS.values():
+            validate_bulk(model, [])
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "models": sorted(MODELS),
+            "observatories": sorted(self.governance.strategies),
+        }
+
+    def validate(
+        self,
+        data: bytes,
+        observatory_id: str,
+        sampling_strategy: str,
+        sheet_type: str,
+        mandatory: bool = False,
+    ) -> dict[str, Any]:
+        """The counters, per-row results and error summary of one sheet, as
+        `pipeline.validate_sheet` would validate it. Raises ValueError for
+        arguments that name no sheet.
+        """
+        start = time.perf_counter()
+        if sheet_type not in SHEET_TYPES:
+            raise ValueError(
+                f"Unknown sheet {sheet_type}, expected one of {SHEET_TYPES}"
+            )
+        if sampling_strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(
+                f"Unknown strategy {sampling_strategy}, "
+                f"expected one of {SAMPLING_STRATEGIES}"
+            )
+        model_name = sheet_type
+        if mandatory and sheet_type == "sampling":
+            model_name = f"{sampling_strategy}_mandatory"
+        index_field = INDEX_FIELDS.get(model_name, "source_mat_id")
+
+        errors = ErrorStore()
+        job = {
+            "observatory_id": observatory_id,
+            "sampling_strategy": sampling_strategy,
+            "sheet_type": sheet_type,
+        }
+        for error_type, msg in self.governance.check(observatory_id, sampling_strategy):
+            errors.add(
+                **job,
+                model="governance",
+                source_mat_id=None,
+                loc="observatory_id",
+                type=error_type,
+                msg=msg,
+                input=observatory_id,
+            )
+
+        scope = (observatory_id, sampling_strategy, model_name)
+        records = default_rules().apply_records(
+            read_csv_records(data, encoding_errors="ignore"), *scope
+        )
+        if model_name in FILTERED_MODELS:
+            kept = [
+                i for i, record in enumerate(records) if keep_record(record, *scope)
+            ]
+        else:
+            kept = list(range(len(records)))
+        if sheet_type == "observatory":
+            for record in records:
+                if record.get("obs_id") != observatory_id:
+                    errors.add(
+                        **job,
+                        model="governance",
+                        source_mat_id=record.get("obs_id"),
+                        loc="obs_id",
+                        type="observatory_mismatch",
+                        msg=f"Does not match the observatory {observatory_id}",
+                        input=record.get("obs_id"),
+                    )
+        _, failed = validate_bulk(MODELS[model_name], [records[i] for i in kept])
+
+        statuses = ["filtered"] * len(records)
+        row_errors: dict[int, list[dict[str, Any]]] = {}
+        for i in kept:
+            statuses[i] = "valid"
+        for position, failures in failed.items():
+            i = kept[position]
+            statuses[i] = "invalid"
+            row_errors[i] = failures
+            for error in failures:
+                errors.add(
+                    **job,
+                    model=model_name,
+                    source_mat_id=records[i].get(index_field),
+                    loc=error["loc"],
+                    type=error["type"],
+                    msg=error["msg"],
+                    input=error.get("input"),
+                )
+
+        rows = []
+        for i, (record, status) in enumerate(zip(records, statuses, strict=True)):
+            row: dict[str, Any] = {
+                "row": i,
+                index_field: _json_value(record.get(index_field)),
+                "status": status,
+            }
+            if i in row_errors:
+                row["errors"] = [
+                    {
+                        "loc": ".".join(map(str, error["loc"])),
+                        "type": error["type"],
+                        "msg": error["msg"],
+                        "input": _json_value(error.get("input")),
+                    }
+                    for error in row_errors[i]
+                ]
+            rows.append(row)
+
+        return {
+            **job,
+            "model": model_name,
+            "valid": not errors,
+            "counters": {
+                "rows_fetched": len(records),
+                "rows_filtered": len(records) - len(kept),
+                "rows_validated": len(kept) - len(failed),
+                "rows_failed": len(failed),
+                "errors": len(errors),
+            },
+            "summary": self.summarise(errors),
+            "rows": rows,
+            "seconds": round(time.perf_counter() - start, 6),
+        }
+
+    @staticmethod
+    def summarise(errors: ErrorStore) -> list[dict[str, Any]]:
+        """The errors grouped by model, loc, type and msg, most frequent
+        first, with the first few source_mat_ids of each group.
+        """
+        counts: Counter[tuple[Any, ...]] = Counter()
+        ids: dict[tuple[Any, ...], list[Any]] = {}
+        for record in errors:
+            key = tuple(
+                ".".join(map(str, record[f])) if f == "loc" else record[f]
+                for f in GROUP_FIELDS
+            )
+            counts[key] += 1
+            group_ids = ids.setdefault(key, [])
+            if len(group_ids) < SUMMARY_IDS and record["source_mat_id"] is not None:
+                group_ids.append(_json_value(record["source_mat_id"]))
+        return [
+            {**dict(zip(GROUP_FIELDS, key, strict=True)), "count": n, "ids": ids[key]}
+            for key, n in counts.most_common()
+        ]
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    server: ValidationServer
+
+    def _send_json(self, status: int, body: dict[str, Any]) -> None:
+        data = json.dumps(body, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if urlsplit(self.path).path != "/health":
+            self._send_json(404, {"error": "Not found"})
+            return
+        self._send_json(200, self.server.service.health())
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/validate":
+            self._send_json(404, {"error": "Not found"})
+            return
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        missing = [k for k in ("observatory", "strategy", "sheet") if k not in query]
+        if missing:
+            self._send_json(400, {"error": f"Missing parameters {missing}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._send_json(411, {"error": "Content-Length required"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"Body over {MAX_BODY_BYTES} bytes"})
+            return
+        data = self.rfile.read(length)
+        try:
+            result = self.server.service.validate(
+                data,
+                query["observatory"],
+                query["strategy"],
+                query["sheet"],
+                mandatory=query.get("mandatory", "").lower() in ("1", "true", "yes"),
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(200, result)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ValidationServer(ThreadingHTTPServer):
+    """Serves a ValidationService, on localhost and a free port by default.
+
+    with ValidationServer() as server:
+        urlopen(f"{server.base_url}/health")
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        service: ValidationService | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        verbose: bool = False,
+    ) -> None:
+        self.service = service if service is not None else ValidationService()
+        self.verbose = verbose
+        super().__init__((host, port), _ServiceHandler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> ValidationServer:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,368 @@
+"""Synthetic logsheets for scale testing.
+
+The network is small (about 20 observatories of a few hundred rows), so
+here a network of any size is generated from the validated logsheets:
+each synthetic observatory takes the sampling, measured and observatory
+sheets of a real one as templates and resamples their rows, with its own
+source_mat_ids, collection_dates every quarter and jittered measured
+values. The governance logsheets and observatories tables are generated
+to match, from the rows of the real observatories, with sheet links on
+the reserved example.org domain.
+
+The rows conform to `sampling.Model` and `measured.Model` (and with
+mandatory=True to the models of `mandatory.py`), except for the
+violations injected at the given rates, which are listed in
+`SyntheticNetwork.violations`:
+
+- bad_date: collection_date as dd.mm.YYYY
+- bad_number: a float measured value with a decimal comma
+- missing_field: no replicate
+- unfilled_id: a source_mat_id cut after the observatory (the row is
+  filtered out)
+- duplicate_id: the source_mat_id of the row before
+- orphan_measured: a measured source_mat_id without a sampling row
+
+    python -m validation_classes synthetic out --observatories 200
+
+See `benchmarks.bench_scaling` for the scaling curves.
+"""
+
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+
+from .completeness import field_kind
+from .mandatory import SoftSedimentDataModel, WaterColumnDataModel
+from .measured import Model as measuredModel
+from .pipeline import SAMPLING_STRATEGIES, VALIDATED_DATA_DIR, SheetJob
+
+VIOLATIONS = {
+    "bad_date": "sampling",
+    "bad_number": "measured",
+    "missing_field": "sampling",
+    "unfilled_id": "sampling",
+    "duplicate_id": "sampling",
+    "orphan_measured": "measured",
+}
+# The measured fields that only take numbers
+FLOAT_VARIABLES = tuple(
+    name
+    for name, info in measuredModel.model_fields.items()
+    if field_kind(info.annotation) == "float"
+)
+STRATEGY_CODES = {"water_column": "Wa", "soft_sediment": "So"}
+MANDATORY_MODELS = {
+    "water_column": WaterColumnDataModel,
+    "soft_sediment": SoftSedimentDataModel,
+}
+START_DATE = "2021-06-01"
+CAMPAIGN_DAYS = 91
+# A mandatory str field with no value in the template
+NOT_COLLECTED = "missing: not collected"
+# The sheet links of the synthetic governance table, never fetched
+SHEET_LINK = (
+    "https://sheets.example.org/spreadsheets/d/{observatory_id}_{strategy}/edit"
+)
+
+
+class SyntheticNetwork(NamedTuple):
+    sampling: dict[SheetJob, pd.DataFrame]
+    measured: dict[SheetJob, pd.DataFrame]
+    observatory: dict[SheetJob, pd.DataFrame]
+    logsheets: pd.DataFrame  # The governance tables
+    observatories: pd.DataFrame
+    violations: pd.DataFrame  # One row per injected violation
+
+    @property
+    def rows(self) -> int:
+        return sum(len(df) for df in [*self.sampling.values(), *self.measured.values()])
+
+
+class Templates(NamedTuple):
+    """The sheets of the real observatories to resample."""
+
+    sampling: dict[SheetJob, pd.DataFrame]
+    measured: dict[SheetJob, pd.DataFrame]
+    observatory: dict[SheetJob, pd.DataFrame]
+    observatories: pd.DataFrame
+    logsheets: pd.DataFrame
+
+    @classmethod
+    def load(cls, validated_dir: str | Path = VALIDATED_DATA_DIR) -> Templates:
+        from .loaders import load_sheets
+
+        governance = Path(validated_dir) / "governance"
+        return cls(
+            load_sheets("sampling", validated_dir=validated_dir, typed=False),
+            load_sheets("measured", validated_dir=validated_dir, typed=False),
+            load_sheets("observatory", validated_dir=validated_dir, typed=False),
+            pd.read_csv(governance / "observatories_validated.csv"),
+            pd.read_csv(governance / "logsheets_validated.csv"),
+        )
+
+    def pairs(self, sampling_strategy: str) -> list[SheetJob]:
+        """The sampling jobs of the strategy with a measured sheet."""
+        measured = {(j.observatory_id, j.sampling_strategy) for j in self.measured}
+        return [
+            job
+            for job in self.sampling
+            if job.sampling_strategy == sampling_strategy
+            and (job.observatory_id, sampling_strategy) in measured
+        ]
+
+    def measured_of(self, job: SheetJob) -> pd.DataFrame:
+        return self.measured[job._replace(sheet_type="measured", model="measured")]
+
+    def observatory_of(self, job: SheetJob) -> pd.DataFrame:
+        return self.observatory[
+            job._replace(sheet_type="observatory", model="observatory")
+        ]
+
+
+def _complete_mandatory(df: pd.DataFrame, sampling_strategy: str) -> pd.DataFrame:
+    """Fills the mandatory fields that the template rows leave empty (or
+    hold as another type) so the rows pass the mandatory model.
+    """
+    df = df.copy()
+    for name, info in MANDATORY_MODELS[sampling_strategy].model_fields.items():
+        if not info.is_required():
+            continue
+        adapter = TypeAdapter(info.annotation)
+        kind = field_kind(info.annotation)
+        values = []
+        for value in df[name] if name in df else [None] * len(df):
+            if isinstance(value, float) and math.isnan(value):
+                value = None
+            try:
+                adapter.validate_python(value)
+            except ValidationError:
+                if kind == "str":
+                    value = NOT_COLLECTED if value is None else str(value)
+                elif value is None:
+                    value = 0
+                else:
+                    value = round(float(value))
+            values.append(value)
+        df[name] = values
+    return df
+
+
+def _sheet(template: pd.DataFrame, n: int, rng: np.random.Generator) -> pd.DataFrame:
+    return template.iloc[rng.integers(0, len(template), n)].reset_index(drop=True)
+
+
+def _inject(
+    df: pd.DataFrame,
+    sheet_type: str,
+    rates: dict[str, float],
+    rng: np.random.Generator,
+) -> tuple[pd.DataFrame, list[dict[str, Any]]]:
+    """Injects each violation of the sheet type into a share of the rows,
+    at most one per row.
+    """
+    injected: list[dict[str, Any]] = []
+    if sheet_type not in VIOLATIONS.values():
+        return df, injected
+    free = np.ones(len(df), dtype=bool)
+    ids = df["source_mat_id"].to_numpy(dtype=object, copy=True)  # As generated
+    for violation, rate in rates.items():
+        if VIOLATIONS[violation] != sheet_type or not rate:
+            continue
+        rows = np.flatnonzero(free & (rng.random(len(df)) < rate))
+        if violation == "duplicate_id":
+            rows = rows[rows > 0]
+        if violation == "bad_number":
+            present = [v for v in FLOAT_VARIABLES if v in df]
+            if not present:
+                continue
+            # A random column of each row that has a value
+            has_value = df[present].notna().to_numpy()[rows]
+            picks = np.argmax(rng.random(has_value.shape) * has_value, axis=1)
+            rows = rows[has_value.any(axis=1)]
+            columns = np.array(present)[picks[has_value.any(axis=1)]]
+        if not len(rows):
+            continue
+        free[rows] = False
+        if violation == "bad_date":
+            column = "collection_date"
+            dates = pd.to_datetime(df.loc[rows, column])
+            df.loc[rows, column] = dates.dt.strftime("%d.%m.%Y").to_numpy()
+        elif violation == "bad_number":
+            for column in set(columns):
+                df[column] = df[column].astype(object)
+            for row, column in zip(rows, columns, strict=True):
+                df.at[row, column] = str(df.at[row, column]).replace(".", ",")
+        elif violation == "missing_field":
+            column = "replicate"
+            df.loc[rows, column] = None
+        elif violation == "unfilled_id":
+            column = "source_mat_id"
+            df.loc[rows, column] = [i.rsplit("_", 2)[0] for i in ids[rows]]
+        elif violation == "duplicate_id":
+            column = "source_mat_id"
+            df.loc[rows, column] = ids[rows - 1]
+        elif violation == "orphan_measured":
+            column = "source_mat_id"
+            df.loc[rows, column] = [f"{i}_orphan" for i in ids[rows]]
+        for k, row in enumerate(rows):
+            injected.append(
+                {
+                    "row": int(row),
+                    "source_mat_id": ids[row],
+                    "column": str(columns[k] if violation == "bad_number" else column),
+                    "violation": violation,
+                }
+            )
+    return df, injected
+
+
+def generate_network(
+    n_observatories: int = 20,
+    events: int = 16,
+    rates: dict[str, float] | None = None,
+    mandatory: bool = False,
+    seed: int = 0,
+    templates: Templates | None = None,
+) -> SyntheticNetwork:
+    """Generates n_observatories observatories (SYN0001, ...) with a water
+    column and, for every other one, a soft sediment sheet of the given
+    number of sampling events. rates maps violations (see VIOLATIONS) to
+    the share of rows to inject them into.
+    """
+    unknown = set(rates or {}) - set(VIOLATIONS)
+    if unknown:
+        raise ValueError(f"Unknown violations {sorted(unknown)}")
+    if templates is None:
+        templates = Templates.load()
+    rng = np.random.default_rng(seed)
+    pairs = {strategy: templates.pairs(strategy) for strategy in SAMPLING_STRATEGIES}
+    width = max(4, len(str(n_observatories)))
+    start = pd.Timestamp(START_DATE)
+
+    sampling, measured, observatory = {}, {}, {}
+    logsheets, observatories, violations = [], [], []
+    for i in range(n_observatories):
+        observatory_id = f"SYN{i + 1:0{width}d}"
+        strategies = ["water_column", "soft_sediment"] if i % 2 else ["water_column"]
+        links: dict[str, Any] = dict.fromkeys(SAMPLING_STRATEGIES, math.nan)
+        for strategy in strategies:
+            template = pairs[strategy][i % len(pairs[strategy])]
+            t_sampling = templates.sampling[template]
+            per_event = max(
+                1, round(len(t_sampling) / t_sampling["collection_date"].nunique())
+            )
+            n = events * per_event
+            code = f"{observatory_id}_{STRATEGY_CODES[strategy]}"
+            ids = np.array([f"EMOBON_{code}_{k + 1}" for k in range(n)], dtype=object)
+            days = (
+                np.arange(events) * CAMPAIGN_DAYS + rng.integers(0, 30, events)
+            ).repeat(per_event)
+            dates = (start + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d")
+
+            df = _sheet(t_sampling, n, rng)
+            df["source_mat_id"] = ids
+            if "source_mat_id_orig" in df:
+                df["source_mat_id_orig"] = [i.removeprefix("EMOBON_") for i in ids]
+            if "sampling_event" in df:
+                df["sampling_event"] = [f"{code}_{d}" for d in dates]
+            df["collection_date"] = dates
+            if "samp_store_date" in df:
+                df["samp_store_date"] = dates
+            if mandatory:
+                df = _complete_mandatory(df, strategy)
+
+            mdf = _sheet(templates.measured_of(template), n, rng)
+            mdf["source_mat_id"] = ids
+            for column in FLOAT_VARIABLES:
+                if column in mdf:
+                    mdf[column] = mdf[column] * rng.lognormal(0, 0.1, n)
+
+            odf = templates.observatory_of(template).head(1).copy()
+            odf["obs_id"] = observatory_id
+
+            model = f"{strategy}_mandatory" if mandatory else "sampling"
+            link = SHEET_LINK.format(observatory_id=observatory_id, strategy=strategy)
+            links[strategy] = link
+            for sheet_type, sheet, sheets, sheet_model in (
+                ("sampling", df, sampling, model),
+                ("measured", mdf, measured, "measured"),
+                ("observatory", odf, observatory, "observatory"),
+            ):
+                sheet, injected = _inject(sheet, sheet_type, rates or {}, rng)
+                job = SheetJob(observatory_id, strategy, sheet_type, link, sheet_model)
+                sheets[job] = sheet
+                violations.extend(
+                    {
+                        "observatory_id": observatory_id,
+                        "sampling_strategy": strategy,
+                        "sheet_type": sheet_type,
+                        **record,
+                    }
+                    for record in injected
+                )
+
+        row = templates.logsheets.iloc[i % len(templates.logsheets)].to_dict()
+        logsheets.append({**row, "observatory_id": observatory_id, **links})
+        row = templates.observatories.iloc[i % len(templates.observatories)].to_dict()
+        observatories.append(
+            {
+                **row,
+                "observatory_id": observatory_id,
+                "start_date": START_DATE,
+                "end_date": None,
+                "water_column": True,
+                "soft_substrates": "soft_sediment" in strategies,
+                "hard_substrates": False,
+            }
+        )
+
+    return SyntheticNetwork(
+        sampling,
+        measured,
+        observatory,
+        pd.DataFrame(logsheets),
+        pd.DataFrame(observatories),
+        pd.DataFrame(
+            violations,
+            columns=[
+                "observatory_id",
+                "sampling_strategy",
+                "sheet_type",
+                "row",
+                "source_mat_id",
+                "column",
+                "violation",
+            ],
+        ),
+    )
+
+
+def write_network(network: SyntheticNetwork, out_dir: str | Path) -> Path:
+    """Writes the network in the layout of validated-data, so that it can
+    be read with `loaders.load_sheets(sheet_type, validated_dir=out_dir)`.
+    """
+    out_dir = Path(out_dir)
+    (out_dir / "logsheets").mkdir(parents=True, exist_ok=True)
+    (out_dir / "governance").mkdir(parents=True, exist_ok=True)
+    for sheets in (network.sampling, network.measured, network.observatory):
+        for job, df in sheets.items():
+            df.to_csv(
+                out_dir
+                / "logsheets"
+                / f"{job.observatory_id}_{job.sampling_strategy}_{job.sheet_type}_validated.csv",
+                index=False,
+            )
+    network.logsheets.to_csv(
+        out_dir / "governance" / "logsheets_validated.csv", index=False
+    )
+    network.observatories.to_csv(
+        out_dir / "governance" / "observatories_validated.csv", index=False
+    )
+    network.violations.to_csv(out_dir / "violations.csv", index=False)
+    return out_dir
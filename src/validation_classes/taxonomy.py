@@ -0,0 +1,261 @@
+"""Local NCBI taxonomy index for the tax_id / scientific_name check.
+
+The sampling sheets give tax_id as an integer, or, in the Github crate
+sheets, as an NCBI taxonomy URL such as
+https://www.ncbi.nlm.nih.gov/Taxonomy/Browser/wwwtax.cgi?id=1874687
+and scientific_name as free text. Both are checked against an index built
+once from an NCBI taxdump (names.dmp, merged.dmp, delnodes.dmp):
+
+    build_index("taxdump.tar.gz")   # into reference-data/taxonomy/
+
+The index is a few flat numpy arrays plus a names blob, memory-mapped on
+load, so only the pages that lookups touch are read from disk.
+"""
+
+from __future__ import annotations
+
+import re
+import tarfile
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from .errors import ErrorStore
+from .pipeline import PROJECT_DIR
+
+INDEX_DIR = PROJECT_DIR / "reference-data" / "taxonomy"
+
+# The names.dmp name classes a sheet's scientific_name may use
+NAME_CLASSES = ("scientific name", "synonym", "equivalent name")
+
+TAX_ID_PATTERN = re.compile(r"(?:NCBITaxon[:_])?(\d+)", re.IGNORECASE)
+TAXONOMY_PATH_PATTERN = re.compile(r"/(?:taxonomy|NCBITaxon_)/?(\d+)", re.IGNORECASE)
+
+
+def normalise_name(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+
+@lru_cache(maxsize=4096)
+def _parse_tax_id(value: str) -> int | None:
+    value = value.strip()
+    if match := TAX_ID_PATTERN.fullmatch(value):
+        return int(match.group(1))
+    if not value.startswith(("http://", "https://")):
+        return None
+    url = urlparse(value)
+    ids = parse_qs(url.query).get("id")
+    if ids and ids[0].isdigit():
+        return int(ids[0])
+    if match := TAXONOMY_PATH_PATTERN.search(url.path):
+        return int(match.group(1))
+    return None
+
+
+def normalise_tax_id(value: object) -> int | None:
+    """The integer tax_id of an int, a float read from a CSV, a string
+    or an NCBI taxonomy URL, None if empty or not recognised.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return int(value) if np.isfinite(value) and value.is_integer() else None
+    return _parse_tax_id(str(value))
+
+
+def _split(lines: Iterable[bytes]) -> Iterator[list[str]]:
+    for line in lines:
+        yield line.decode("utf-8").rstrip("\t|\n").split("\t|\t")
+
+
+def _dmp_rows(taxdump: Path, name: str) -> Iterator[list[str]]:
+    """The rows of one .dmp file of a taxdump directory or archive."""
+    if taxdump.is_dir():
+        with open(taxdump / name, "rb") as f:
+            yield from _split(f)
+        return
+    with tarfile.open(taxdump) as archive:
+        member = archive.extractfile(name)
+        if member is None:
+            raise FileNotFoundError(f"{name} not in {taxdump}")
+        yield from _split(member)
+
+
+def build_index(
+    taxdump: str | Path,
+    index_dir: str | Path = INDEX_DIR,
+    name_classes: tuple[str, ...] = NAME_CLASSES,
+) -> TaxonomyIndex:
+    """Builds the index from a taxdump directory or taxdump.tar.gz."""
+    taxdump, index_dir = Path(taxdump), Path(index_dir)
+    tax_ids, scientific, names = [], [], []
+    for row in _dmp_rows(taxdump, "names.dmp"):
+        if row[3] in name_classes:
+            tax_ids.append(int(row[0]))
+            scientific.append(row[3] == "scientific name")
+            names.append(row[1].encode("utf-8"))
+    merged = [(int(r[0]), int(r[1])) for r in _dmp_rows(taxdump, "merged.dmp")]
+    deleted = [int(r[0]) for r in _dmp_rows(taxdump, "delnodes.dmp")]
+
+    # Sorted on tax_id, with the scientific name first
+    order = np.lexsort((~np.array(scientific, dtype=bool), np.array(tax_ids)))
+    lengths = np.array([len(names[i]) for i in order], dtype=np.int64)
+    offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    np.save(index_dir / "tax_ids.npy", np.array(tax_ids, dtype=np.int64)[order])
+    np.save(index_dir / "scientific.npy", np.array(scientific, dtype=bool)[order])
+    np.save(index_dir / "offsets.npy", offsets)
+    with open(index_dir / "names.bin", "wb") as f:
+        for i in order:
+            f.write(names[i])
+    merged_array = np.array(sorted(merged), dtype=np.int64).reshape(-1, 2)
+    np.save(index_dir / "merged.npy", merged_array)
+    np.save(index_dir / "deleted.npy", np.array(sorted(deleted), dtype=np.int64))
+    return TaxonomyIndex.load(index_dir)
+
+
+class TaxonomyIndex:
+    """Names of each tax_id, plus the merged and deleted tax_ids."""
+
+    def __init__(
+        self,
+        tax_ids: np.ndarray,
+        scientific: np.ndarray,
+        offsets: np.ndarray,
+        names: np.ndarray,
+        merged: np.ndarray,
+        deleted: np.ndarray,
+    ) -> None:
+        self.tax_ids = tax_ids
+        self.scientific = scientific
+        self.offsets = offsets
+        self._names = names
+        self.merged = merged
+        self.deleted = deleted
+        self.names = lru_cache(maxsize=4096)(self._lookup_names)
+
+    @classmethod
+    def load(cls, index_dir: str | Path = INDEX_DIR) -> TaxonomyIndex:
+        index_dir = Path(index_dir)
+        names_path = index_dir / "names.bin"
+        if names_path.stat().st_size:
+            names = np.memmap(names_path, dtype=np.uint8, mode="r")
+        else:  # np.memmap refuses empty files
+            names = np.zeros(0, dtype=np.uint8)
+        return cls(
+            *(
+                np.load(index_dir / f"{name}.npy", mmap_mode="r")
+                for name in ("tax_ids", "scientific", "offsets")
+            ),
+            names,
+            np.load(index_dir / "merged.npy"),
+            np.load(index_dir / "deleted.npy"),
+        )
+
+    def __len__(self) -> int:
+        return len(self.tax_ids)
+
+    def resolve(self, tax_id: int) -> int:
+        """The current tax_id of a merged one, else tax_id itself."""
+        old = self.merged[:, 0]
+        i = np.searchsorted(old, tax_id)
+        if i < len(old) and old[i] == tax_id:
+            return int(self.merged[i, 1])
+        return tax_id
+
+    def is_deleted(self, tax_id: int) -> bool:
+        i = np.searchsorted(self.deleted, tax_id)
+        return bool(i < len(self.deleted) and self.deleted[i] == tax_id)
+
+    def _lookup_names(self, tax_id: int) -> tuple[str, ...]:
+        """All names of tax_id, the scientific name first; () if unknown."""
+        start, stop = np.searchsorted(self.tax_ids, [tax_id, tax_id + 1])
+        return tuple(
+            bytes(self._names[self.offsets[i] : self.offsets[i + 1]]).decode("utf-8")
+            for i in range(start, stop)
+        )
+
+    def scientific_name(self, tax_id: int) -> str | None:
+        names = self.names(tax_id)
+        start = np.searchsorted(self.tax_ids, tax_id)
+        return names[0] if names and self.scientific[start] else None
+
+
+def check_taxonomy(
+    index: TaxonomyIndex,
+    df: pd.DataFrame,
+    errors: ErrorStore,
+    *,
+    observatory_id: str | None,
+    sampling_strategy: str | None,
+    sheet_type: str | None,
+) -> int:
+    """Checks that each row's tax_id is a current NCBI tax_id and that its
+    scientific_name is one of the names of that taxon. Each distinct
+    (tax_id, scientific_name) pair is checked once.
+
+    Returns the number of errors added.
+    """
+    if "tax_id" not in df or "scientific_name" not in df:
+        return 0
+    df = df.reset_index()
+    keys = [
+        (
+            normalise_tax_id(tax_id),
+            normalise_name(name) if isinstance(name, str) else None,
+        )
+        for tax_id, name in zip(df["tax_id"], df["scientific_name"], strict=True)
+    ]
+    checked = {key: _check_pair(index, *key) for key in set(keys)}
+
+    n_errors = len(errors)
+    ids = df["source_mat_id"] if "source_mat_id" in df else [None] * len(df)
+    for i, key in enumerate(keys):
+        for loc, type_, msg in checked[key]:
+            errors.add(
+                observatory_id=observatory_id,
+                sampling_strategy=sampling_strategy,
+                sheet_type=sheet_type,
+                model="taxonomy",
+                source_mat_id=ids[i],
+                loc=loc,
+                type=type_,
+                msg=msg,
+                input=df[loc].iloc[i],
+            )
+    return len(errors) - n_errors
+
+
+def _check_pair(
+    index: TaxonomyIndex, tax_id: int | None, name: str | None
+) -> list[tuple[str, str, str]]:
+    if tax_id is None:
+        return []
+    if index.is_deleted(tax_id):
+        return [("tax_id", "tax_id_deleted", "tax_id has been deleted from NCBI")]
+    problems = []
+    current = index.resolve(tax_id)
+    if current != tax_id:
+        problems.append(
+            ("tax_id", "tax_id_merged", f"tax_id has been merged into {current}")
+        )
+    names = index.names(current)
+    if not names:
+        return [("tax_id", "tax_id_unknown", "tax_id is not in the NCBI taxonomy")]
+    if name is not None and name not in {normalise_name(n) for n in names}:
+        problems.append(
+            (
+                "scientific_name",
+                "scientific_name_mismatch",
+                f"tax_id {current} is '{index.scientific_name(current) or names[0]}'",
+            )
+        )
+    return problems
@@ -0,0 +1,245 @@
+"""All HTTP fetches of the pipeline, with record and replay for offline runs.
+
+Everything the pipeline downloads (governance CSVs, Google Sheets, crate
+sheets on Github and the run-information files) goes through `fetch()`.
+By default that is a plain urllib GET, but the transport can be swapped:
+
+- `RecordingTransport` fetches for real and saves each response to a
+  fixture directory.
+- `FixtureTransport` replays those responses in-process.
+- `ReplayServer` serves them from a local HTTP server, with
+  `ServerTransport` rewriting the URLs to it, so the whole HTTP stack is
+  exercised.
+
+Both replays can add a fixed latency per request to mimic the network.
+
+    with use_transport(FixtureTransport("fixtures/")):
+        summary = run_jobs(jobs, max_workers=1)
+
+Worker processes inherit the transport only when they are forked (the
+default on Linux).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import threading
+import time
+import urllib.request
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.error import HTTPError
+
+INDEX_FILE = "index.json"
+
+
+class Transport:
+    """Plain urllib GET."""
+
+    timeout: float = 60.0
+
+    def fetch(self, url: str) -> bytes:
+        if not url.startswith(("http://", "https://")):
+            raise ValueError(f"Refusing to fetch non-HTTP URL {url}")
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:  # noqa: S310
+            return response.read()
+
+
+def fixture_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:20]
+
+
+class FixtureIndex:
+    """The fixture directory: one body file per URL plus an index.json of
+    {url: {"key":..., "status":...}}.
+    """
+
+    def __init__(self, fixture_dir: str | Path) -> None:
+        self.fixture_dir = Path(fixture_dir)
+        index_path = self.fixture_dir / INDEX_FILE
+        if index_path.exists():
+            self.entries: dict[str, dict[str, Any]] = json.loads(
+                index_path.read_text(encoding="utf-8")
+            )
+        else:
+            self.entries = {}
+        self.by_key = {entry["key"]: url for url, entry in self.entries.items()}
+        self._lock = threading.Lock()
+
+    def body_path(self, key: str) -> Path:
+        return self.fixture_dir / f"{key}.body"
+
+    def save(self, url: str, status: int, body: bytes) -> None:
+        key = fixture_key(url)
+        with self._lock:
+            self.fixture_dir.mkdir(parents=True, exist_ok=True)
+            self.body_path(key).write_bytes(body)
+            self.entries[url] = {"key": key, "status": status}
+            self.by_key[key] = url
+            (self.fixture_dir / INDEX_FILE).write_text(
+                json.dumps(self.entries, indent=1, sort_keys=True), encoding="utf-8"
+            )
+
+    def load(self, url: str) -> tuple[int, bytes]:
+        try:
+            entry = self.entries[url]
+        except KeyError as e:
+            raise KeyError(f"No fixture recorded for {url}") from e
+        return entry["status"], self.body_path(entry["key"]).read_bytes()
+
+
+def _raise_for_status(url: str, status: int) -> None:
+    if status >= 400:
+        raise HTTPError(url, status, "Recorded error response", None, None)
+
+
+class RecordingTransport(Transport):
+    """Fetches with the wrapped transport and records every response,
+    including HTTP errors (e.g. observatories with no crate sheet yet).
+    """
+
+    def __init__(
+        self, fixture_dir: str | Path, transport: Transport | None = None
+    ) -> None:
+        self.index = FixtureIndex(fixture_dir)
+        self.transport = transport or Transport()
+
+    def fetch(self, url: str) -> bytes:
+        try:
+            body = self.transport.fetch(url)
+        except HTTPError as e:
+            self.index.save(url, e.code, b"")
+            raise
+        self.index.save(url, 200, body)
+        return body
+
+
+class FixtureTransport(Transport):
+    """Replays recorded responses without any sockets."""
+
+    def __init__(self, fixture_dir: str | Path, latency: float = 0.0) -> None:
+        self.index = FixtureIndex(fixture_dir)
+        self.latency = latency
+
+    def fetch(self, url: str) -> bytes:
+        if self.latency:
+            time.sleep(self.latency)
+        status, body = self.index.load(url)
+        _raise_for_status(url, status)
+        return body
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    server: ReplayServer
+
+    def do_GET(self) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        key = self.path.lstrip("/")
+        url = self.server.index.by_key.get(key)
+        if url is None:
+            self.send_error(404, "No fixture recorded")
+            return
+        status, body = self.server.index.load(url)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # Keep the benchmark output clean
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Serves a fixture directory on localhost, at /<fixture key>.
+
+    with ReplayServer("fixtures/", latency=0.05) as server:
+        with use_transport(ServerTransport(server)):
+            ...
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, fixture_dir: str | Path, latency: float = 0.0, port: int = 0
+    ) -> None:
+        self.index = FixtureIndex(fixture_dir)
+        self.latency = latency
+        super().__init__(("127.0.0.1", port), _ReplayHandler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, url: str) -> str:
+        return f"{self.base_url}/{fixture_key(url)}"
+
+    def __enter__(self) -> ReplayServer:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class ServerTransport(Transport):
+    """Fetches from a ReplayServer instead of the real URL."""
+
+    def __init__(self, server: ReplayServer) -> None:
+        self.server = server
+
+    def fetch(self, url: str) -> bytes:
+        return super().fetch(self.server.url_for(url))
+
+
+_transport: Transport = Transport()
+
+
+def get_transport() -> Transport:
+    return _transport
+
+
+def set_transport(transport: Transport) -> Transport:
+    """Sets the transport, returning the previous one."""
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
+
+@contextmanager
+def use_transport(transport: Transport) -> Iterator[Transport]:
+    previous = set_transport(transport)
+    try:
+        yield transport
+    finally:
+        set_transport(previous)
+
+
+_bytes_fetched = 0
+
+
+def fetch(url: str) -> bytes:
+    global _bytes_fetched
+    body = _transport.fetch(url)
+    _bytes_fetched += len(body)
+    return body
+
+
+def bytes_fetched() -> int:
+    """The bytes fetched so far by this process."""
+    return _bytes_fetched
+
+
+def read_csv_url(url: str, **kwargs: Any):
+    """pandas.read_csv of a URL, through the current transport."""
+    import pandas as pd
+
+    return pd.read_csv(io.BytesIO(fetch(url)), **kwargs)
@@ -0,0 +1,199 @@
+"""Network-wide uniqueness of source_mat_id and the ENA accession numbers.
+
+The validation of a sheet only sees that sheet, so a source_mat_id or ENA
+sample accession reused by another observatory goes unnoticed. The key
+index keeps the keys of every validated sheet in one JSON file; a
+revalidated sheet replaces its own entries (or is skipped if its keys have
+not changed) and the collisions are recomputed over the whole network.
+
+Its duplicated source_mat_ids are left out of the combine, see
+`combine.known_duplicates`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import pandas as pd
+
+from .errors import ErrorStore
+from .pipeline import VALIDATED_DATA_DIR, SheetJob
+
+INDEX_PATH = VALIDATED_DATA_DIR / "key_index.json"
+INDEX_VERSION = 1
+
+# The keys of each sheet type
+KEY_FIELDS = {
+    "sampling": ("source_mat_id", "ENA_accession_number_sample"),
+    "observatory": ("ENA_accession_number_project",),
+}
+# Keys that every row of one observatory shares, which must only not be
+# used by another observatory. The others must be unique per row.
+OBSERVATORY_KEYS = ("ENA_accession_number_project",)
+
+# ENA/INSDC accessions, or the BioSample/BioProject ones
+ACCESSION_PATTERNS = {
+    "ENA_accession_number_sample": re.compile(r"(?:[EDS]RS\d{6,}|SAM(?:EA|N|D)\d+)"),
+    "ENA_accession_number_project": re.compile(r"(?:[EDS]RP\d{6,}|PRJ(?:EB|NA|DB)\d+)"),
+}
+
+
+class KeyEntry(NamedTuple):
+    sheet: str
+    observatory_id: str
+    sampling_strategy: str
+    source_mat_id: str | None
+
+
+def _keys(df: pd.DataFrame, fields: tuple[str, ...]) -> dict[str, list[list[Any]]]:
+    """{field: [[value, source_mat_id], ...]} of the non-empty values."""
+    df = df.reset_index()
+    ids = (
+        df["source_mat_id"]
+        if "source_mat_id" in df
+        else pd.Series(None, index=df.index, dtype=object)
+    )
+    keys = {}
+    for field in fields:
+        if field not in df:
+            continue
+        values = df[field].map(lambda v: v.strip() if isinstance(v, str) else "")
+        filled = values != ""
+        keys[field] = [
+            [value, smid if isinstance(smid, str) else None]
+            for value, smid in zip(values[filled], ids[filled], strict=True)
+        ]
+    return keys
+
+
+def _digest(keys: dict[str, list[list[Any]]]) -> str:
+    return hashlib.sha256(json.dumps(keys, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class KeyIndex:
+    """The keys of every validated sheet, by sheet name."""
+
+    def __init__(self, sheets: dict[str, dict[str, Any]] | None = None) -> None:
+        self.sheets = sheets if sheets is not None else {}
+
+    def __len__(self) -> int:
+        return len(self.sheets)
+
+    @classmethod
+    def load(cls, path: str | Path = INDEX_PATH) -> KeyIndex:
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported key index version {data.get('version')}")
+        return cls(data["sheets"])
+
+    def save(self, path: str | Path = INDEX_PATH) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps({"version": INDEX_VERSION, "sheets": self.sheets}, indent=1),
+            encoding="utf-8",
+        )
+
+    def update(self, job: SheetJob, df: pd.DataFrame) -> bool:
+        """Replaces the keys of job's sheet. Returns False if they have not
+        changed since the last update.
+        """
+        keys = _keys(df, KEY_FIELDS.get(job.sheet_type, ()))
+        digest = _digest(keys)
+        previous = self.sheets.get(job.name)
+        if previous is not None and previous["digest"] == digest:
+            return False
+        self.sheets[job.name] = {
+            "observatory_id": job.observatory_id,
+            "sampling_strategy": job.sampling_strategy,
+            "sheet_type": job.sheet_type,
+            "digest": digest,
+            "keys": keys,
+        }
+        return True
+
+    def remove(self, name: str) -> None:
+        self.sheets.pop(name, None)
+
+    def entries(self) -> dict[tuple[str, str], list[KeyEntry]]:
+        """{(field, value): [where it is used, ...]} over all sheets."""
+        entries = defaultdict(list)
+        for name, sheet in sorted(self.sheets.items()):
+            for field, pairs in sheet["keys"].items():
+                for value, source_mat_id in pairs:
+                    entries[(field, value)].append(
+                        KeyEntry(
+                            name,
+                            sheet["observatory_id"],
+                            sheet["sampling_strategy"],
+                            source_mat_id,
+                        )
+                    )
+        return entries
+
+    def collisions(self) -> dict[tuple[str, str], list[KeyEntry]]:
+        collisions = {}
+        for (field, value), entries in self.entries().items():
+            if field in OBSERVATORY_KEYS:
+                used = len({entry.observatory_id for entry in entries}) > 1
+            else:
+                used = len(entries) > 1
+            if used:
+                collisions[(field, value)] = entries
+        return collisions
+
+    def duplicated(self, field: str = "source_mat_id") -> tuple[str, ...]:
+        """The values of field used more than once."""
+        return tuple(sorted(v for f, v in self.collisions() if f == field))
+
+    def check(self, errors: ErrorStore) -> int:
+        """Adds an error for every use of a colliding key. Returns the
+        number of errors added.
+        """
+        n_errors = len(errors)
+        for (field, value), entries in self.collisions().items():
+            for entry in entries:
+                others = sorted({e.sheet for e in entries if e != entry})
+                errors.add(
+                    observatory_id=entry.observatory_id,
+                    sampling_strategy=entry.sampling_strategy,
+                    sheet_type=self.sheets[entry.sheet]["sheet_type"],
+                    model="uniqueness",
+                    source_mat_id=entry.source_mat_id,
+                    loc=field,
+                    type="duplicate_key",
+                    msg=f"Also used in {', '.join(others) or entry.sheet}",
+                    input=value,
+                )
+        return len(errors) - n_errors
+
+
+def check_accession_formats(df: pd.DataFrame, errors: ErrorStore, job: SheetJob) -> int:
+    """Checks the ENA accession numbers of a sheet against the INSDC
+    formats. Returns the number of errors added.
+    """
+    n_errors = len(errors)
+    for field, pairs in _keys(df, tuple(ACCESSION_PATTERNS)).items():
+        pattern = ACCESSION_PATTERNS[field]
+        for value, source_mat_id in pairs:
+            if pattern.fullmatch(value) is None:
+                errors.add(
+                    observatory_id=job.observatory_id,
+                    sampling_strategy=job.sampling_strategy,
+                    sheet_type=job.sheet_type,
+                    model="uniqueness",
+                    source_mat_id=source_mat_id,
+                    loc=field,
+                    type="accession_format",
+                    msg=f"Not an ENA accession ({pattern.pattern})",
+                    input=value,
+                )
+    return len(errors) - n_errors
@@ -0,0 +1,49 @@
+"""Replay fixtures built from the validated logsheets in validated-data.
+
+Every sheet of the governance logsheets table is served by a
+`FixtureTransport` with its validated CSV as the body (or a 404 if there
+is none), so the whole pipeline runs without the network.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from validation_classes.pipeline import (
+    VALIDATED_DATA_DIR,
+    SheetJob,
+    build_jobs,
+    get_sheet_addresses,
+    sheet_url,
+)
+from validation_classes.transport import FixtureIndex, FixtureTransport, use_transport
+
+LOGSHEETS_DIR = VALIDATED_DATA_DIR / "logsheets"
+
+
+@pytest.fixture(scope="session")
+def jobs() -> list[SheetJob]:
+    return build_jobs(get_sheet_addresses())
+
+
+@pytest.fixture(scope="session")
+def replay_dir(tmp_path_factory: pytest.TempPathFactory, jobs: list[SheetJob]) -> Path:
+    fixture_dir = tmp_path_factory.mktemp("http")
+    index = FixtureIndex(fixture_dir)
+    for job in jobs:
+        url = sheet_url(job.sheet_link, job.sheet_type)
+        path = LOGSHEETS_DIR / f"{job.name}_validated.csv"
+        if path.exists():
+            index.save(url, 200, path.read_bytes())
+        else:
+            index.save(url, 404, b"")
+    return fixture_dir
+
+
+@pytest.fixture()
+def replay(replay_dir: Path) -> Iterator[FixtureTransport]:
+    with use_transport(FixtureTransport(replay_dir)) as transport:
+        yield transport
@@ -0,0 +1,50 @@
+"""The columnar path falls back to model_dump() for serializers it can't
+run column by column.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pandas as pd
+import pytest
+from pydantic import BaseModel, field_serializer, model_serializer
+
+from validation_classes.columnar import validate_columns
+from validation_classes.errors import ErrorStore
+from validation_classes.pipeline import SheetJob, validate_records
+
+
+class WrapModel(BaseModel):
+    source_mat_id: str
+    depth: float
+
+    @field_serializer("depth", mode="wrap")
+    def serialize_depth(self, value: float, handler: Any) -> str:
+        return f"{handler(value)} m"
+
+
+class ModelSerializerModel(BaseModel):
+    source_mat_id: str
+    depth: float
+
+    @model_serializer
+    def serialize(self) -> dict[str, Any]:
+        return {"source_mat_id": self.source_mat_id, "depth_m": self.depth}
+
+
+@pytest.mark.parametrize("validator", [WrapModel, ModelSerializerModel])
+def test_falls_back_to_model_dump(validator: type[BaseModel]) -> None:
+    job = SheetJob("VB", "water_column", "sampling", "", "sampling")
+    df = pd.DataFrame({"source_mat_id": ["a", "b", "c"], "depth": [1.5, "x", 3]})
+
+    errors = ErrorStore()
+    builder = validate_columns(validator, df, errors, job)
+    expected = validate_records(
+        validator, df.to_dict(orient="records"), ErrorStore(), job
+    )
+
+    assert len(errors) == 1
+    assert builder.to_frame("source_mat_id").equals(
+        pd.DataFrame.from_records(expected, index="source_mat_id")
+    )
@@ -0,0 +1,63 @@
+"""validate --combine combines the sheets it wrote and reports it in the
+run metrics.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from validation_classes.__main__ import main
+from validation_classes.metrics import METRICS_JSON, METRICS_PROM
+from validation_classes.pipeline import RUN_INFORMATION_URLS, VALIDATED_DATA_DIR
+from validation_classes.transport import FixtureIndex
+
+
+def test_validate_combine(tmp_path: Path, replay_dir: Path) -> None:
+    fixture_dir = tmp_path / "http"
+    shutil.copytree(replay_dir, fixture_dir)
+    combined = pd.read_csv(
+        VALIDATED_DATA_DIR
+        / "combined_logsheets"
+        / "AAOT_water_column_combined_validated.csv"
+    )
+    run_information = combined[["source_mat_id", "ref_code"]]
+    index = FixtureIndex(fixture_dir)
+    index.save(
+        RUN_INFORMATION_URLS[0], 200, run_information.to_csv(index=False).encode()
+    )
+    index.save(RUN_INFORMATION_URLS[1], 200, b"source_mat_id,ref_code\n")
+
+    main(
+        [
+            "validate",
+            "--observatory",
+            "AAOT",
+            "--sheet-type",
+            "sampling",
+            "measured",
+            "--workers",
+            "1",
+            "--replay",
+            str(fixture_dir),
+            "--out",
+            str(tmp_path / "logsheets"),
+            "--combine",
+            str(tmp_path / "combined"),
+        ]
+    )
+
+    out = pd.read_csv(
+        tmp_path / "combined" / "AAOT_water_column_combined_validated.csv"
+    )
+    assert sorted(out["ref_code"]) == sorted(combined["ref_code"])
+    metrics = json.loads((tmp_path / "logsheets" / METRICS_JSON).read_text())
+    [sheet] = [s for s in metrics["sheets"] if s["sheet"] == "combined"]
+    assert sheet["observatory"] == "AAOT"
+    assert sheet["counters"]["combined_events"] == len(combined)
+    assert "combine" in sheet["seconds"]
+    prom = (tmp_path / "logsheets" / METRICS_PROM).read_text()
+    assert 'emobon_validation_combined_events{observatory="AAOT"' in prom
@@ -0,0 +1,81 @@
+"""ena.export_samples skips submitted samples, reports incomplete ones and
+splits the rest into batches.
+"""
+
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+
+from validation_classes.ena import export_samples
+from validation_classes.errors import ErrorStore
+
+COMBINED = [
+    "source_mat_id,tax_id,scientific_name,collection_date,env_material,depth,obs_id,"
+    "ENA_accession_number_sample",
+    "EMOBON_AAOT_Wa_1,408172,marine metagenome,2022-01-10,water,1.0,AAOT,SAMEA1",
+    "EMOBON_AAOT_Wa_2,408172,marine metagenome,2022-01-10,,1.0,AAOT,",
+    "EMOBON_AAOT_Wa_3,408172.0,marine metagenome,2022-04-11,water,1.0,AAOT,",
+    "EMOBON_AAOT_Wa_4,408172,marine metagenome,2022-07-12,water,1.0,AAOT,",
+    "EMOBON_AAOT_Wa_5,408172,marine metagenome,2022-10-13,water,1.0,AAOT,",
+]
+OBSERVATORY = [
+    "obs_id,latitude,longitude,geo_loc_name,env_broad_biome,env_local",
+    "AAOT,45.3142,12.5083,Italy,marine biome,coastal sea",
+]
+
+
+def tsv_aliases(path: Path) -> list[str]:
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f, delimiter="\t"))
+    return [row[0] for row in rows[4:]]  # After the checklist, prefix and units
+
+
+def test_export_samples(tmp_path: Path) -> None:
+    combined = tmp_path / "AAOT_water_column_combined_validated.csv"
+    combined.write_text("\n".join(COMBINED) + "\n", encoding="utf-8")
+    logsheets = tmp_path / "logsheets"
+    logsheets.mkdir()
+    (logsheets / "AAOT_water_column_observatory_validated.csv").write_text(
+        "\n".join(OBSERVATORY) + "\n", encoding="utf-8"
+    )
+    errors = ErrorStore()
+
+    written, counters = export_samples(
+        [combined],
+        tmp_path / "ena",
+        ("tsv", "xml"),
+        batch_size=2,
+        logsheets_dir=logsheets,
+        errors=errors,
+    )
+
+    assert counters == {
+        "samples": 5,
+        "already_submitted": 1,
+        "unknown_strategy": 0,
+        "incomplete": 1,
+        "exported": 3,
+    }
+    [error] = list(errors)
+    assert error["model"] == "ena"
+    assert error["source_mat_id"] == "EMOBON_AAOT_Wa_2"
+    assert error["loc"] == ("environmental medium",)
+
+    names = sorted(path.name for path in written)
+    assert names == [
+        "ERC000024_samples_0001.tsv",
+        "ERC000024_samples_0001.xml",
+        "ERC000024_samples_0002.tsv",
+        "ERC000024_samples_0002.xml",
+    ]
+    out = tmp_path / "ena"
+    assert tsv_aliases(out / "ERC000024_samples_0001.tsv") == [
+        "EMOBON_AAOT_Wa_3",
+        "EMOBON_AAOT_Wa_4",
+    ]
+    assert tsv_aliases(out / "ERC000024_samples_0002.tsv") == ["EMOBON_AAOT_Wa_5"]
+    xml = (out / "ERC000024_samples_0001.xml").read_text(encoding="utf-8")
+    assert xml.count("<SAMPLE alias=") == 2
+    assert "<TAXON_ID>408172</TAXON_ID>" in xml
+    assert xml.rstrip().endswith("</SAMPLE_SET>")
@@ -0,0 +1,22 @@
+"""The identifier checks."""
+
+from __future__ import annotations
+
+import pytest
+
+from validation_classes.identifiers import is_email
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["a.b@c.de", "josegonzález@uvigo.es", "jose@uvigö.es", "müller@université.fr"],
+)
+def test_valid_emails(value: str) -> None:
+    assert is_email(value)
+
+
+@pytest.mark.parametrize(
+    "value", ["josé gonzález@uvigo.es", "josé g@uvigo.es", "josé@", "@uvigo.es"]
+)
+def test_invalid_emails(value: str) -> None:
+    assert not is_email(value)
@@ -0,0 +1,64 @@
+"""The QC threshold window gives the same output as a full validation."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from validation_classes.benchmarks import load_logsheets
+from validation_classes.incremental import (
+    QCWindow,
+    qc_thresholds,
+    validate_sheet_window,
+)
+from validation_classes.parallel import run_jobs, write_summary
+from validation_classes.pipeline import SheetJob, validate_sheet, write_result
+
+
+def _files(directory: Path) -> dict[str, bytes]:
+    return {path.name: path.read_bytes() for path in sorted(directory.iterdir())}
+
+
+@pytest.mark.usefixtures("replay")
+def test_window_matches_full_run(jobs: list[SheetJob], tmp_path: Path) -> None:
+    full = run_jobs(jobs, max_workers=1)
+    write_summary(full, tmp_path / "full")
+
+    window = QCWindow(qc_thresholds(), tmp_path / "full")
+    incremental = run_jobs(jobs, max_workers=1, window=window)
+    write_summary(incremental, tmp_path / "window")
+
+    assert incremental.counters["rows_frozen"] > 0
+    assert _files(tmp_path / "window") == _files(tmp_path / "full")
+
+
+@pytest.mark.parametrize("sheet_type", ["sampling", "measured"])
+@pytest.mark.parametrize("threshold", ["2021-12-31", "2023-06-30"])
+def test_window_follows_the_sheet(
+    tmp_path: Path, sheet_type: str, threshold: str
+) -> None:
+    sheets = {**load_logsheets("sampling"), **load_logsheets(sheet_type)}
+    for job, df in sheets.items():
+        write_result(validate_sheet(job, df), tmp_path)
+
+    n_frozen = 0
+    for job, df in sheets.items():
+        if job.sheet_type != sheet_type:
+            continue
+        # A deleted row and a corrected source_mat_id must not come back
+        # from the snapshot
+        edited = df.drop(df.index[:1]).reset_index(drop=True)
+        if len(edited):
+            edited.loc[0, "source_mat_id"] = edited.loc[0, "source_mat_id"] + "_x"
+        for sheet in (df, edited):
+            result = validate_sheet_window(
+                job, sheet, pd.Timestamp(threshold), tmp_path
+            )
+            n_frozen += result.counters.get("rows_frozen", 0)
+            assert (
+                result.validated.to_csv()
+                == validate_sheet(job, sheet).validated.to_csv()
+            ), job.name
+    assert n_frozen > 0
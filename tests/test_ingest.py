@@ -0,0 +1,69 @@
+"""ingest reads CSVs as pd.read_csv does and validates the governance table
+as the notebook does.
+"""
+
+from __future__ import annotations
+
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from validation_classes.ingest import read_csv_records, validate_csv
+from validation_classes.pipeline import VALIDATED_DATA_DIR
+
+
+def test_floats_match_read_csv() -> None:
+    rng = np.random.default_rng(0)
+    values = [f"{x:.{rng.integers(23)}f}" for x in rng.uniform(-1e3, 1e3, 5000)]
+    values += [
+        f"{x * 10.0 ** rng.integers(-30, 31):.{rng.integers(1, 21)}e}"
+        for x in rng.uniform(-1, 1, 5000)
+    ]
+    values += ["5e-324", "1e-700", "123456789012345678901234567890", ".5", "5.", "inf"]
+    data = "x\n" + "\n".join(values)
+    expected = pd.read_csv(io.StringIO(data))["x"].tolist()
+    assert [record["x"] for record in read_csv_records(data)] == expected
+    # Out of range, pandas keeps the column as strings
+    assert [record["x"] for record in read_csv_records("x\n1.5\n1e400")] == [
+        "1.5",
+        "1e400",
+    ]
+
+
+def raw_governance() -> pd.DataFrame:
+    """The validated governance table with the sheet's headers and dates."""
+    df = pd.read_csv(VALIDATED_DATA_DIR / "governance" / "logsheets_validated.csv")
+    df["data_quality_control_threshold_date"] = pd.to_datetime(
+        df["data_quality_control_threshold_date"]
+    ).dt.strftime("%d/%m/%Y")
+    return df.rename(
+        columns={
+            "observatory_id": "EMOBON_observatory_id",
+            "country": "EMBRC Node",
+            "institute": "EMBRC Site",
+            "water_column": "Water Column",
+            "soft_sediment": "Soft sediment",
+        }
+    )
+
+
+def test_validate_governance() -> None:
+    df = raw_governance()
+    assert df["data_quality_control_threshold_date"].iloc[0] == "31/12/2021"
+    result = validate_csv(df.to_csv(index=False), "logsheets")
+    assert list(result.errors) == []
+    assert result.counters["rows_validated"] == len(df)
+    assert result.rows[0]["data_quality_control_threshold_date"] == datetime(
+        2021, 12, 31
+    )
+
+
+def test_governance_errors_carry_observatory_id() -> None:
+    df = raw_governance()
+    df.loc[0, "rocrate_profile_uri"] = "not a url"
+    result = validate_csv(df.to_csv(index=False), "logsheets")
+    [error] = list(result.errors)
+    assert error["source_mat_id"] == df.loc[0, "EMOBON_observatory_id"]
+    assert error["loc"] == ("rocrate_profile_uri",)
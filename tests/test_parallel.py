@@ -0,0 +1,46 @@
+"""A run gives the same results and files whatever the number of workers."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from validation_classes.parallel import RunSummary, run_jobs, write_summary
+from validation_classes.pipeline import SheetJob
+
+
+def _results(summary: RunSummary) -> list[tuple]:
+    return [
+        (
+            result.job,
+            result.validated.to_csv(),
+            list(result.errors),
+            result.counters,
+            result.failure,
+        )
+        for result in summary.results
+    ]
+
+
+def _files(directory: Path) -> dict[str, bytes]:
+    return {path.name: path.read_bytes() for path in sorted(directory.iterdir())}
+
+
+@pytest.mark.usefixtures("replay")
+@pytest.mark.parametrize("columnar", [False, True])
+def test_workers_do_not_change_the_run(
+    jobs: list[SheetJob], tmp_path: Path, columnar: bool
+) -> None:
+    sequential = run_jobs(jobs, max_workers=1, columnar=columnar)
+    parallel = run_jobs(jobs, max_workers=4, chunksize=3, columnar=columnar)
+
+    assert [result.job for result in parallel.results] == jobs
+    assert _results(parallel) == _results(sequential)
+    assert list(parallel.errors) == list(sequential.errors)
+    assert parallel.counters == sequential.counters
+    assert not parallel.counters.get("jobs_failed")
+
+    write_summary(sequential, tmp_path / "sequential", full_errors=True)
+    write_summary(parallel, tmp_path / "parallel", full_errors=True)
+    assert _files(tmp_path / "parallel") == _files(tmp_path / "sequential")
@@ -0,0 +1,20 @@
+"""Repairing a sheet twice changes nothing the second time."""
+
+from __future__ import annotations
+
+from validation_classes.repair import repair_job_sheet
+from validation_classes.synthetic import generate_network
+
+
+def test_repair_is_idempotent() -> None:
+    network = generate_network(
+        n_observatories=4, rates={"bad_date": 0.2, "bad_number": 0.2}
+    )
+    n_changes = 0
+    for job, df in {**network.sampling, **network.measured}.items():
+        repaired, changes = repair_job_sheet(job, df)
+        again, no_changes = repair_job_sheet(job, repaired)
+        n_changes += len(changes)
+        assert no_changes.empty, job.name
+        assert again.equals(repaired), job.name
+    assert n_changes > 0
@@ -0,0 +1,52 @@
+"""rocrate packages the files of known observatories only."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from validation_classes.rocrate import CRATES_DIR, METADATA_FILE, write_crates
+
+
+def test_write_crates(tmp_path: Path) -> None:
+    logsheets = tmp_path / "logsheets"
+    combined = tmp_path / "combined_logsheets"
+    logsheets.mkdir()
+    combined.mkdir()
+    for name in (
+        "AAOT_water_column_sampling_validated.csv",
+        "AAOT_water_column_sampling_validated.errors.csv",
+        "STHVN_water_column_sampling_validated.csv",  # Not in governance
+        "validation_errors.json",
+        "validation_errors.csv",
+        "run_metrics.json",
+    ):
+        (logsheets / name).write_text("source_mat_id\n", encoding="utf-8")
+    (combined / "AAOT_water_column_combined.parquet").write_bytes(b"PAR1")
+    governance = tmp_path / "logsheets_validated.csv"
+    governance.write_text(
+        "observatory_id,country,institute,rocrate_profile_uri\n"
+        "AAOT,Italy,CNR,https://data.emobon.embrc.eu/observatory-profile/0.15\n",
+        encoding="utf-8",
+    )
+
+    report = write_crates(tmp_path, governance)
+
+    assert sorted(p.name for p in (tmp_path / CRATES_DIR).iterdir()) == [
+        "AAOT",
+        "STHVN",
+    ]
+    assert report.files == 4
+    metadata = json.loads(
+        (tmp_path / CRATES_DIR / "AAOT" / METADATA_FILE).read_text(encoding="utf-8")
+    )
+    formats = {
+        part["name"]: part["encodingFormat"]
+        for part in metadata["@graph"]
+        if part["@type"] == "File"
+    }
+    assert formats == {
+        "AAOT_water_column_sampling_validated.csv": "text/csv",
+        "AAOT_water_column_sampling_validated.errors.csv": "text/csv",
+        "AAOT_water_column_combined.parquet": "application/vnd.apache.parquet",
+    }
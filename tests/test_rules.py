@@ -0,0 +1,36 @@
+"""The null_values of rules.json blank the placeholder dates before the
+models see them.
+"""
+
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from validation_classes.benchmarks import load_logsheets
+from validation_classes.pipeline import validate_sheet
+from validation_classes.sampling import Model as samplingModel
+
+
+def test_placeholder_dates() -> None:
+    job, df = next(
+        (job, df)
+        for job, df in load_logsheets("sampling").items()
+        if job.observatory_id == "AAOT"
+    )
+    df = df.copy()
+    df.loc[0, "ship_date"] = "Expected 06-2024"
+    df.loc[1, "arr_date_hq"] = "TO ARRIVE"
+
+    result = validate_sheet(job, df)
+
+    assert not [e for e in result.errors if e["loc"][0] in ("ship_date", "arr_date_hq")]
+    validated = result.validated
+    assert pd.isna(validated.loc[df.loc[0, "source_mat_id"], "ship_date"])
+    assert pd.isna(validated.loc[df.loc[1, "source_mat_id"], "arr_date_hq"])
+
+    # The models no longer blank them themselves
+    row = df.iloc[0].to_dict()
+    with pytest.raises(ValidationError, match="Unrecognised value: Expected 06-2024"):
+        samplingModel(**row)
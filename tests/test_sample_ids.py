@@ -0,0 +1,62 @@
+"""The parts of long-form source_mat_ids are checked against the row."""
+
+from __future__ import annotations
+
+import pandas as pd
+
+from validation_classes.errors import ErrorStore
+from validation_classes.pipeline import SheetJob
+from validation_classes.sample_ids import check_source_mat_ids
+
+JOB = SheetJob("EMT21", "water_column", "sampling", "", "sampling")
+
+
+def _types(df: pd.DataFrame) -> dict[str, str]:
+    errors = ErrorStore()
+    check_source_mat_ids(df, errors, JOB)
+    return {record["source_mat_id"]: record["type"] for record in errors}
+
+
+def test_long_form_mismatches() -> None:
+    df = pd.DataFrame(
+        {
+            "source_mat_id": [
+                "EMOBON_EMT21_Wa_210825_3um_1",
+                "EMOBON_EMT21_Wa_210825_3um_2",
+                "EMOBON_EMT21_Wa_210825_3um_3",
+                "EMOBON_EMT21_Wa_210825_0.2um_1",
+                "EMOBON_EMT21 _Wa_ 210825_3um_1",
+            ],
+            "collection_date": [
+                "2021-08-25",
+                "2021-08-26",
+                "2021-08-25",
+                "2021-08-25",
+                "2021-08-25",
+            ],
+            "size_frac": ["3-20", "3-20", "3-20", "3-20", "3-20"],
+            "replicate": [1, 2, 1, 1, 1],
+        }
+    )
+    assert _types(df) == {
+        "EMOBON_EMT21_Wa_210825_3um_2": "source_mat_id_date_mismatch",
+        "EMOBON_EMT21_Wa_210825_3um_3": "source_mat_id_replicate_mismatch",
+        "EMOBON_EMT21_Wa_210825_0.2um_1": "source_mat_id_size_frac_mismatch",
+        "EMOBON_EMT21 _Wa_ 210825_3um_1": "source_mat_id_malformed",
+    }
+
+
+def test_short_form_checked_on_source_mat_id_orig() -> None:
+    df = pd.DataFrame(
+        {
+            "source_mat_id": ["EMOBON_EMT21_Wa_1", "EMOBON_EMT21_Wa_2"],
+            "source_mat_id_orig": [
+                "EMOBON_EMT21_Wa_210825_3um_1",
+                "EMO BON EMT21 Wa 210825 3um (2)",  # Not a long form
+            ],
+            "collection_date": ["2021-08-26", "2021-08-26"],
+            "size_frac": ["3-20", "3-20"],
+            "replicate": [1, 2],
+        }
+    )
+    assert _types(df) == {"EMOBON_EMT21_Wa_1": "source_mat_id_date_mismatch"}
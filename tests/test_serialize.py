@@ -0,0 +1,23 @@
+"""serialize.write_csv writes what DataFrame.to_csv would."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from validation_classes.benchmarks import load_logsheets
+from validation_classes.pipeline import validate_sheet
+from validation_classes.serialize import write_csv
+
+
+@pytest.mark.parametrize("sheet_type", ["sampling", "measured", "observatory"])
+def test_write_csv_matches_to_csv(tmp_path: Path, sheet_type: str) -> None:
+    path = tmp_path / "validated.csv"
+    for job, df in load_logsheets(sheet_type).items():
+        validated = validate_sheet(job, df).validated
+        if validated.empty:
+            continue
+        rows = validated.reset_index().to_dict(orient="records")
+        write_csv(rows, path, index=validated.index.name)
+        assert path.read_text(encoding="utf-8") == validated.to_csv(), job.name
@@ -0,0 +1,91 @@
+"""The validation service over HTTP, on a free port."""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+from typing import Any
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pandas as pd
+import pytest
+
+from validation_classes.pipeline import VALIDATED_DATA_DIR
+from validation_classes.service import ValidationServer
+
+SAMPLING_CSV = (
+    VALIDATED_DATA_DIR / "logsheets" / "AAOT_water_column_sampling_validated.csv"
+)
+
+
+@pytest.fixture(scope="module")
+def server() -> Iterator[ValidationServer]:
+    with ValidationServer(port=0) as server:
+        yield server
+
+
+def post(server: ValidationServer, query: str, data: bytes) -> dict[str, Any]:
+    url = f"{server.base_url}/validate?{query}"
+    request = Request(url, data=data, method="POST")  # noqa: S310
+    with urlopen(request, timeout=30) as response:  # noqa: S310
+        return json.load(response)
+
+
+def test_health(server: ValidationServer) -> None:
+    with urlopen(f"{server.base_url}/health", timeout=30) as response:  # noqa: S310
+        health = json.load(response)
+    assert health["status"] == "ok"
+    assert "sampling" in health["models"]
+    assert "AAOT" in health["observatories"]
+
+
+def test_validate(server: ValidationServer) -> None:
+    df = pd.read_csv(SAMPLING_CSV)
+    df.loc[0, "collection_date"] = "not a date"
+    df.loc[1, "source_mat_id"] = None
+
+    result = post(
+        server,
+        "observatory=AAOT&strategy=water_column&sheet=sampling",
+        df.to_csv(index=False).encode(),
+    )
+
+    assert result["counters"] == {
+        "rows_fetched": len(df),
+        "rows_filtered": 1,
+        "rows_validated": len(df) - 2,
+        "rows_failed": 1,
+        "errors": 1,
+    }
+    assert not result["valid"]
+    rows = result["rows"]
+    assert [row["status"] for row in rows[:3]] == ["invalid", "filtered", "valid"]
+    [error] = rows[0]["errors"]
+    assert error["loc"] == "collection_date"
+    assert error["input"] == "not a date"
+    [group] = result["summary"]
+    assert group["loc"] == "collection_date"
+    assert group["count"] == 1
+    assert group["ids"] == [df.loc[0, "source_mat_id"]]
+
+
+def test_unknown_observatory(server: ValidationServer) -> None:
+    result = post(
+        server,
+        "observatory=NOWHERE&strategy=water_column&sheet=sampling",
+        SAMPLING_CSV.read_bytes(),
+    )
+    assert [group["type"] for group in result["summary"]] == ["unknown_observatory"]
+    assert result["counters"]["rows_failed"] == 0
+
+
+def test_unknown_sheet(server: ValidationServer) -> None:
+    with pytest.raises(HTTPError) as e:
+        post(
+            server,
+            "observatory=AAOT&strategy=water_column&sheet=nonsense",
+            SAMPLING_CSV.read_bytes(),
+        )
+    assert e.value.code == 400
+    assert "Unknown sheet nonsense" in json.load(e.value)["error"]
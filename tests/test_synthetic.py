@@ -0,0 +1,34 @@
+"""The synthetic governance table validates as the real one does."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from validation_classes.logsheets import Model as logsheetsModel
+from validation_classes.pipeline import get_sheet_addresses
+from validation_classes.synthetic import generate_network, write_network
+
+# The sheet's headers, the first alias of each field
+SHEET_HEADERS = {
+    name: info.validation_alias.choices[0]
+    for name, info in logsheetsModel.model_fields.items()
+    if info.validation_alias is not None
+}
+
+
+def test_governance_logsheets(tmp_path: Path) -> None:
+    network = generate_network(6)
+    logsheets = network.logsheets.rename(columns=SHEET_HEADERS)
+    models = [logsheetsModel(**row) for row in logsheets.to_dict(orient="records")]
+
+    assert [m.observatory_id for m in models] == [f"SYN{i:04d}" for i in range(1, 7)]
+    assert all(m.water_column is not None for m in models)
+    assert [m.soft_sediment is not None for m in models] == [False, True] * 3
+
+    write_network(network, tmp_path)
+    addresses = get_sheet_addresses(tmp_path / "governance" / "logsheets_validated.csv")
+    links = {(o, s): link for o, s, link in addresses if isinstance(link, str)}
+    assert links == {
+        (job.observatory_id, job.sampling_strategy): job.sheet_link
+        for job in network.sampling
+    }